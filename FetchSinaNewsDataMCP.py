@@ -1,7 +1,6 @@
-import requests
+import aiohttp
 from bs4 import BeautifulSoup
 import time
-import random
 import re
 from datetime import datetime, timedelta
 import argparse
@@ -11,10 +10,20 @@ import asyncio
 import sys
 import logging
 import os
-from mcp.server.fastmcp import FastMCP
+from urllib.parse import urlparse
+from mcp.server.fastmcp import FastMCP, Context
+from typing import Optional
 
 # 导入logger_utils中的全局日志函数
 from logger_utils import log_global_info, log_global_debug, log_global_warning, log_global_error, log_global_critical
+from http_utils import PooledHttpClient, RetryPolicy, RETRYABLE_STATUSES
+from politeness_utils import PolitenessController, BlockedError, looks_like_captcha
+from news_cache_utils import ArticleCache, RedirectCache, SelectorCache, canonical_url
+from article_extract_utils import extract_article_text, selector_index, selector_label, BODY_INDEX
+from news_dedupe_utils import NearDuplicateIndex, fingerprint, FINGERPRINT_CONTENT_CHARS
+from news_summary_utils import summarize, allocate_budget
+from news_archive_utils import NewsArchive
+from news_source_utils import NewsSource, SOURCE_TIMEOUT, SOURCE_MAX_RESULTS
 
 # MCP imports
 #from mcp.server import Server
@@ -52,16 +61,143 @@ ua = UserAgent()
 # Create MCP server
 app = FastMCP("sina-news-fetcher")
 
+# 新浪新闻搜索接口
+SINA_SEARCH_URL = "https://search.sina.com.cn/"
+
+# 同一主机同时获取文章正文的最大并发数
+ARTICLE_CONCURRENCY_PER_HOST = 2
+
+# 各类请求的超时时间（秒）
+SEARCH_TIMEOUT = 20
+ARTICLE_TIMEOUT = 15
+REDIRECT_TIMEOUT = 10
+
+# 需要解析跳转目标的新浪跳转链接主机
+SINA_REDIRECT_HOSTS = ("link.sina.com.cn",)
+
+# 正文获取失败时__get_article_content__返回的文本前缀，计算去重指纹时忽略这类正文
+ARTICLE_ERROR_PREFIXES = ("网络请求失败", "内容获取失败", "内容提取成功（但可能不完整）")
+
+# fetch_news每获取到多少条新闻向客户端推送一批部分结果
+PARTIAL_BATCH_SIZE = 5
+
+# 进程内共享的HTTP连接池（keep-alive、按主机限制连接数、DNS缓存、压缩协商）
+http_client = PooledHttpClient()
+
+# 按主机的自适应请求节奏（AIMD：响应正常时加快，被限流、验证码、慢响应时放慢）
+politeness_controller = PolitenessController()
+
+# 搜索、跳转链接和文章正文请求的重试策略（带抖动的指数退避 + 重试预算），搜索页启用对冲请求
+search_retry = RetryPolicy("搜索", hedge=True)
+redirect_retry = RetryPolicy("跳转链接")
+article_retry = RetryPolicy("文章")
+
+# 文章正文缓存（按规范化URL，跨运行复用，过期后条件请求确认）
+article_cache = ArticleCache()
+
+# 跳转链接解析结果缓存（内存 + SQLite，按有效期过期）
+redirect_cache = RedirectCache()
+
+# 按站点学习到的正文选择器（跨运行复用，记录各站点命中率）
+selector_cache = SelectorCache()
+
+# 本地新闻存档（全文索引 + 已抓取的关键词/日期覆盖范围）
+news_archive = NewsArchive()
+
+# 正在解析的跳转链接（规范化URL -> asyncio.Task），相同链接的并发解析共用一次请求
+redirects_in_flight = {}
+
+# 按主机获取文章正文的并发信号量（(主机, 并发上限) -> (事件循环, asyncio.Semaphore)），
+# 所有采集器共用，同时进行的多个MCP工具调用合计不超过每主机并发上限
+host_semaphores = {}
+
+class ArticleFetchError(Exception):
+    """文章正文获取失败（HTTP状态异常）"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
 class NewsDataCollector():
    
-    def __init__(self):
-        pass
+    def __init__(self, per_host_concurrency: int = ARTICLE_CONCURRENCY_PER_HOST, client: PooledHttpClient = None,
+                 cache: ArticleCache = None, redirects: RedirectCache = None, selectors: SelectorCache = None,
+                 archive: NewsArchive = None, sources: list = None, politeness: PolitenessController = None):
+        """
+        初始化新闻采集器
+        
+        Args:
+            per_host_concurrency: 同一主机同时获取文章正文的最大并发数（与上限相同的其他采集器共用）
+            client: HTTP连接池，默认使用模块共享的http_client
+            cache: 文章正文缓存，默认使用模块共享的article_cache
+            redirects: 跳转链接缓存，默认使用模块共享的redirect_cache
+            selectors: 站点正文选择器缓存，默认使用模块共享的selector_cache
+            archive: 新闻存档，默认使用模块共享的news_archive
+            sources: 新闻源（NewsSource）列表，默认只有新浪新闻
+            politeness: 按主机的请求节奏控制，默认使用模块共享的politeness_controller
+        """
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self.client = client or http_client
+        self.cache = cache or article_cache
+        self.redirects = redirects or redirect_cache
+        self.selectors = selectors or selector_cache
+        self.archive = archive or news_archive
+        self.sources = sources if sources is not None else [SinaNewsSource(self)]
+        self.politeness = politeness or politeness_controller
 
-    def __get_random_delay__(self):
-        """获取2-5秒的随机延迟"""
-        delay = random.uniform(2, 5)
-        log_global_debug(f"随机延迟设置为: {delay:.2f}秒")
-        return delay
+    def __host_slot__(self, url: str) -> asyncio.Semaphore:
+        """获取URL所在主机的并发信号量（模块共享，按事件循环创建）"""
+        key = (urlparse(url).netloc, self.per_host_concurrency)
+        loop = asyncio.get_running_loop()
+        entry = host_semaphores.get(key)
+        if entry is None or entry[0] is not loop:
+            entry = host_semaphores[key] = (loop, asyncio.Semaphore(self.per_host_concurrency))
+        return entry[1]
+
+    def __pacer__(self, url: str):
+        """返回等待URL所在主机请求节奏的无参数协程函数（作为RetryPolicy.run的before）"""
+        host = urlparse(url).hostname or ""
+        return lambda: self.politeness.acquire(host)
+
+    async def __request__(self, url: str, check_captcha: bool = False, **kwargs) -> tuple:
+        """
+        发出一次GET请求，并根据响应调整该主机的速率
+        
+        不等待请求节奏，调用方通过__pacer__在重试策略的每次尝试前等待，
+        等待时间不计入对冲延迟样本。
+        
+        Args:
+            url: 请求URL
+            check_captcha: 是否检查验证码/拦截页面
+            **kwargs: 传给session.get的参数
+            
+        Returns:
+            (状态码, 响应头, 响应文本) 三元组
+            
+        Raises:
+            BlockedError: 返回了验证码或拦截页面
+            aiohttp.ClientError, asyncio.TimeoutError: 网络请求失败
+        """
+        host = urlparse(url).hostname or ""
+        session = await self.client.get_session()
+        start_time = time.monotonic()
+        try:
+            async with session.get(url, **kwargs) as response:
+                text = await response.text(encoding='utf-8', errors='replace')  # 强制使用UTF-8编码
+                status, headers = response.status, response.headers
+        except aiohttp.ClientResponseError as e:
+            self.politeness.record(host, time.monotonic() - start_time, e.status,
+                                   retry_after=e.headers.get('Retry-After') if e.headers else None)
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.politeness.record_error(host)
+            raise
+        blocked = check_captcha and status == 200 and looks_like_captcha(text)
+        self.politeness.record(host, time.monotonic() - start_time, status, blocked, headers.get('Retry-After'))
+        if blocked:
+            raise BlockedError(f"{host} 返回了验证码或拦截页面")
+        return status, headers, text
 
     def __clean_text__(self, text):
         """清理文本中的乱码和多余空格"""
@@ -75,97 +211,173 @@ class NewsDataCollector():
         text = re.sub(r'\s+', ' ', text).strip()
         return text
 
-    def __get_article_content__(self, url: str):
-        """获取文章正文内容（完整版）"""
+    async def __get_article_content__(self, url: str):
+        """获取文章正文内容（完整版），失败时返回错误信息文本"""
         try:
-            log_global_debug(f"开始获取文章内容: {url}")
-            
-            headers = {
-                "User-Agent": ua.random,
-                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                "Accept-Language": "zh-CN,zh;q=0.9"
-            }
+            return (await self.fetch_article(url))["content"]
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error_msg = f"网络请求失败: {str(e) or type(e).__name__}"
+            log_global_error(error_msg)
+            return error_msg
+        except Exception as e:
+            error_msg = f"内容获取失败: {str(e)}"
+            log_global_error(error_msg)
+            return error_msg
+
+    async def fetch_article(self, url: str) -> dict:
+        """
+        获取单篇文章正文
+        
+        Args:
+            url: 文章链接（可以是新浪跳转链接）
             
-            # 处理新浪特殊URL
-            if 'link.sina.com.cn' in url:
-                log_global_debug(f"检测到新浪跳转链接: {url}")
-                real_url = self.__get_sina_redirect_url__(url)
-                if real_url:
-                    url = real_url
-                    log_global_debug(f"跳转到实际链接: {url}")
+        Returns:
+            包含url（跳转后的实际链接）和content的字典
             
-            delay = self.__get_random_delay__()
-            time.sleep(delay)
-            log_global_debug(f"延迟 {delay:.2f}秒后发起请求")
+        Raises:
+            ArticleFetchError: HTTP状态异常
+            aiohttp.ClientError, asyncio.TimeoutError: 网络请求失败
+        """
+        log_global_debug(f"开始获取文章内容: {url}")
+        if url.startswith('//'):
+            url = 'https:' + url
+        
+        headers = {
+            "User-Agent": ua.random,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9"
+        }
+        
+        # 处理新浪特殊URL
+        if self.__is_redirect_link__(url):
+            log_global_debug(f"检测到新浪跳转链接: {url}")
+            real_url = await self.__resolve_redirect__(url)
+            if real_url:
+                url = real_url
+                log_global_debug(f"跳转到实际链接: {url}")
+        
+        # 缓存未过期时直接返回，过期时带上ETag/Last-Modified做条件请求
+        try:
+            cached = await asyncio.to_thread(self.cache.get, url)
+        except Exception as e:
+            log_global_warning(f"读取文章缓存失败: {str(e)}")
+            cached = None
+        if cached and cached["fresh"]:
+            log_global_debug(f"文章缓存命中: {url}")
+            return {"url": url, "content": cached["text"]}
+        if cached:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        
+        # 同一主机的并发数受限，请求间隔由该主机的请求节奏决定
+        async with self.__host_slot__(url):
+            async def request():
+                status, response_headers, html = await self.__request__(
+                    url, check_captcha=True, headers=headers, timeout=aiohttp.ClientTimeout(total=ARTICLE_TIMEOUT)
+                )
+                if status in RETRYABLE_STATUSES:
+                    raise ArticleFetchError(f"HTTP {status}", status)
+                return status, html, response_headers.get('ETag'), response_headers.get('Last-Modified')
             
             start_time = time.time()
-            response = requests.get(url, headers=headers, timeout=15)
+            status, html, etag, last_modified = await article_retry.run(request, self.__pacer__(url))
             response_time = time.time() - start_time
-            response.encoding = 'utf-8'  # 强制使用UTF-8编码
-            
-            log_global_debug(f"HTTP响应状态: {response.status_code}, 响应时间: {response_time:.2f}s, 内容长度: {len(response.text)}")
-            
-            if response.status_code != 200:
-                log_global_warning(f"HTTP请求失败，状态码: {response.status_code}")
-                return f"内容获取失败: HTTP {response.status_code}"
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 移除不需要的元素
-            for element in soup(['script', 'style', 'iframe', 'nav', 'footer', 'aside', 'header', 'button', 'a']):
-                element.decompose()
-            
-            # 增强的内容选择器列表（按优先级排序）
-            content_selectors = [
-                {'selector': 'article', 'attrs': {}},  # 通用文章标签
-                {'selector': '.article-content', 'attrs': {}},  # 新浪/网易
-                {'selector': '.content', 'attrs': {}},  # 腾讯
-                {'selector': '.main-content', 'attrs': {}},  # 搜狐
-                {'selector': '.article-main', 'attrs': {}},  # 其他
-                {'selector': '.text', 'attrs': {}},  # 通用
-                {'selector': '#artibody', 'attrs': {}},  # 新浪另一种
-                {'selector': 'div', 'attrs': {'class': 'article'}},  # 更精确匹配
-                {'selector': 'div', 'attrs': {'id': 'article'}},  # ID匹配
-                {'selector': 'div', 'attrs': {'class': 'content-wrapper'}},  # 新浪财经
-                {'selector': '.article-body', 'attrs': {}},  # 新浪部分新闻
-                {'selector': '.article-detail', 'attrs': {}},  # 新浪详情页
-                {'selector': '.article-txt', 'attrs': {}}  # 新浪财经
-            ]
-            
-            for idx, selector in enumerate(content_selectors):
-                try:
-                    content = soup.find(selector['selector'], **selector['attrs'])
-                    if content:
-                        text = content.get_text(separator='\n', strip=True)
-                        text = self.__clean_text__(text)
-                        if text:  # 只要有内容就返回
-                            log_global_debug(f"成功从选择器 #{idx+1} 提取内容，长度: {len(text)} 字符")
-                            return text
-                except Exception as e:
-                    log_global_debug(f"选择器 #{idx+1} 提取失败: {str(e)}")
-                    continue
+        
+        log_global_debug(f"HTTP响应状态: {status}, 响应时间: {response_time:.2f}s, 内容长度: {len(html)}")
+        
+        if status == 304 and cached:
+            log_global_debug(f"文章未修改，使用缓存: {url}")
+            await asyncio.to_thread(self.cache.touch, url)
+            return {"url": url, "content": cached["text"]}
+        
+        if status != 200:
+            log_global_warning(f"HTTP请求失败，状态码: {status}")
+            raise ArticleFetchError(f"HTTP {status}", status)
+        
+        # HTML解析是CPU密集操作，放到线程中执行，避免阻塞事件循环
+        text = await asyncio.to_thread(self.__extract_article_text__, html, url)
+        try:
+            await asyncio.to_thread(self.cache.put, url, html, text, etag, last_modified)
+        except Exception as e:
+            log_global_warning(f"写入文章缓存失败: {str(e)}")
+        return {"url": url, "content": text}
+
+    def __extract_article_text__(self, html: str, url: str) -> str:
+        """从文章HTML中提取正文（单遍提取，优先使用lxml解析器，先尝试该站点上次命中的选择器）"""
+        domain = urlparse(url).hostname or ""
+        preferred = selector_index(self.selectors.get(domain))
+        if preferred == BODY_INDEX:
+            # 旧版本可能把body记为站点选择器，body不作为优先选择器
+            preferred = None
+        text, index = extract_article_text(html, self.__clean_text__, preferred=preferred)
+        self.selectors.record(domain, selector_label(index), preferred is not None and index == preferred, index == BODY_INDEX)
+        if index == BODY_INDEX:
+            log_global_debug(f"从body提取内容，长度: {len(text)} 字符")
+            return text
+        if text:
+            log_global_debug(f"成功从选择器 #{index+1} 提取内容，长度: {len(text)} 字符")
+            return text
+        
+        log_global_warning(f"未能从文章 {url} 中提取到有效内容")
+        return "内容提取成功（但可能不完整）"
+        
+    def __is_redirect_link__(self, url: str) -> bool:
+        """判断是否为需要解析的新浪跳转链接"""
+        return bool(url) and urlparse(url).hostname in SINA_REDIRECT_HOSTS
+
+    async def __resolve_redirect__(self, url: str):
+        """
+        解析跳转链接的真实URL（先查缓存，相同链接的并发解析只发一次请求）
+        
+        Args:
+            url: 跳转链接
             
-            # 最终回退方案：尝试获取整个body
-            body = soup.find('body')
-            if body:
-                text = body.get_text(separator='\n', strip=True)
-                text = self.__clean_text__(text)
-                if text:
-                    log_global_debug(f"从body提取内容，长度: {len(text)} 字符")
-                    return text
+        Returns:
+            真实URL，解析失败时返回None
+        """
+        target = self.redirects.get(url)
+        if target:
+            return target
+        key = canonical_url(url)
+        task = redirects_in_flight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self.__fetch_redirect__(url))
+            redirects_in_flight[key] = task
+            task.add_done_callback(lambda _: redirects_in_flight.pop(key, None))
+        else:
+            self.redirects.count("coalesced")
+        # shield避免某个等待方被取消时连带取消其他等待方共用的请求
+        return await asyncio.shield(task)
+
+    async def __resolve_redirects__(self, urls: list) -> dict:
+        """
+        并发解析一批跳转链接
+        
+        Args:
+            urls: 跳转链接列表（可重复）
             
-            log_global_warning(f"未能从文章 {url} 中提取到有效内容")
-            return "内容提取成功（但可能不完整）"
-        except requests.exceptions.RequestException as e:
-            error_msg = f"网络请求失败: {str(e)}"
-            log_global_error(error_msg)
-            return error_msg
+        Returns:
+            跳转链接 -> 真实URL 的字典，不含解析失败的链接
+        """
+        unique_urls = list(dict.fromkeys(urls))
+        targets = await asyncio.gather(*(self.__resolve_redirect__(url) for url in unique_urls))
+        return {url: target for url, target in zip(unique_urls, targets) if target}
+
+    async def __fetch_redirect__(self, url: str):
+        """请求跳转链接并缓存解析结果（失败不缓存）"""
+        target = await self.__get_sina_redirect_url__(url)
+        if not target:
+            self.redirects.count("failures")
+            return None
+        try:
+            await asyncio.to_thread(self.redirects.put, url, target)
         except Exception as e:
-            error_msg = f"内容获取失败: {str(e)}"
-            log_global_error(error_msg)
-            return error_msg
-        
-    def __get_sina_redirect_url__(self, url: str):
+            log_global_warning(f"写入跳转链接缓存失败: {str(e)}")
+        return target
+
+    async def __get_sina_redirect_url__(self, url: str):
         """获取新浪跳转链接的真实URL（增强版）"""
         try:
             log_global_debug(f"解析新浪跳转链接: {url}")
@@ -174,9 +386,15 @@ class NewsDataCollector():
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
                 "Referer": "https://news.sina.com.cn/"
             }
-            response = requests.get(url, headers=headers, timeout=10, allow_redirects=False)
-            if response.status_code == 302 and 'Location' in response.headers:
-                location = response.headers['Location']
+            async def request():
+                status, response_headers, _ = await self.__request__(
+                    url, headers=headers, timeout=aiohttp.ClientTimeout(total=REDIRECT_TIMEOUT), allow_redirects=False,
+                    raise_for_status=True
+                )
+                return status, response_headers.get('Location')
+            
+            status, location = await redirect_retry.run(request, self.__pacer__(url))
+            if status == 302 and location:
                 log_global_debug(f"跳转目标: {location}")
                 if location.startswith('//'):
                     full_url = 'https:' + location
@@ -184,7 +402,7 @@ class NewsDataCollector():
                     return full_url
                 return location
             else:
-                log_global_warning(f"未发现跳转或请求失败，状态码: {response.status_code}")
+                log_global_warning(f"未发现跳转或请求失败，状态码: {status}")
         except Exception as e:
             log_global_error(f"获取跳转链接失败: {str(e)}")
         return None
@@ -303,26 +521,119 @@ class NewsDataCollector():
             log_global_warning(f"提取来源信息失败: {date_text}, 错误: {str(e)}")
             return "新浪新闻"
 
-    async def __fetch_sina_news__(self, keyword: str, industry: str, start_date: str, end_date: str, max_results: int = 50):
-        """获取新浪新闻数据"""
+    def __parse_search_results__(self, html: str) -> list:
+        """
+        解析搜索结果页
+        
+        Args:
+            html: 搜索结果页HTML
+            
+        Returns:
+            每条结果的字典列表，包含title、url（原始链接）和date_text；缺少标题元素的结果为None
+        """
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # 使用与FetchSinaNewsData.py相同的增强结果选择器
+        results = soup.select('.box-result') or soup.select('.result') or soup.select('.search-result-item') or soup.select('.news-item')
+        
+        parsed = []
+        for item in results:
+            # 使用与FetchSinaNewsData.py相同的方式获取标题元素
+            title_elem = item.select_one('h2 a') or item.select_one('a[target="_blank"]') or item.select_one('a')
+            if not title_elem:
+                parsed.append(None)
+                continue
+            
+            # 使用与FetchSinaNewsData.py相同的方式获取日期信息
+            date_elem = item.select_one('.time') or item.select_one('.fgray_time')
+            parsed.append({
+                'title': self.__clean_text__(title_elem.get_text(strip=True)),
+                'url': title_elem.get('href', ''),
+                'date_text': self.__clean_text__(date_elem.get_text(strip=True)) if date_elem else ""
+            })
+        return parsed
+
+    async def __build_news_item__(self, result: dict, keyword: str, page: int, i: int, include_content: bool = True):
+        """根据搜索结果构建新闻条目（include_content为True时获取正文），失败时返回None"""
+        try:
+            log_global_debug(f"解析第 {page} 页第 {i+1} 条新闻")
+            if result is None:
+                log_global_debug("未找到标题元素，跳过该新闻")
+                return None
+            
+            title = result['title']
+            url = result['url']
+            
+            # 确保URL是完整的（跳转链接已在翻页时批量解析）
+            if url.startswith('//'):
+                url = 'https:' + url
+            elif url.startswith('/'):
+                url = 'https://news.sina.com.cn' + url
+            
+            log_global_debug(f"新闻标题: {title}")
+            log_global_debug(f"新闻链接: {url}")
+            
+            date_text = result['date_text']
+            # 提取日期部分，处理不同格式的日期信息（翻页时已解析过的直接使用）
+            date = result['date'] if 'date' in result else self.__parse_date_text__(date_text)
+            
+            log_global_debug(f"新闻日期: {date_text}, 解析后日期: {date}")
+            
+            news_item = {
+                'source': self.__extract_source_from_date_text__(date_text) if date_text else "新浪新闻",
+                'title': title,
+                'url': url,
+                'date': date,
+                'search_term': keyword
+            }
+            if not include_content:
+                return news_item
+            
+            # 获取详细内容
+            content = ""
+            if url:
+                log_global_debug(f"获取文章详细内容: {url}")
+                content = await self.__get_article_content__(url)
+                log_global_debug(f"文章内容长度: {len(content)} 字符")
+            news_item['content'] = content  # 包含详细内容
+            return news_item
+        except Exception as e:
+            log_global_warning(f"解析第 {page} 页第 {i+1} 条新闻时出错: {str(e)}")
+            return None
+
+    async def __iter_sina_news__(self, keyword: str, industry: str, start_date: str, end_date: str, max_results: int = 50,
+                                 include_content: bool = True, progress: Optional[dict] = None):
+        """
+        逐条产出新浪新闻（异步生成器）
+        
+        每页的条目在正文获取完成后立即产出（按完成顺序），不等整页结束；
+        日期过滤在获取正文之前按搜索结果中的日期进行，范围外的新闻不会被请求，
+        搜索结果按时间倒序，出现早于开始日期的新闻后停止翻页；最多产出max_results条。
+        
+        progress不为None时，完整翻完时间范围（而不是因数量上限或请求失败停止）后
+        设置progress["complete"]为True，供调用方记录存档覆盖范围。
+        """
+        progress = progress if progress is not None else {}
         log_global_info(f"开始从新浪新闻获取数据: keyword={keyword}, start_date={start_date}, end_date={end_date}")
         
         # 使用与FetchSinaNewsData.py相同的URL和参数
-        search_url = "https://search.sina.com.cn/"
+        search_url = SINA_SEARCH_URL
         headers = {
             "User-Agent": ua.random,
             "Referer": "https://news.sina.com.cn/",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Encoding": "gzip, deflate, br"
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8"
         }
+        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
+        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
         
-        news_items = []
+        found_count = 0  # 在时间范围内且通过字段校验的新闻数
+        skipped_count = 0  # 因日期不在范围内而未获取的新闻数
         page = 1
         max_pages = min(5, (max_results // 20) + 1)  # 最多获取5页或根据需要的结果数量计算页数
         
         log_global_debug(f"预计最多获取 {max_pages} 页，每页最多20条新闻")
         
-        while page <= max_pages and len(news_items) < max_results:
+        while page <= max_pages and found_count < max_results:
             # 构建搜索参数，与FetchSinaNewsData.py保持一致
             params = {
                 'q': keyword,
@@ -331,240 +642,388 @@ class NewsDataCollector():
                 'time': 'custom',
                 'stime': start_date,
                 'etime': end_date,
-                'num': min(20, max_results - len(news_items)),  # 每页获取20条或剩余需要的数量
+                'num': str(min(20, max_results - found_count)),  # 每页获取20条或剩余需要的数量
                 'sort': 'time',
                 'col': '1_7',  # 限定新闻频道
-                'page': page  # 添加页码参数
+                'page': str(page)  # 添加页码参数
             }
             
             try:
                 log_global_debug(f"发送请求到新浪新闻搜索接口: {search_url}, 第 {page} 页")
                 log_global_debug(f"请求参数: {params}")
                 
+                async def request():
+                    status, _, html = await self.__request__(
+                        search_url, check_captcha=True, headers=headers, params=params,
+                        timeout=aiohttp.ClientTimeout(total=SEARCH_TIMEOUT), raise_for_status=True
+                    )
+                    log_global_debug(f"收到响应，状态码: {status}")
+                    return html
+                
+                # 连接错误、超时和5xx按重试策略重试（慢请求触发对冲），成功的响应直接用于解析
                 start_time = time.time()
-                response = requests.get(search_url, headers=headers, params=params, timeout=20)
+                html = await search_retry.run(request, self.__pacer__(search_url))
                 request_time = time.time() - start_time
+                log_global_debug(f"请求时间: {request_time:.2f}s, 响应大小: {len(html)} 字节")
                 
-                response.encoding = 'utf-8'  # 强制使用UTF-8编码
-                response.raise_for_status()
-                
-                log_global_debug(f"收到响应，状态码: {response.status_code}, 请求时间: {request_time:.2f}s, 响应大小: {len(response.text)} 字节")
-                log_global_debug(f"响应URL: {response.url}")
-                
-                # 解析HTML响应
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 使用与FetchSinaNewsData.py相同的增强结果选择器
-                results = soup.select('.box-result') or soup.select('.result') or soup.select('.search-result-item') or soup.select('.news-item')
+                # 解析HTML响应（放到线程中执行，避免阻塞事件循环）
+                results = await asyncio.to_thread(self.__parse_search_results__, html)
                 
                 log_global_debug(f"第 {page} 页解析到 {len(results)} 条新闻数据")
                 
                 # 检查是否有结果，如果没有结果则停止翻页
                 if not results:
                     log_global_info("未找到更多结果，停止翻页")
+                    progress["complete"] = True
                     break
                 
-                # 处理当前页的所有结果
-                page_items_count = 0
-                for i, item in enumerate(results):
-                    try:
-                        log_global_debug(f"解析第 {page} 页第 {i+1} 条新闻")
-                        
-                        # 使用与FetchSinaNewsData.py相同的方式获取标题元素
-                        title_elem = item.select_one('h2 a') or item.select_one('a[target="_blank"]') or item.select_one('a')
-                        if not title_elem:
-                            log_global_debug("未找到标题元素，跳过该新闻")
+                # 先按搜索结果中的日期过滤，范围外的新闻不解析跳转、不获取正文
+                in_range = []
+                older_count = 0
+                newer_count = 0
+                for i, result in enumerate(results):
+                    if result is not None:
+                        result['date'] = self.__parse_date_text__(result['date_text'])
+                        position = self.__date_position__(result, start_date_obj, end_date_obj)
+                        if position < 0:
+                            older_count += 1
                             continue
-                        
-                        title = self.__clean_text__(title_elem.get_text(strip=True))
-                        url = title_elem.get('href', '')
-                        
-                        # 确保URL是完整的
-                        if 'link.sina.com.cn' in url:
-                            real_url = self.__get_sina_redirect_url__(url)
-                            if real_url:
-                                url = real_url
-                        elif url.startswith('//'):
-                            url = 'https:' + url
-                        elif url.startswith('/'):
-                            url = 'https://news.sina.com.cn' + url
-                        
-                        log_global_debug(f"新闻标题: {title}")
-                        log_global_debug(f"新闻链接: {url}")
-                        
-                        # 使用与FetchSinaNewsData.py相同的方式获取日期信息
-                        source_elem = item.select_one('.source') or item.select_one('.fgray_time')
-                        date_elem = item.select_one('.time') or item.select_one('.fgray_time')
-                        
-                        date_text = self.__clean_text__(date_elem.get_text(strip=True)) if date_elem else ""
-                        # 提取日期部分，处理不同格式的日期信息
-                        date = self.__parse_date_text__(date_text)
-                        
-                        log_global_debug(f"新闻日期: {date_text}, 解析后日期: {date}")
-                        
-                        # 获取详细内容
-                        content = ""
-                        if url:
-                            log_global_debug(f"获取文章详细内容: {url}")
-                            content = self.__get_article_content__(url)
-                            log_global_debug(f"文章内容长度: {len(content)} 字符")
-                        
-                        news_item = {
-                            'source': self.__extract_source_from_date_text__(date_text) if date_text else "新浪新闻",
-                            'title': title,
-                            'url': url,
-                            'date': date,
-                            'content': content,  # 包含详细内容
-                            'search_term': keyword
-                        }
-                        
+                        if position > 0:
+                            newer_count += 1
+                            continue
+                    in_range.append((i, result))
+                skipped_count += older_count + newer_count
+                if older_count or newer_count:
+                    log_global_debug(f"第 {page} 页有 {older_count + newer_count} 条新闻日期不在范围内，跳过")
+                
+                # 先并发解析本页所有跳转链接，已缓存的不再请求
+                redirect_urls = [result['url'] for _, result in in_range if result and self.__is_redirect_link__(result['url'])]
+                if redirect_urls:
+                    resolved = await self.__resolve_redirects__(redirect_urls)
+                    log_global_debug(f"第 {page} 页解析跳转链接 {len(resolved)}/{len(set(redirect_urls))} 条")
+                    for _, result in in_range:
+                        if result and result['url'] in resolved:
+                            result['url'] = resolved[result['url']]
+                
+                # 并发处理当前页的所有结果（文章正文按主机限制并发），按完成顺序产出
+                tasks = [
+                    asyncio.ensure_future(self.__build_news_item__(result, keyword, page, i, include_content))
+                    for i, result in in_range
+                ]
+                page_items_count = 0
+                try:
+                    for next_item in asyncio.as_completed(tasks):
+                        news_item = await next_item
                         # 验证必要字段
-                        if news_item['title'] and news_item['url']:
-                            news_items.append(news_item)
+                        if news_item and news_item['title'] and news_item['url']:
                             page_items_count += 1
-                            log_global_debug(f"成功添加新闻: {title}")
-                        else:
+                            if found_count < max_results:
+                                found_count += 1
+                                log_global_debug(f"成功添加新闻: {news_item['title']}")
+                                yield news_item
+                        elif news_item:
                             log_global_debug("新闻缺少必要字段，跳过")
-                            
-                    except Exception as e:
-                        log_global_warning(f"解析第 {page} 页第 {i+1} 条新闻时出错: {str(e)}")
-                        continue
+                finally:
+                    # 调用方提前停止迭代时取消本页未完成的正文获取
+                    for task in tasks:
+                        task.cancel()
                 
                 log_global_info(f"第 {page} 页成功处理 {page_items_count} 条新闻")
                 
-                # 如果当前页没有新添加的新闻，停止翻页
-                if page_items_count == 0:
+                # 搜索结果按时间倒序，出现早于开始日期的新闻说明时间范围已翻完
+                if older_count:
+                    log_global_info(f"第 {page} 页已出现早于 {start_date} 的新闻，停止翻页")
+                    progress["complete"] = True
+                    break
+                
+                # 如果当前页没有新添加的新闻（且不是因为整页都晚于范围），停止翻页
+                if page_items_count == 0 and not newer_count:
                     log_global_info("当前页没有有效新闻，停止翻页")
+                    progress["complete"] = True
                     break
                 
+                # 翻页的请求间隔由搜索主机的请求节奏决定
                 page += 1
                 
-                # 添加延迟以避免请求过于频繁
-                if page <= max_pages and len(news_items) < max_results:
-                    delay = self.__get_random_delay__()
-                    log_global_debug(f"等待 {delay:.2f} 秒后继续获取下一页")
-                    time.sleep(delay)
-                
-            except requests.exceptions.ConnectionError as e:
-                log_global_error(f"连接新浪新闻接口失败: {str(e)}")
-                # 实现重试机制
-                retry_count = 0
-                max_retries = 3
-                while retry_count < max_retries:
-                    retry_count += 1
-                    wait_time = 2 ** retry_count  # 指数退避
-                    log_global_info(f"第 {retry_count} 次重试，等待 {wait_time} 秒...")
-                    time.sleep(wait_time)
-                    
-                    try:
-                        response = requests.get(search_url, headers=headers, params=params, timeout=20)
-                        response.encoding = 'utf-8'
-                        response.raise_for_status()
-                        log_global_info("重试成功")
-                        break
-                    except requests.exceptions.ConnectionError:
-                        if retry_count >= max_retries:
-                            log_global_error("多次重试后仍然连接失败，停止获取")
-                            return news_items
-                        continue
-            except requests.exceptions.RequestException as e:
-                log_global_error(f"请求新浪新闻接口失败: {str(e)}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # 重试策略已按退避重试过，仍失败时停止翻页
+                log_global_error(f"请求新浪新闻接口失败: {str(e) or type(e).__name__}")
                 break
             except Exception as e:
                 log_global_error(f"获取新浪新闻时发生未知错误: {str(e)}")
                 break
-            
-        # 时间过滤：只保留在指定时间范围内的新闻（只比较日期部分）
-        filtered_news_items = []
-        start_date_obj = datetime.strptime(start_date, "%Y-%m-%d")
-        end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
         
-        for item in news_items:
-            try:
-                item_date_str = item.get('date', '')
-                if item_date_str:
-                    # 解析新闻日期（只比较日期部分）
-                    if ' ' in item_date_str:
-                        item_date_obj = datetime.strptime(item_date_str, "%Y-%m-%d %H:%M:%S")
-                    else:
-                        item_date_obj = datetime.strptime(item_date_str, "%Y-%m-%d")
-                    
-                    # 只比较日期部分
-                    item_date_only = item_date_obj.date()
-                    start_date_only = start_date_obj.date()
-                    end_date_only = end_date_obj.date()
-                    
-                    # 检查是否在指定日期范围内
-                    if start_date_only <= item_date_only <= end_date_only:
-                        filtered_news_items.append(item)
-                    else:
-                        log_global_debug(f"过滤掉日期不在范围内的新闻: {item_date_str}")
-                else:
-                    # 如果没有日期信息，默认保留
-                    filtered_news_items.append(item)
-            except Exception as e:
-                log_global_warning(f"过滤新闻时解析日期出错: {str(e)}, 保留该新闻")
-                # 解析日期出错时，默认保留该新闻
-                filtered_news_items.append(item)
-        
-        log_global_info(f"时间过滤后剩余 {len(filtered_news_items)} 条新闻")
-        log_global_info(f"新浪新闻获取完成，共获取到 {len(filtered_news_items)} 条有效新闻")
-        return filtered_news_items[:max_results]  # 返回限定数量的结果
+        log_global_info(f"时间范围内获取 {found_count} 条新闻，跳过范围外 {skipped_count} 条")
 
-    async def fetch_news(self, company: str = "", industry: str = "", days: int = 1, max_results: int = 50):
-        """获取新浪新闻数据"""
-        start_time = time.time()
-        log_global_info(f"开始获取新闻数据: company={company}, industry={industry}, days={days}, max_results={max_results}")
+    def __date_position__(self, item: dict, start_date_obj: datetime, end_date_obj: datetime) -> int:
+        """
+        时间过滤：判断新闻日期相对指定时间范围的位置（只比较日期部分）
         
-        # 计算时间范围
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        Returns:
+            -1 早于范围，0 在范围内（没有或无法解析日期时视为在范围内，默认保留），1 晚于范围
+        """
+        try:
+            item_date_str = item.get('date', '')
+            if not item_date_str:
+                # 如果没有日期信息，默认保留
+                return 0
+            # 解析新闻日期（只比较日期部分）
+            if ' ' in item_date_str:
+                item_date_obj = datetime.strptime(item_date_str, "%Y-%m-%d %H:%M:%S")
+            else:
+                item_date_obj = datetime.strptime(item_date_str, "%Y-%m-%d")
+            
+            # 检查是否在指定日期范围内
+            if item_date_obj.date() < start_date_obj.date():
+                log_global_debug(f"过滤掉日期早于范围的新闻: {item_date_str}")
+                return -1
+            if item_date_obj.date() > end_date_obj.date():
+                log_global_debug(f"过滤掉日期晚于范围的新闻: {item_date_str}")
+                return 1
+            return 0
+        except Exception as e:
+            # 解析日期出错时，默认保留该新闻
+            log_global_warning(f"过滤新闻时解析日期出错: {str(e)}, 保留该新闻")
+            return 0
+
+    async def iter_news(self, company: str = "", industry: str = "", days: int = 1, max_results: int = 50,
+                        include_content: bool = True, refresh: bool = False):
+        """
+        逐条产出去重后的新闻（异步生成器）
         
-        log_global_info(f"搜索时间范围: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}")
+        所有新闻源和关键词并发抓取，新闻按到达顺序产出：第一条新闻在第一次搜索请求返回后即可产出，
+        同一页内的新闻按完成顺序产出。每个新闻源处理一个关键词受其timeout和max_results限制，
+        超时后只使用已经返回的新闻，慢的新闻源不会拖住整个调用；累计达到max_results的2倍后停止其余抓取。
+        近似重复的转载（标题+正文开头的SimHash相近）不再产出，只累加到已产出代表条目的duplicates计数上。
+        每个关键词先从本地存档产出已覆盖日期的新闻，只抓取未覆盖的日期，抓取结果写入存档。
         
-        sources = [self.__fetch_sina_news__]
-        all_news = []
+        Args:
+            company: 公司名称
+            industry: 行业名称
+            days: 回溯天数
+            max_results: 最大结果数
+            include_content: 是否获取正文
+            refresh: 是否忽略存档覆盖范围、重新抓取整个时间范围
+            
+        Raises:
+            ValueError: 公司名称和行业名称都为空
+        """
+        log_global_info(f"开始获取新闻数据: company={company}, industry={industry}, days={days}, max_results={max_results}, include_content={include_content}, refresh={refresh}")
         
         search_terms = []
         if company:
             search_terms.append(company)
         if industry: 
             search_terms.append(industry)
+        if not search_terms:
+            raise ValueError("请提供公司名称或行业名称")
         
-        log_global_debug(f"搜索关键词: {search_terms}")
+        log_global_debug(f"搜索关键词: {search_terms}, 新闻源: {[source.name for source in self.sources]}")
         
-        for source in sources:
-            for term in search_terms:
-                try:
-                    delay = self.__get_random_delay__()
-                    log_global_info(f"等待 {delay:.2f} 秒后搜索关键词: {term}")
-                    time.sleep(delay)
-                    log_global_info(f"正在搜索关键词: {term}")
-                    # 修复参数传递问题，正确传递keyword, industry, start_date, end_date
-                    news = await source(term, industry, start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
-                    all_news.extend(news)
-                    log_global_info(f"获取到 {len(news)} 条结果")
-                    
-                    if len(all_news) >= max_results * 2:  # 放宽初步限制
-                        log_global_info("已达到初步结果限制，停止搜索")
-                        break
-                except Exception as e:
-                    error_msg = f"搜索 {term} 失败: {str(e)}"
-                    log_global_error(error_msg)
-                    continue
+        # 计算时间范围
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
         
-        # 去重并排序
-        log_global_debug(f"开始去重处理，原始数量: {len(all_news)}")
+        log_global_info(f"搜索时间范围: {start_str} 至 {end_str}")
+        
+        found_count = 0
         seen = set()
-        unique_news = []
-        for item in all_news:
+        # 近似重复检测：同一稿件的转载（不同链接、标题略有改动）只保留第一条，记录重复数
+        near_duplicates = NearDuplicateIndex()
+        representatives = []  # 与near_duplicates中的条目序号一一对应
+        unique_count = 0
+        
+        def accept(item: dict) -> bool:
+            """去重：完全重复或近似重复（累加到代表条目的duplicates上）时返回False"""
+            nonlocal unique_count
             identifier = (item['title'], item['url'])
-            if identifier not in seen:
-                seen.add(identifier)
-                unique_news.append(item)
+            if identifier in seen:
+                return False
+            seen.add(identifier)
+            item['duplicates'] = 0
+            item_fingerprint = fingerprint(self.__fingerprint_text__(item))
+            if item_fingerprint is not None:
+                match = near_duplicates.find(item_fingerprint)
+                if match is not None:
+                    representatives[match]['duplicates'] += 1
+                    log_global_debug(f"近似重复新闻: {item['title']} -> {representatives[match]['title']}")
+                    return False
+                near_duplicates.add(item_fingerprint)
+                representatives.append(item)
+            unique_count += 1
+            return True
         
-        log_global_debug(f"去重后数量: {len(unique_news)}")
+        # 各任务把新闻放入队列，结束时放入None
+        queue = asyncio.Queue()
+        tasks = []
+        if not refresh:
+            tasks += [
+                asyncio.ensure_future(self.__collect_archived__(term, start_str, end_str, include_content, queue))
+                for term in search_terms
+            ]
+        tasks += [
+            asyncio.ensure_future(self.__collect_source__(source, term, industry, start_str, end_str, include_content,
+                                                          refresh, queue))
+            for source in self.sources for term in search_terms
+        ]
+        pending = len(tasks)
+        try:
+            while pending:
+                item = await queue.get()
+                if item is None:
+                    pending -= 1
+                    continue
+                found_count += 1
+                if accept(item):
+                    yield item
+                if found_count == max_results * 2:  # 放宽初步限制
+                    log_global_info("已达到初步结果限制，停止其余抓取")
+                    for task in tasks:
+                        task.cancel()
+        finally:
+            # 调用方提前停止迭代时取消仍在进行的抓取
+            for task in tasks:
+                task.cancel()
         
+        log_global_info(f"去重前 {found_count} 条，去除完全重复后 {len(seen)} 条，合并近似重复后 {unique_count} 条")
+
+    async def __collect_archived__(self, term: str, start_date: str, end_date: str, include_content: bool,
+                                   queue: asyncio.Queue):
+        """把存档中关键词在日期范围内的新闻放入队列（没有正文的按需获取），结束时放入None"""
+        try:
+            archived = await asyncio.to_thread(self.archive.query, term, start_date, end_date, include_content)
+            if include_content:
+                await self.__fill_archived_content__(archived, term)
+            log_global_info(f"存档中有关键词 {term} 的新闻 {len(archived)} 条")
+            for item in archived:
+                queue.put_nowait(item)
+        except Exception as e:
+            log_global_error(f"读取存档失败: {str(e)}")
+        finally:
+            queue.put_nowait(None)
+
+    async def __collect_source__(self, source: NewsSource, term: str, industry: str, start_date: str, end_date: str,
+                                 include_content: bool, refresh: bool, queue: asyncio.Queue):
+        """
+        在新闻源的时间上限内抓取关键词未被存档覆盖的日期，新闻放入队列，结束时放入None
+        
+        超时或出错时已放入队列的新闻照常使用，已抓取的部分同样写入存档。
+        """
+        state = {"range": None, "crawled": [], "progress": {}}
+        total = 0
+        try:
+            if refresh:
+                ranges = [(start_date, end_date)]
+            else:
+                ranges = await asyncio.to_thread(self.archive.missing_ranges, source.name, term, start_date, end_date,
+                                                 include_content)
+            if not ranges:
+                log_global_info(f"{source.name} 关键词 {term} 的日期范围已被存档覆盖，无需抓取")
+                return
+            log_global_info(f"正在从 {source.name} 搜索关键词: {term}, 未覆盖的日期: {ranges}")
+            total = await asyncio.wait_for(self.__drain_source__(source, term, industry, ranges, include_content, queue, state),
+                                           source.timeout)
+            log_global_info(f"{source.name} 关键词 {term} 获取到 {total} 条结果")
+        except asyncio.TimeoutError:
+            log_global_warning(f"{source.name} 搜索 {term} 超过 {source.timeout} 秒，使用已获取的 {len(state['crawled'])} 条")
+            if state["range"]:
+                await self.__archive_crawled__(source.name, term, state["crawled"], *state["range"], include_content, False)
+        except Exception as e:
+            error_msg = f"搜索 {term} 失败: {str(e)}"
+            log_global_error(error_msg)
+        finally:
+            queue.put_nowait(None)
+
+    async def __drain_source__(self, source: NewsSource, term: str, industry: str, ranges: list, include_content: bool,
+                               queue: asyncio.Queue, state: dict) -> int:
+        """依次抓取各个日期区间，新闻放入队列，每个区间结束后写入存档；达到新闻源的数量上限后停止"""
+        total = 0
+        for range_start, range_end in ranges:
+            state.update(range=(range_start, range_end), crawled=[], progress={})
+            items = source.iter_news(term, industry, range_start, range_end, include_content=include_content,
+                                     progress=state["progress"])
+            try:
+                async for item in items:
+                    state["crawled"].append(item)
+                    total += 1
+                    queue.put_nowait(item)
+                    if total >= source.max_results:
+                        break
+            finally:
+                # 提前停止时关闭生成器，取消其未完成的正文获取
+                await items.aclose()
+            # 因数量上限提前停止时该区间不完整
+            complete = state["progress"].get("complete", False) and total < source.max_results
+            await self.__archive_crawled__(source.name, term, state["crawled"], range_start, range_end, include_content,
+                                           complete)
+            state["range"] = None
+            if total >= source.max_results:
+                log_global_info(f"{source.name} 关键词 {term} 已达到数量上限 {source.max_results}")
+                break
+        return total
+
+    async def __archive_crawled__(self, source_name: str, term: str, crawled: list, start_date: str, end_date: str,
+                                  include_content: bool, complete: bool):
+        """
+        把抓取结果写入存档并记录覆盖范围
+        
+        完整翻完时间范围时整个范围视为已覆盖；因数量上限或请求失败提前停止时，
+        搜索结果按时间倒序，只有晚于最早一条新闻所在日期的日期是完整的。
+        """
+        # 获取失败的正文不写入存档
+        records = [
+            dict(item, content=None) if (item.get('content') or "").startswith(ARTICLE_ERROR_PREFIXES) else item
+            for item in crawled
+        ]
+        await asyncio.to_thread(self.archive.add, records, term)
+        if not complete:
+            dates = sorted(item['date'][:10] for item in crawled if item.get('date'))
+            if not dates:
+                return
+            start_date = (datetime.strptime(dates[0], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            if start_date > end_date:
+                return
+        await asyncio.to_thread(self.archive.mark_covered, source_name, term, start_date, end_date, include_content)
+
+    async def __fill_archived_content__(self, items: list, term: str):
+        """获取存档中没有正文的新闻的正文（优先命中文章缓存），并写回存档"""
+        missing = [item for item in items if item.get('content') is None]
+        if not missing:
+            return
+        contents = await asyncio.gather(*(self.__get_article_content__(item['url']) for item in missing))
+        for item, content in zip(missing, contents):
+            item['content'] = content
+        records = [item for item in missing if not item['content'].startswith(ARTICLE_ERROR_PREFIXES)]
+        await asyncio.to_thread(self.archive.add, records, term)
+
+    def __fingerprint_text__(self, item: dict) -> str:
+        """近似重复检测使用的文本：标题 + 正文开头（正文获取失败或未获取时只用标题）"""
+        content = item.get('content') or ""
+        if content.startswith(ARTICLE_ERROR_PREFIXES):
+            content = ""
+        return item['title'] + content[:FINGERPRINT_CONTENT_CHARS]
+
+    async def fetch_news(self, company: str = "", industry: str = "", days: int = 1, max_results: int = 50,
+                         include_content: bool = True, refresh: bool = False):
+        """获取新浪新闻数据（include_content为False时只返回标题、链接、日期和来源，正文通过fetch_article按需获取；refresh为True时忽略存档重新抓取）"""
+        start_time = time.time()
+        unique_news = [item async for item in self.iter_news(company, industry, days, max_results, include_content, refresh)]
+        return self.build_result_dict(unique_news, max_results, start_time)
+
+    def build_result_dict(self, unique_news: list, max_results: int, start_time: float) -> dict:
+        """
+        按日期排序（最新的在前）并截取前max_results条，转换为"新闻1"、"新闻2"...的字典
+        
+        Args:
+            unique_news: 去重后的新闻列表
+            max_results: 最大返回数量
+            start_time: 开始获取的时间戳，用于记录耗时
+            
+        Returns:
+            新闻字典
+        """
         # 按日期排序（最新的在前）
         unique_news.sort(key=lambda x: x['date'], reverse=True)
         
@@ -577,16 +1036,45 @@ class NewsDataCollector():
             result_dict[f"新闻{i}"] = news_item
         
         execution_time = time.time() - start_time
-        log_global_info(f"新闻获取完成，总共找到 {len(all_news)} 条新闻，去重后 {len(unique_news)} 条，返回 {len(final_results)} 条，耗时 {execution_time:.2f} 秒")
+        log_global_info(f"新闻获取完成，去重后共 {len(unique_news)} 条，返回 {len(final_results)} 条，耗时 {execution_time:.2f} 秒")
         return result_dict
 
+class SinaNewsSource(NewsSource):
+    """新浪新闻搜索（search.sina.com.cn），使用所属采集器的连接池、文章缓存和每主机并发限制"""
+
+    name = "sina"
+
+    def __init__(self, collector: NewsDataCollector, timeout: float = SOURCE_TIMEOUT, max_results: int = SOURCE_MAX_RESULTS):
+        """
+        初始化新浪新闻源
+
+        Args:
+            collector: 所属的新闻采集器
+            timeout: 处理一个关键词的时间上限（秒）
+            max_results: 每个关键词最多返回的新闻数
+        """
+        super().__init__(timeout, max_results)
+        self.collector = collector
+
+    def iter_news(self, keyword: str, industry: str, start_date: str, end_date: str, include_content: bool = True,
+                  progress: Optional[dict] = None):
+        """逐条产出新浪新闻（异步生成器）"""
+        return self.collector.__iter_sina_news__(keyword, industry, start_date, end_date, self.max_results,
+                                                 include_content, progress)
+
 # Define the fetch_news tool for MCP
 @app.tool()
 async def fetch_news(
     company: str = "",
     industry: str = "",
     days: int = 1,
-    max_results: int = 100
+    max_results: int = 100,
+    include_content: bool = True,
+    max_content_chars: int = 0,
+    max_total_chars: int = 0,
+    refresh: bool = False,
+    stream_only: bool = False,
+    ctx: Optional[Context] = None
 ) -> dict:
     """
     Fetch news about a company or industry from Sina News.
@@ -596,24 +1084,276 @@ async def fetch_news(
         industry: Industry name to search for
         days: Number of days to look back for news (default: 1)
         max_results: Maximum number of results to return (default: 100)
+        include_content: Download article bodies (default: True). Set to False
+            to get headlines (source, title, url, date) within seconds, then
+            use fetch_article / fetch_articles for the articles you need
+        max_content_chars: Character budget per article (default: 0, no
+            limit; 800 is a good value to save context). Longer articles are
+            replaced by an extractive summary (TextRank over sentences,
+            computed locally) and flagged with "summarized"
+        max_total_chars: Character budget for all contents in the response
+            (default: 0, no limit; e.g. 30000), shared evenly with unused
+            budget of short articles going to longer ones
+        refresh: Crawl the whole date range again instead of answering the
+            days already covered from the local news archive (default: False)
+        stream_only: Drop the content of items already sent in partial batches
+            from the final result (default: False). By default streaming is
+            progress only: every item is still buffered and returned again in
+            full at the end. With stream_only=True and a client context, streamed
+            items keep only their headline fields plus streamed=True, so the
+            server holds at most one batch of article bodies at a time
+        
+    Summarized items carry summarized=True and content_length (length of the
+    full text); call fetch_article with the item url for the full text.
+        
+    Progress notifications are sent as items arrive (when the client passes a
+    progress token), and every few items a partial batch is sent as a log
+    notification (logger "fetch_news", JSON {"batch": n, "items": [...]}).
         
     Returns:
         Dictionary of news items with keys "新闻1", "新闻2", etc.
-        Each value contains source, title, url, date, content and search term
+        Each value contains source, title, url, date, search term, duplicates
+        (number of near-duplicate reprints merged into this item) and, when
+        include_content is True, content
     """
-    log_global_info(f"MCP工具被调用: fetch_news(company='{company}', industry='{industry}', days={days}, max_results={max_results})")
+    log_global_info(f"MCP工具被调用: fetch_news(company='{company}', industry='{industry}', days={days}, max_results={max_results}, include_content={include_content}, max_content_chars={max_content_chars}, max_total_chars={max_total_chars}, refresh={refresh})")
+    start_time = time.time()
     collector = NewsDataCollector()
-
-    result = await collector.fetch_news(
-        company=company,
-        industry=industry,
-        days=days,
-        max_results=max_results
-    )
+    # 只有客户端能收到部分结果时，才在最终结果中去掉已推送新闻的正文
+    drop_streamed = stream_only and ctx is not None
+    
+    news = []
+    batch = []
+    batch_count = 0
+    async for item in collector.iter_news(company, industry, days, max_results, include_content, refresh):
+        news.append(item)
+        batch.append(item)
+        await __notify_client__(ctx, "report_progress", len(news), max_results, f"已获取 {len(news)} 条新闻: {item['title']}")
+        if len(batch) >= PARTIAL_BATCH_SIZE:
+            batch_count += 1
+            batch = await asyncio.to_thread(__summarize_items__, batch, max_content_chars)
+            await __notify_client__(ctx, "log", "info", json.dumps({"batch": batch_count, "items": batch}, ensure_ascii=False),
+                                    logger_name="fetch_news")
+            if drop_streamed:
+                news[-len(batch):] = [__streamed_headline__(entry) for entry in news[-len(batch):]]
+            batch = []
+    if batch:
+        batch_count += 1
+        batch = await asyncio.to_thread(__summarize_items__, batch, max_content_chars)
+        await __notify_client__(ctx, "log", "info", json.dumps({"batch": batch_count, "items": batch}, ensure_ascii=False),
+                                logger_name="fetch_news")
+        if drop_streamed:
+            news[-len(batch):] = [__streamed_headline__(entry) for entry in news[-len(batch):]]
     
-    log_global_info(f"MCP工具调用完成，返回结果数量: {len(result)}")
+    result = collector.build_result_dict(news, max_results, start_time)
+    # 按每篇和总字符上限压缩正文（部分结果只按每篇上限压缩）
+    summarized = await asyncio.to_thread(__summarize_items__, list(result.values()), max_content_chars, max_total_chars)
+    result = dict(zip(result.keys(), summarized))
+    log_global_info(f"MCP工具调用完成，返回结果数量: {len(result)}，其中 {sum(1 for item in summarized if item.get('summarized'))} 条正文为摘要")
     return result
 
+
+def __streamed_headline__(item: dict) -> dict:
+    """已推送给客户端的新闻只保留标题等字段（去掉正文），并标记streamed"""
+    headline = {key: value for key, value in item.items() if key != 'content'}
+    headline['streamed'] = True
+    return headline
+
+
+def __summarize_items__(items: list, max_content_chars: int, max_total_chars: int = 0) -> list:
+    """
+    按每篇和总字符上限把过长的正文替换为抽取式摘要
+    
+    Args:
+        items: 新闻列表（不修改）
+        max_content_chars: 每篇正文的字符上限，不大于0表示不限制
+        max_total_chars: 所有正文的总字符上限，不大于0表示不限制
+        
+    Returns:
+        新的新闻列表，被压缩的新闻带有summarized和content_length（全文长度）字段
+    """
+    lengths = [len(item.get('content') or '') for item in items]
+    caps = [min(length, max_content_chars) if max_content_chars > 0 else length for length in lengths]
+    budgets = allocate_budget(caps, max_total_chars)
+    summarized = []
+    for item, length, budget in zip(items, lengths, budgets):
+        if budget < length:
+            item = dict(item)
+            item['content'] = summarize(item['content'], budget) if budget > 0 else ""
+            item['content_length'] = length
+            item['summarized'] = True
+        summarized.append(item)
+    return summarized
+
+
+async def __notify_client__(ctx: Optional[Context], method: str, *args, **kwargs):
+    """向客户端发送进度或日志通知，没有上下文或发送失败时忽略（不影响新闻获取）"""
+    if ctx is None:
+        return
+    try:
+        await getattr(ctx, method)(*args, **kwargs)
+    except Exception as e:
+        log_global_debug(f"发送客户端通知失败: {str(e)}")
+
+
+def __build_article_error__(url: str, e: Exception) -> dict:
+    """构建文章获取失败的标准错误返回"""
+    log_global_error(f"获取文章'{url}'失败: {str(e) or type(e).__name__}")
+    return {
+        "error": str(e) or type(e).__name__,
+        "url": url,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@app.tool()
+async def fetch_article(url: str) -> dict:
+    """
+    Fetch the body of one news article, e.g. a url returned by fetch_news.
+    
+    Args:
+        url: Article url (Sina redirect links are resolved)
+        
+    Returns:
+        Dictionary with url (after redirect) and content, or an error dictionary
+    """
+    log_global_info(f"MCP工具被调用: fetch_article(url='{url}')")
+    try:
+        return await NewsDataCollector().fetch_article(url)
+    except Exception as e:
+        return __build_article_error__(url, e)
+
+
+@app.tool()
+async def fetch_articles(urls: list[str]) -> dict:
+    """
+    Fetch the bodies of several news articles in one call.
+    
+    Articles are downloaded concurrently (limited per host) and served from
+    the article cache when possible.
+    
+    Args:
+        urls: Article urls, e.g. urls returned by fetch_news
+        
+    Returns:
+        Dictionary with "results" (requested url -> {url, content}),
+        "errors" (requested url -> error dictionary) and a "summary" of the batch
+    """
+    log_global_info(f"MCP工具被调用: fetch_articles({len(urls)}个链接)")
+    start_time = time.time()
+    urls = list(dict.fromkeys(url for url in urls if url))
+    collector = NewsDataCollector()
+    
+    async def fetch_one(url):
+        try:
+            return url, await collector.fetch_article(url)
+        except Exception as e:
+            return url, e
+    
+    results = {}
+    errors = {}
+    for url, article in await asyncio.gather(*(fetch_one(url) for url in urls)):
+        if isinstance(article, Exception):
+            errors[url] = __build_article_error__(url, article)
+        else:
+            results[url] = article
+    
+    summary = {
+        "requested": len(urls),
+        "succeeded": len(results),
+        "failed": len(errors),
+        "elapsed_seconds": round(time.time() - start_time, 2)
+    }
+    log_global_info(f"批量获取文章完成: {summary}")
+    return {
+        "results": results,
+        "errors": errors,
+        "summary": summary
+    }
+
+
+@app.tool()
+async def search_news_archive(
+    keyword: str = "",
+    start_date: str = "",
+    end_date: str = "",
+    limit: int = 50,
+    include_content: bool = False,
+    max_content_chars: int = 0
+) -> dict:
+    """
+    Search the local archive of every news item collected by fetch_news,
+    without contacting Sina.
+    
+    Args:
+        keyword: Words to search in titles and contents, separated by spaces
+            (all must match); empty to filter by date only
+        start_date: Start date in YYYY-MM-DD format (optional)
+        end_date: End date in YYYY-MM-DD format, inclusive (optional)
+        limit: Maximum number of results (default: 50)
+        include_content: Return article contents (default: False)
+        max_content_chars: Character budget per article when include_content
+            is True (default: 0, no limit; e.g. 800)
+        
+    Returns:
+        Dictionary with "results" (news items, newest first) and a "summary"
+        with the number of matches and the query time in milliseconds
+    """
+    log_global_info(f"MCP工具被调用: search_news_archive(keyword='{keyword}', start_date='{start_date}', end_date='{end_date}', limit={limit}, include_content={include_content})")
+    start_time = time.perf_counter()
+    try:
+        for date in (start_date, end_date):
+            if date:
+                datetime.strptime(date, "%Y-%m-%d")
+        items = await asyncio.to_thread(news_archive.search, keyword, start_date, end_date, limit, include_content)
+    except Exception as e:
+        log_global_error(f"检索新闻存档失败: {str(e)}")
+        return {"error": str(e), "timestamp": datetime.now().isoformat()}
+    if include_content:
+        items = __summarize_items__([dict(item, content=item['content'] or "") for item in items], max_content_chars)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    log_global_info(f"存档检索完成，命中 {len(items)} 条，耗时 {elapsed_ms:.1f}ms")
+    return {
+        "results": items,
+        "summary": {
+            "matched": len(items),
+            "elapsed_ms": round(elapsed_ms, 2)
+        }
+    }
+
+
+@app.tool()
+async def get_news_server_stats() -> dict:
+    """
+    Report HTTP statistics of the news server.
+    
+    Returns:
+        Dictionary with connection pool counters (requests, connections opened
+        vs. reused overall and per host, DNS cache hits, compressed responses)
+        and article cache counters (hits, misses, stale, revalidated, evictions, size)
+        and redirect cache counters (hits, misses, coalesced, stored, failures, entries)
+        and per-domain content selector stats (learned selector, extractions,
+        hit rate of the learned selector, rate of whole-body fallbacks)
+        and news archive counters (items, covered vs. missing days, searches)
+        and retry counters per request type (attempts, retries, hedged requests
+        and how often the hedge won, remaining retry budget, hedge delay)
+        and per-host request pacing (current rate and interval, waits,
+        speed-ups and back-offs by cause: throttled, blocked, slow, errors)
+    """
+    return {
+        "http": http_client.get_stats(),
+        "article_cache": article_cache.get_stats(),
+        "redirect_cache": redirect_cache.get_stats(),
+        "selector_cache": selector_cache.get_stats(),
+        "news_archive": news_archive.get_stats(),
+        "politeness": politeness_controller.get_stats(),
+        "retries": {
+            "search": search_retry.get_stats(),
+            "redirect": redirect_retry.get_stats(),
+            "article": article_retry.get_stats()
+        }
+    }
+
 if __name__ == "__main__":
     # Run the MCP server
     app.run(transport='stdio')
\ No newline at end of file
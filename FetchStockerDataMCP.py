@@ -8,10 +8,19 @@ import asyncio
 import unittest
 import logging
 import os
+import threading
+import time
+from typing import Optional
 from mcp.server.fastmcp import FastMCP
 
 # Import global logger functions
 from logger_utils import log_global_info, log_global_debug, log_global_warning, log_global_error
+from stock_cache_utils import SecurityMasterCache, BarStore, SingleFlight
+from symbol_resolver_utils import SymbolResolver
+from trading_calendar_utils import TradingCalendar, latest_bar_date, fallback_window
+from upstream_utils import UpstreamGuard
+from stock_format_utils import RESPONSE_FORMATS, encode_compact_time_series
+from indicator_utils import build_panel, compute_indicators, latest_indicator_values, list_indicators, resolve_indicator_names
 
 # Create MCP server
 app = FastMCP("stock-data-fetcher")
@@ -19,19 +28,132 @@ app = FastMCP("stock-data-fetcher")
 # Remove old logging configuration
 log_global_info("FetchStockerDataMCP模块已加载")
 
+# 各akshare接口的限流（每秒次数、突发次数）、单次调用截止时间（秒）和断路器参数
+UPSTREAM_LIMITS = {
+    "stock_zh_a_hist": {"rate_per_second": 3, "burst": 6, "timeout_seconds": 20},
+    "stock_info_a_code_name": {"rate_per_second": 0.2, "burst": 2, "timeout_seconds": 60},
+    "stock_sh_a_spot_em": {"rate_per_second": 0.2, "burst": 2, "timeout_seconds": 60},
+    "stock_sz_a_spot_em": {"rate_per_second": 0.2, "burst": 2, "timeout_seconds": 60},
+    "tool_trade_date_hist_sina": {"rate_per_second": 0.2, "burst": 2, "timeout_seconds": 30}
+}
+UPSTREAM_FAILURE_THRESHOLD = 5
+UPSTREAM_RESET_SECONDS = 30
+
+upstream_guard = UpstreamGuard()
+for endpoint_name, limits in UPSTREAM_LIMITS.items():
+    upstream_guard.register_endpoint(
+        endpoint_name,
+        failure_threshold=UPSTREAM_FAILURE_THRESHOLD,
+        reset_seconds=UPSTREAM_RESET_SECONDS,
+        **limits
+    )
+
+
+def call_akshare(name: str, **kwargs):
+    """
+    在限流、截止时间和断路器保护下调用akshare接口
+    
+    Args:
+        name: akshare函数名，需在UPSTREAM_LIMITS中配置
+        **kwargs: 传给akshare函数的参数
+        
+    Returns:
+        akshare函数的返回值
+    """
+    return upstream_guard.call(name, getattr(ak, name), **kwargs)
+
+
+# 证券主数据缓存（进程内共享，磁盘快照跨重启复用；上游失败时继续使用过期数据）
+security_master = SecurityMasterCache()
+security_master.register_table("a_code_name", lambda: call_akshare("stock_info_a_code_name"))
+security_master.register_table("sh_spot", lambda: call_akshare("stock_sh_a_spot_em")[['代码', '名称']])
+security_master.register_table("sz_spot", lambda: call_akshare("stock_sz_a_spot_em")[['代码', '名称']])
+
+# 交易日历按年发布，很少变化
+TRADE_CALENDAR_TTL_HOURS = 24 * 7
+security_master.register_table(
+    "trade_calendar",
+    lambda: call_akshare("tool_trade_date_hist_sina").assign(
+        trade_date=lambda df: pd.to_datetime(df['trade_date']).dt.strftime('%Y-%m-%d')
+    ),
+    ttl_hours=TRADE_CALENDAR_TTL_HOURS
+)
+
+# 本地日线存储（按股票代码和复权方式增量更新）
+bar_store = BarStore()
+
+# 并发的相同请求合并为一次上游获取和计算
+request_coalescer = SingleFlight()
+
+# 支持的复权方式
+ADJUST_NAMES = {"qfq": "前复权", "hfq": "后复权", "": "不复权"}
+
+# 自动采用解析结果的最低得分，低于该值视为未找到
+RESOLVER_MIN_SCORE = 0.6
+
+# 批量获取股票数据时默认的最大并发数
+BATCH_MAX_CONCURRENCY = 4
+
+symbol_resolver = None
+symbol_resolver_source = None
+symbol_resolver_lock = threading.Lock()
+
+trading_calendar = None
+trading_calendar_source = None
+trading_calendar_lock = threading.Lock()
+
+
+def get_symbol_resolver() -> SymbolResolver:
+    """
+    获取基于当前证券主数据构建的名称索引，主数据刷新后自动重建
+    
+    Returns:
+        SymbolResolver实例
+    """
+    global symbol_resolver, symbol_resolver_source
+    stock_list = security_master.get_table("a_code_name")
+    with symbol_resolver_lock:
+        if symbol_resolver is None or symbol_resolver_source is not stock_list:
+            symbol_resolver = SymbolResolver(zip(stock_list['code'], stock_list['name']))
+            symbol_resolver_source = stock_list
+        return symbol_resolver
+
+
+def get_trading_calendar() -> TradingCalendar:
+    """
+    获取基于缓存交易日历构建的索引，日历刷新后自动重建
+    
+    Returns:
+        TradingCalendar实例
+    """
+    global trading_calendar, trading_calendar_source
+    calendar_df = security_master.get_table("trade_calendar")
+    with trading_calendar_lock:
+        if trading_calendar is None or trading_calendar_source is not calendar_df:
+            trading_calendar = TradingCalendar(calendar_df['trade_date'])
+            trading_calendar_source = calendar_df
+        return trading_calendar
+
 
 class StockerDataCollector():
    
     def __init__(self):
         pass
 
-    def fetch_stock_data(self, company_name: str, days: int = 30):
+    def fetch_stock_data(self, company_name: str, days: int = 30, adjust: str = "qfq", indicators: Optional[list] = None,
+                         response_format: str = "full"):
         """
         获取A股股票历史数据并格式化为标准JSON结构
         
         参数:
             company_name (str): 公司名称，如"工商银行", "贵州茅台"等
-            days (int): 获取历史数据的天数范围，支持1-365天，默认30天
+            days (int): 获取最近多少个交易日的数据，支持1-365，默认30
+            adjust (str): 复权方式，"qfq"前复权(默认)、"hfq"后复权、""不复权
+            indicators (list): 需要返回的技术指标，可选值见indicator_utils.INDICATOR_REGISTRY，
+                默认为["sma5", "sma20", "rsi14"]
+            response_format (str): "full"(默认)返回下方的完整time_series；"compact"返回
+                stock_format_utils.encode_compact_time_series编码的紧凑格式，可用
+                decode_compact_time_series无损还原
         
         返回:
             dict: 格式化的字典，包含以下结构:
@@ -41,7 +163,7 @@ class StockerDataCollector():
                     "symbol": "股票代码",
                     "market": "交易所(SH/SZ)",
                     "update_time": "数据更新时间",
-                    "data_days": 实际获取天数,
+                    "data_days": 实际返回的交易日数（停牌日无数据）,
                     "currency": "CNY"
                 },
                 "statistics": {
@@ -60,7 +182,9 @@ class StockerDataCollector():
                 "technical_indicators": {
                     "sma5": 5日均线值,
                     "sma20": 20日均线值,
-                    "rsi14": 14日RSI值
+                    "rsi14": 14日RSI值,
+                    "macd": {"dif": DIF, "dea": DEA, "hist": 柱状值},  # 仅在indicators中请求时返回
+                    ...
                 },
                 "time_series": {
                     "dates": ["日期1", "日期2", ...],
@@ -84,161 +208,263 @@ class StockerDataCollector():
             }
         """
         try:
-            log_global_info(f"开始获取公司'{company_name}'的股票数据，请求天数: {days}")
-            
-            # 1. 根据公司名称查找股票代码
-            symbol = self.__get_stock_symbol_by_company_name__(company_name)
-            log_global_info(f"公司'{company_name}'对应的股票代码: {symbol}")
-            
-            # 2. 验证和清理股票代码
-            clean_symbol = symbol.split('.')[0]  # 去除交易所后缀
-            if not clean_symbol.isdigit() or (len(clean_symbol) != 6 and len(clean_symbol) != 5):
-                raise ValueError("股票代码必须为5-6位数字")
+            indicators = resolve_indicator_names(indicators)
+            self.__check_response_format__(response_format)
+            self.__check_adjust__(adjust)
+            stock = self.__resolve_stock__(company_name)
             
-            # 3. 确定市场
-            if clean_symbol.startswith(('6', '9')) or len(clean_symbol) == 5:
-                market = "SH"  # 上交所或港股
-            elif clean_symbol.startswith(('0', '2', '3')):
-                market = "SZ"  # 深交所
-            else:
-                market = "SH"  # 默认
-            
-            log_global_info(f"股票代码: {clean_symbol}, 市场: {market}")
-            
-            # 4. 获取数据
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')  # 多获取一些数据以确保准确性
+            def compute():
+                history = self.__load_resolved_history__(company_name, stock, days, adjust)
+                
+                # 6. 计算技术指标
+                indicator_results = compute_indicators(build_panel([history["df"]]), indicators)
+                log_global_info("技术指标计算完成")
+                
+                # 7. 构建结果
+                return self.__build_result__(company_name, history, latest_indicator_values(indicator_results, 0), response_format)
             
-            log_global_info(f"请求数据日期范围: {start_date} 到 {end_date}")
+            # 同一股票、窗口和输出选项的并发请求共享一次计算，只替换公司名称
+            key = ("result", stock[1], days, adjust, tuple(indicators), response_format)
+            shared = request_coalescer.do(key, compute)
+            result = dict(shared, metadata=dict(shared["metadata"], company_name=company_name))
+            log_global_info(f"成功返回公司'{company_name}'的股票数据，数据天数: {result['metadata']['data_days']}")
+            return result
+    
+        except Exception as e:
+            return self.__build_error__(company_name, e)
+    
+    def load_stock_history(self, company_name: str, days: int = 30, adjust: str = "qfq") -> dict:
+        """
+        查找股票代码并获取预处理后的日线数据
+        
+        Args:
+            company_name: 公司名称
+            days: 获取最近多少个交易日的数据
+            adjust: 复权方式
             
-            # 尝试多种数据获取方法
-            df = None
-            errors = []
+        Returns:
+            包含clean_symbol、market和按日期升序排列的日线df的字典
+        """
+        self.__check_adjust__(adjust)
+        return self.__load_resolved_history__(company_name, self.__resolve_stock__(company_name), days, adjust)
+    
+    def __check_adjust__(self, adjust: str):
+        """校验复权方式参数"""
+        if adjust not in ADJUST_NAMES:
+            raise ValueError(f"不支持的复权方式: {adjust}，可选值: qfq, hfq, 空字符串")
+    
+    def __resolve_stock__(self, company_name: str) -> tuple:
+        """
+        查找并校验公司对应的股票代码
+        
+        Args:
+            company_name: 公司名称
             
-            # 使用后复权数据
-            try:
-                log_global_info("尝试获取前复权数据")
-                df = ak.stock_zh_a_hist(
+        Returns:
+            (symbol, clean_symbol, market) 三元组
+        """
+        # 1. 根据公司名称查找股票代码
+        symbol = self.__get_stock_symbol_by_company_name__(company_name)
+        log_global_info(f"公司'{company_name}'对应的股票代码: {symbol}")
+        
+        # 2. 验证和清理股票代码
+        clean_symbol = symbol.split('.')[0]  # 去除交易所后缀
+        if not clean_symbol.isdigit() or (len(clean_symbol) != 6 and len(clean_symbol) != 5):
+            raise ValueError("股票代码必须为5-6位数字")
+        
+        # 3. 确定市场
+        if clean_symbol.startswith(('6', '9')) or len(clean_symbol) == 5:
+            market = "SH"  # 上交所或港股
+        elif clean_symbol.startswith(('0', '2', '3')):
+            market = "SZ"  # 深交所
+        else:
+            market = "SH"  # 默认
+        
+        log_global_info(f"股票代码: {clean_symbol}, 市场: {market}")
+        return symbol, clean_symbol, market
+    
+    def __load_resolved_history__(self, company_name: str, stock: tuple, days: int, adjust: str) -> dict:
+        """按(股票代码, 天数, 复权方式)合并并发请求后获取日线，返回的df由调用方共享且只读"""
+        return request_coalescer.do(
+            ("history", stock[1], days, adjust),
+            lambda: self.__load_history__(company_name, stock, days, adjust)
+        )
+    
+    def __load_history__(self, company_name: str, stock: tuple, days: int, adjust: str) -> dict:
+        """获取并预处理日线数据"""
+        symbol, clean_symbol, market = stock
+        log_global_info(f"开始获取公司'{company_name}'的股票数据，请求天数: {days}")
+        
+        # 4. 获取数据（按交易日历换算最近days个交易日的精确区间）
+        start_date, end_date = self.__get_date_window__(days)
+        
+        log_global_info(f"请求数据日期范围: {start_date} 到 {end_date}")
+        
+        # 尝试多种数据获取方法
+        df = None
+        errors = []
+        adjust_name = ADJUST_NAMES[adjust]
+        
+        # 优先使用本地日线存储，只向上游获取缺失的日期
+        try:
+            log_global_info(f"尝试获取{adjust_name}数据")
+            df = bar_store.get_bars(
+                clean_symbol,
+                adjust,
+                start_date,
+                end_date,
+                lambda fetch_start, fetch_end: call_akshare(
+                    "stock_zh_a_hist",
                     symbol=clean_symbol,
                     period="daily",
-                    start_date=start_date,
-                    end_date=end_date,
-                    adjust="qfq"  # 后复权
+                    start_date=fetch_start,
+                    end_date=fetch_end,
+                    adjust=adjust
                 )
-                if not df.empty:
-                    log_global_info("成功获取前复权数据")
-            except Exception as e:
-                error_msg = f"前复权数据获取失败: {str(e)}"
-                errors.append(error_msg)
-                log_global_warning(error_msg)
-            
-            
-            # 如果失败了
-            if df is None or df.empty:
-                error_message = f"未获取到公司 {company_name}({symbol}) 的数据，请检查代码是否正确或日期范围是否有效"
-                if errors:
-                    error_message += f" 错误详情: {'; '.join(errors)}"
-                log_global_error(error_message)
-                raise ValueError(error_message)
-            
-            log_global_info(f"成功获取到数据，原始数据条数: {len(df)}")
-            
-            # 5. 数据预处理
-            # 只取最近的指定天数数据
-            df = df.tail(days)
-            df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
-            df.set_index('日期', inplace=True)
-            df = df.sort_index()  # 确保日期升序排列
-            
-            log_global_info(f"处理后数据条数: {len(df)}")
-            
-            # 6. 计算技术指标（处理可能的NaN值）
-            df['5日均线'] = df['收盘'].rolling(5, min_periods=1).mean().round(2)
-            df['20日均线'] = df['收盘'].rolling(20, min_periods=1).mean().round(2)
-            rsi_values = self.__calculate_rsi__(df['收盘'])
-            
-            log_global_info("技术指标计算完成")
-            
-            # 7. 构建结果
-            # 检查DataFrame是否为空
-            if df.empty:
-                error_msg = f"未获取到公司 {company_name}({symbol}) 的有效数据，请检查代码是否正确或日期范围是否有效"
-                log_global_error(error_msg)
-                raise ValueError(error_msg)
-            
-            # 安全地提取技术指标
-            sma5 = None
-            sma20 = None
-            rsi14 = None
+            )
+            if not df.empty:
+                log_global_info(f"成功获取{adjust_name}数据")
+        except Exception as e:
+            error_msg = f"{adjust_name}数据获取失败: {str(e)}"
+            errors.append(error_msg)
+            log_global_warning(error_msg)
+        
+        
+        # 如果失败了
+        if df is None or df.empty:
+            error_message = f"未获取到公司 {company_name}({symbol}) 的数据，请检查代码是否正确或日期范围是否有效"
+            if errors:
+                error_message += f" 错误详情: {'; '.join(errors)}"
+            log_global_error(error_message)
+            raise ValueError(error_message)
+        
+        log_global_info(f"成功获取到数据，原始数据条数: {len(df)}")
+        
+        # 5. 数据预处理
+        # 只取最近的指定天数数据
+        df = df.tail(days)
+        df['日期'] = pd.to_datetime(df['日期']).dt.strftime('%Y-%m-%d')
+        df.set_index('日期', inplace=True)
+        df = df.sort_index()  # 确保日期升序排列
+        
+        log_global_info(f"处理后数据条数: {len(df)}")
+        
+        # 检查DataFrame是否为空
+        if df.empty:
+            error_msg = f"未获取到公司 {company_name}({symbol}) 的有效数据，请检查代码是否正确或日期范围是否有效"
+            log_global_error(error_msg)
+            raise ValueError(error_msg)
+        
+        return {
+            "clean_symbol": clean_symbol,
+            "market": market,
+            "df": df
+        }
+    
+    def build_stock_results(self, histories: dict, indicators: Optional[list] = None, response_format: str = "full") -> dict:
+        """
+        在同一个面板上计算多只股票的技术指标并构建结果
+        
+        Args:
+            histories: 公司名称 -> load_stock_history的返回值
+            indicators: 技术指标名称列表，为None时使用默认指标
+            response_format: time_series格式，"full"或"compact"
             
-            try:
-                if len(df) > 0:
-                    # 提取5日均线
-                    if len(df) >= 5 and not pd.isna(df['5日均线'].iloc[-1]):
-                        sma5 = round(df['5日均线'].iloc[-1], 2)
-                    
-                    # 提取20日均线
-                    if len(df) >= 20 and not pd.isna(df['20日均线'].iloc[-1]):
-                        sma20 = round(df['20日均线'].iloc[-1], 2)
-                    
-                    # 提取RSI
-                    if len(rsi_values) > 0 and not pd.isna(rsi_values.iloc[-1]):
-                        rsi14 = round(rsi_values.iloc[-1], 2)
-            except Exception as e:
-                log_global_warning(f"提取技术指标时发生错误: {str(e)}")
+        Returns:
+            公司名称 -> 与fetch_stock_data相同结构的结果
+        """
+        names = list(histories.keys())
+        if not names:
+            return {}
+        indicator_results = compute_indicators(build_panel([histories[name]["df"] for name in names]), indicators)
+        log_global_info(f"批量技术指标计算完成，股票数: {len(names)}")
+        return {
+            name: self.__build_result__(name, histories[name], latest_indicator_values(indicator_results, row), response_format)
+            for row, name in enumerate(names)
+        }
+    
+    def __get_date_window__(self, days: int) -> tuple:
+        """
+        计算最近days个交易日的请求区间
+        
+        Args:
+            days: 交易日数量
             
-            result = {
-                "metadata": {
-                    "company_name": company_name,
-                    "symbol": f"{clean_symbol}.{'SS' if market == 'SH' else 'SZ'}",
-                    "market": market,
-                    "update_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    "data_days": len(df),
-                    "currency": "CNY"
-                },
-                "statistics": {
-                    "close_price": {
-                        "max": round(df['收盘'].max(), 2) if len(df) > 0 else 0,
-                        "min": round(df['收盘'].min(), 2) if len(df) > 0 else 0,
-                        "current": round(df['收盘'].iloc[-1], 2) if len(df) > 0 else 0,
-                        "change_pct": round(df['涨跌幅'].iloc[-1] * 100, 2) if len(df) > 0 else 0
-                    },
-                    "volume": {
-                        "total": int(df['成交量'].sum()) if len(df) > 0 else 0,
-                        "avg": int(df['成交量'].mean()) if len(df) > 0 and not pd.isna(df['成交量'].mean()) else 0,
-                        "latest": int(df['成交量'].iloc[-1]) if len(df) > 0 else 0
-                    }
-                },
-                "technical_indicators": {
-                    "sma5": sma5,
-                    "sma20": sma20,
-                    "rsi14": rsi14
+        Returns:
+            (start_date, end_date) 二元组，格式YYYYMMDD
+        """
+        try:
+            window = get_trading_calendar().window(days, latest_bar_date())
+        except Exception as e:
+            log_global_warning(f"交易日历不可用: {str(e)}")
+            window = None
+        if window is None:
+            # 日历不可用或未覆盖当前日期时，按自然日放宽区间，再由tail(days)截取
+            window = fallback_window(days)
+            log_global_warning(f"按自然日估算{days}个交易日的请求区间")
+        start, end = window
+        return start.strftime('%Y%m%d'), end.strftime('%Y%m%d')
+    
+    def __build_result__(self, company_name: str, history: dict, indicator_values: dict, response_format: str = "full") -> dict:
+        """根据日线数据和技术指标最新值构建标准结果"""
+        clean_symbol = history["clean_symbol"]
+        market = history["market"]
+        df = history["df"]
+        result = {
+            "metadata": {
+                "company_name": company_name,
+                "symbol": f"{clean_symbol}.{'SS' if market == 'SH' else 'SZ'}",
+                "market": market,
+                "update_time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                "data_days": len(df),
+                "currency": "CNY"
+            },
+            "statistics": {
+                "close_price": {
+                    "max": round(df['收盘'].max(), 2) if len(df) > 0 else 0,
+                    "min": round(df['收盘'].min(), 2) if len(df) > 0 else 0,
+                    "current": round(df['收盘'].iloc[-1], 2) if len(df) > 0 else 0,
+                    "change_pct": round(df['涨跌幅'].iloc[-1] * 100, 2) if len(df) > 0 else 0
                 },
-                "time_series": {
-                    "dates": df.index.tolist(),
-                    "ohlc": {
-                        "open": df['开盘'].round(2).tolist(),
-                        "high": df['最高'].round(2).tolist(),
-                        "low": df['最低'].round(2).tolist(),
-                        "close": df['收盘'].round(2).tolist()
-                    },
-                    "volume": df['成交量'].astype(int).tolist(),
-                    "pct_change": df['涨跌幅'].round(4).tolist()
+                "volume": {
+                    "total": int(df['成交量'].sum()) if len(df) > 0 else 0,
+                    "avg": int(df['成交量'].mean()) if len(df) > 0 and not pd.isna(df['成交量'].mean()) else 0,
+                    "latest": int(df['成交量'].iloc[-1]) if len(df) > 0 else 0
                 }
+            },
+            "technical_indicators": indicator_values,
+            "time_series": {
+                "dates": df.index.tolist(),
+                "ohlc": {
+                    "open": df['开盘'].round(2).tolist(),
+                    "high": df['最高'].round(2).tolist(),
+                    "low": df['最低'].round(2).tolist(),
+                    "close": df['收盘'].round(2).tolist()
+                },
+                "volume": df['成交量'].astype(int).tolist(),
+                "pct_change": df['涨跌幅'].round(4).tolist()
             }
-            
-            log_global_info(f"成功返回公司'{company_name}'的股票数据，数据天数: {result['metadata']['data_days']}")
-            return result
+        }
+        
+        if response_format == "compact":
+            result["time_series"] = encode_compact_time_series(result["time_series"])
+        return result
     
-        except Exception as e:
-            error_msg = {
-                "error": str(e),
-                "company_name": company_name,
-                "timestamp": datetime.now().isoformat(),
-                "solution": "请检查: 1.公司名称是否正确 2.是否为交易日 3.网络连接"
-            }
-            log_global_error(f"获取公司'{company_name}'股票数据时发生错误: {str(e)}")
-            return error_msg
+    def __check_response_format__(self, response_format: str):
+        """校验返回格式参数"""
+        if response_format not in RESPONSE_FORMATS:
+            raise ValueError(f"不支持的返回格式: {response_format}，可选值: {', '.join(RESPONSE_FORMATS)}")
+    
+    def __build_error__(self, company_name: str, e: Exception) -> dict:
+        """构建标准错误返回"""
+        error_msg = {
+            "error": str(e),
+            "company_name": company_name,
+            "timestamp": datetime.now().isoformat(),
+            "solution": "请检查: 1.公司名称是否正确 2.是否为交易日 3.网络连接"
+        }
+        log_global_error(f"获取公司'{company_name}'股票数据时发生错误: {str(e)}")
+        return error_msg
     
     def __get_stock_symbol_by_company_name__(self, company_name: str) -> str:
         """
@@ -252,48 +478,23 @@ class StockerDataCollector():
         """
         log_global_info(f"开始查找公司'{company_name}'的股票代码")
         try:
-            # 获取股票列表
-            log_global_info("获取股票列表数据")
-            stock_list = ak.stock_info_a_code_name()
-            # 在股票列表中查找完全匹配的公司名称
-            exact_match = stock_list[stock_list['name'] == company_name]
-            
-            if not exact_match.empty:
-                # 如果找到完全匹配项，返回第一个
-                symbol = exact_match.iloc[0]['code']
-                log_global_info(f"找到完全匹配的股票代码: {symbol}")
-                # 确定市场
-                if symbol.startswith(('6', '9')):
-                    market = "SH"
-                elif symbol.startswith(('0', '2', '3')):
-                    market = "SZ"
-                else:
-                    market = "SH"  # 默认
-                return f"{symbol}.{'SS' if market == 'SH' else 'SZ'}"
-            
-            # 如果没有完全匹配，尝试模糊匹配
-            log_global_info("未找到完全匹配项，尝试模糊匹配")
-            fuzzy_match = stock_list[stock_list['name'].str.contains(company_name, case=False, na=False)]
-            
-            if not fuzzy_match.empty:
-                # 如果找到模糊匹配项，返回第一个
-                symbol = fuzzy_match.iloc[0]['code']
-                log_global_info(f"找到模糊匹配的股票代码: {symbol}")
-                # 确定市场
-                if symbol.startswith(('6', '9')):
-                    market = "SH"
-                elif symbol.startswith(('0', '2', '3')):
-                    market = "SZ"
-                else:
-                    market = "SH"  # 默认
-                return f"{symbol}.{'SS' if market == 'SH' else 'SZ'}"
+            # 使用预构建的名称索引解析（精确匹配、简称、拼音首字母、模糊匹配）
+            best, candidates = get_symbol_resolver().pick(company_name, RESOLVER_MIN_SCORE)
+            if best:
+                log_global_info(f"找到{best['match']}匹配的股票代码: {best['code']}({best['name']})，得分: {best['score']}")
+                return best['symbol']
+            # 多只股票得分接近（或只匹配到共享简称）时不任选其一，返回候选供调用方确认
+            matches = [c for c in candidates if c['score'] >= RESOLVER_MIN_SCORE]
+            if matches:
+                names = "、".join(f"{c['name']}({c['code']})" for c in matches)
+                raise ValueError(f"公司名称'{company_name}'对应多只股票: {names}，请使用完整名称或股票代码")
             
             # 如果还是没有找到，尝试通过搜索引擎获取
             try:
                 log_global_info("尝试通过搜索引擎获取股票信息")
                 # 获取更全面的股票信息
-                stock_sh = ak.stock_sh_a_spot_em()  # 上海A股
-                stock_sz = ak.stock_sz_a_spot_em()  # 深圳A股
+                stock_sh = security_master.get_table("sh_spot")  # 上海A股
+                stock_sz = security_master.get_table("sz_spot")  # 深圳A股
                 
                 # 在上海股票中查找
                 sh_match = stock_sh[stock_sh['名称'].str.contains(company_name, case=False, na=False)]
@@ -322,74 +523,210 @@ class StockerDataCollector():
             log_global_error(error_msg)
             raise ValueError(error_msg)
 
-    def __calculate_rsi__(self, prices, window=14):
-        """计算RSI指标"""
-        log_global_debug(f"开始计算RSI指标，窗口大小: {window}，数据点数: {len(prices)}")
-        try:
-            if len(prices) < window + 1:
-                log_global_warning(f"数据点数不足，需要至少{window + 1}个点，实际只有{len(prices)}个点")
-                return pd.Series([None] * len(prices), index=prices.index)
-            
-            deltas = prices.diff()
-            seed = deltas[:window+1]
-            up = seed[seed >= 0].sum()/window
-            down = -seed[seed < 0].sum()/window
-            rs = up/down
-            
-            # 创建RSI序列，确保索引正确
-            rsi = pd.Series(index=prices.index, dtype='float64')
-            rsi.iloc[window] = 100. - (100./(1.+rs))
-            
-            for i in range(window+1, len(prices)):
-                delta = deltas.iloc[i-1]  # 使用.iloc进行位置索引
-                if delta > 0:
-                    upval = delta
-                    downval = 0.
-                else:
-                    upval = 0.
-                    downval = -delta
-                
-                up = (up*(window-1) + upval)/window
-                down = (down*(window-1) + downval)/window
-                rs = up/down
-                rsi.iloc[i] = 100. - (100./(1.+rs))
-                
-            log_global_debug(f"RSI指标计算完成，结果长度: {len(rsi)}")
-            return rsi
-        except Exception as e:
-            log_global_error(f"RSI计算过程中发生错误: {str(e)}")
-            # 返回空的RSI序列
-            return pd.Series([None] * len(prices), index=prices.index)
-
 # Define the fetch_stock_data tool for MCP
 @app.tool()
 async def fetch_stock_data(
     company_name: str,
-    days: int = 30
+    days: int = 30,
+    adjust: str = "qfq",
+    indicators: Optional[list[str]] = None,
+    response_format: str = "full"
 ) -> dict:
     """
     Fetch stock data for a given company name.
     
     Args:
         company_name: Company name to fetch stock data for (e.g., "工商银行", "贵州茅台")
-        days: Number of days of historical data to fetch (default: 30)
+        days: Number of most recent trading days to fetch (default: 30)
+        adjust: Price adjustment, "qfq" forward (default), "hfq" backward, "" none
+        indicators: Technical indicators to return, any of "sma5", "sma20", "rsi14",
+            "macd", "boll", "atr14", "kdj", "obv" (default: sma5, sma20, rsi14)
+        response_format: "full" (default) for per-day lists, or "compact" for a smaller
+            packed time_series (start_date + day gaps, integer prices scaled by price_scale
+            with close delta-encoded and open/high/low as offsets from close,
+            delta-encoded volume, pct_change scaled by pct_scale; comma-separated strings)
         
     Returns:
         Dictionary containing stock data including metadata, statistics, 
         technical indicators, and time series data
     """
-    log_global_info(f"MCP工具被调用: fetch_stock_data(company_name='{company_name}', days={days})")
+    log_global_info(f"MCP工具被调用: fetch_stock_data(company_name='{company_name}', days={days}, adjust='{adjust}', indicators={indicators}, response_format='{response_format}')")
     collector = StockerDataCollector()
     # Run the synchronous function in a thread pool to avoid blocking
     loop = asyncio.get_event_loop()
     result = await loop.run_in_executor(None, lambda: collector.fetch_stock_data(
         company_name=company_name,
-        days=days
+        days=days,
+        adjust=adjust,
+        indicators=indicators,
+        response_format=response_format
     ))
     log_global_info(f"MCP工具调用完成，返回结果类型: {type(result)}")
     return result
 
 
+@app.tool()
+async def fetch_stock_data_batch(
+    company_names: list[str],
+    days: int = 30,
+    adjust: str = "qfq",
+    indicators: Optional[list[str]] = None,
+    response_format: str = "full",
+    max_concurrency: int = BATCH_MAX_CONCURRENCY
+) -> dict:
+    """
+    Fetch stock data for several companies in one call.
+    
+    Args:
+        company_names: Company names to fetch (e.g., ["工商银行", "贵州茅台"])
+        days: Number of most recent trading days to fetch (default: 30)
+        adjust: Price adjustment, "qfq" forward (default), "hfq" backward, "" none
+        indicators: Technical indicators to return, same choices as fetch_stock_data
+        response_format: "full" (default) or "compact", same as fetch_stock_data
+        max_concurrency: Maximum number of companies fetched at the same time (default: 4)
+        
+    Returns:
+        Dictionary with "results" (company name -> same structure as fetch_stock_data),
+        "errors" (company name -> error dictionary) and a "summary" of the batch
+    """
+    log_global_info(f"MCP工具被调用: fetch_stock_data_batch(company_names={company_names}, days={days}, adjust='{adjust}', indicators={indicators}, response_format='{response_format}', max_concurrency={max_concurrency})")
+    start_time = time.time()
+    names = list(dict.fromkeys(name for name in company_names if name))
+    loop = asyncio.get_event_loop()
+    collector = StockerDataCollector()
+    
+    try:
+        indicators = resolve_indicator_names(indicators)
+        collector.__check_response_format__(response_format)
+    except ValueError as e:
+        return {
+            "results": {},
+            "errors": {name: collector.__build_error__(name, e) for name in names},
+            "summary": {"requested": len(names), "succeeded": 0, "failed": len(names), "elapsed_seconds": 0}
+        }
+    
+    # 先加载一次名称索引，所有公司共用同一份股票列表
+    try:
+        await loop.run_in_executor(None, get_symbol_resolver)
+    except Exception as e:
+        log_global_warning(f"预加载股票名称索引失败: {str(e)}")
+    
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def fetch_one(name):
+        async with semaphore:
+            try:
+                return name, await loop.run_in_executor(None, lambda: collector.load_stock_history(name, days, adjust))
+            except Exception as e:
+                return name, e
+    
+    # 并发获取日线后，在同一个面板上一次性计算所有股票的技术指标
+    histories = {}
+    errors = {}
+    for name, history in await asyncio.gather(*(fetch_one(name) for name in names)):
+        if isinstance(history, Exception):
+            errors[name] = collector.__build_error__(name, history)
+        else:
+            histories[name] = history
+    try:
+        results = await loop.run_in_executor(None, lambda: collector.build_stock_results(histories, indicators, response_format))
+    except Exception as e:
+        results = {}
+        errors.update({name: collector.__build_error__(name, e) for name in histories})
+    
+    summary = {
+        "requested": len(names),
+        "succeeded": len(results),
+        "failed": len(errors),
+        "elapsed_seconds": round(time.time() - start_time, 2)
+    }
+    log_global_info(f"批量获取完成: {summary}")
+    return {
+        "results": results,
+        "errors": errors,
+        "summary": summary
+    }
+
+
+@app.tool()
+async def resolve_stock_symbol(
+    query: str,
+    limit: int = 5
+) -> dict:
+    """
+    Resolve a company name, short name, pinyin initials or code to ranked stock candidates.
+    
+    Args:
+        query: Name to resolve (e.g., "贵州茅台", "茅台", "GZMT", "600519")
+        limit: Maximum number of candidates to return (default: 5)
+        
+    Returns:
+        Dictionary with the query, ranked candidates (code, name, market, symbol,
+        score, match type; "shared_alias" marks a short name shared by several
+        stocks), the symbol fetch_stock_data would use for this query (None when
+        the query is ambiguous or not found) and the lookup time in milliseconds
+    """
+    log_global_info(f"MCP工具被调用: resolve_stock_symbol(query='{query}', limit={limit})")
+    loop = asyncio.get_event_loop()
+    resolver = await loop.run_in_executor(None, get_symbol_resolver)
+    start_time = time.perf_counter()
+    best, candidates = resolver.pick(query, RESOLVER_MIN_SCORE, limit=limit)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    return {
+        "query": query,
+        "candidates": candidates,
+        "resolved": best['symbol'] if best else None,
+        "elapsed_ms": round(elapsed_ms, 3)
+    }
+
+
+@app.tool()
+async def list_stock_indicators() -> dict:
+    """
+    List the technical indicators that fetch_stock_data can return.
+    
+    Returns:
+        Dictionary mapping indicator name to its description
+    """
+    return list_indicators()
+
+
+@app.tool()
+async def refresh_security_master(table: str = "") -> dict:
+    """
+    Force a reload of the cached security master tables from upstream.
+    
+    Args:
+        table: Table to refresh ("a_code_name", "sh_spot", "sz_spot", "trade_calendar"); empty refreshes all
+        
+    Returns:
+        Dictionary mapping each refreshed table to its new row count or an error message
+    """
+    log_global_info(f"MCP工具被调用: refresh_security_master(table='{table}')")
+    loop = asyncio.get_event_loop()
+    result = await loop.run_in_executor(None, lambda: security_master.refresh(table or None))
+    log_global_info(f"主数据刷新完成: {result}")
+    return result
+
+
+@app.tool()
+async def get_stock_server_stats() -> dict:
+    """
+    Report cache and upstream statistics of the stock data server.
+    
+    Returns:
+        Dictionary with security master hit/miss counters, table freshness,
+        local bar store counters, request coalescing counters and, per akshare
+        endpoint, call/failure/timeout/rejection counters with circuit breaker state
+    """
+    return {
+        "security_master": security_master.get_stats(),
+        "bar_store": bar_store.get_stats(),
+        "request_coalescing": request_coalescer.get_stats(),
+        "upstream": upstream_guard.get_stats()
+    }
+
+
 if __name__ == "__main__":
     #asyncio.run(main())
     app.run(transport='stdio')
\ No newline at end of file
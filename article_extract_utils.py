@@ -0,0 +1,234 @@
+import re
+from typing import Callable, Optional
+
+from bs4 import BeautifulSoup, CData, NavigableString, Tag
+
+# lxml为可选依赖，安装后使用C实现的解析器，否则退回html.parser
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# 可用的解析器后端，默认优先使用lxml
+PARSER_BACKENDS = ("lxml", "html.parser")
+DEFAULT_PARSER = "lxml" if etree is not None else "html.parser"
+
+# 提取正文前移除的元素（连同其子树）
+REMOVED_TAGS = frozenset(['script', 'style', 'iframe', 'nav', 'footer', 'aside', 'header', 'button', 'a'])
+
+# 内部文字不计入正文的元素（与BeautifulSoup.get_text的默认行为一致）
+NON_CONTENT_TAGS = frozenset(['template', 'rt', 'rp'])
+
+# 正文选择器列表（按优先级排序）
+# 按BeautifulSoup.find(name, **attrs)的语义匹配：name是标签名而不是CSS选择器，
+# 因此'.content'、'#artibody'这类写法不会命中任何元素，与原实现保持一致
+CONTENT_SELECTORS = [
+    {'selector': 'article', 'attrs': {}},  # 通用文章标签
+    {'selector': '.article-content', 'attrs': {}},  # 新浪/网易
+    {'selector': '.content', 'attrs': {}},  # 腾讯
+    {'selector': '.main-content', 'attrs': {}},  # 搜狐
+    {'selector': '.article-main', 'attrs': {}},  # 其他
+    {'selector': '.text', 'attrs': {}},  # 通用
+    {'selector': '#artibody', 'attrs': {}},  # 新浪另一种
+    {'selector': 'div', 'attrs': {'class': 'article'}},  # 更精确匹配
+    {'selector': 'div', 'attrs': {'id': 'article'}},  # ID匹配
+    {'selector': 'div', 'attrs': {'class': 'content-wrapper'}},  # 新浪财经
+    {'selector': '.article-body', 'attrs': {}},  # 新浪部分新闻
+    {'selector': '.article-detail', 'attrs': {}},  # 新浪详情页
+    {'selector': '.article-txt', 'attrs': {}}  # 新浪财经
+]
+
+# 所有选择器都没有内容时回退到body，在匹配表中排在最后
+BODY_INDEX = len(CONTENT_SELECTORS)
+
+# 标签名 -> 可能命中的选择器序号；选择器序号 -> 标签名
+SELECTORS_BY_TAG = {}
+SELECTOR_TAGS = []
+# 选择器的文本标识（如"div[class=article]"），用于按站点持久化学习到的选择器
+SELECTOR_LABELS = []
+for index, selector in enumerate(CONTENT_SELECTORS + [{'selector': 'body', 'attrs': {}}]):
+    SELECTORS_BY_TAG.setdefault(selector['selector'], []).append(index)
+    SELECTOR_TAGS.append(selector['selector'])
+    SELECTOR_LABELS.append(selector['selector'] + ''.join(f"[{key}={value}]" for key, value in selector['attrs'].items()))
+
+# 源文档中的body标签（html.parser只在源文档有body标签时才生成body元素）
+BODY_TAG_PATTERN = re.compile(r'<body[\s>/]', re.IGNORECASE)
+
+
+def selector_label(index: Optional[int]) -> Optional[str]:
+    """选择器序号对应的文本标识，序号为None时返回None"""
+    return SELECTOR_LABELS[index] if index is not None else None
+
+
+def selector_index(label: Optional[str]) -> Optional[int]:
+    """文本标识对应的选择器序号，未知的标识（如选择器列表已调整）返回None"""
+    try:
+        return SELECTOR_LABELS.index(label)
+    except ValueError:
+        return None
+
+
+def extract_article_text(html: str, clean: Callable[[str], str], parser: Optional[str] = None,
+                         preferred: Optional[int] = None) -> tuple:
+    """
+    单遍提取文章正文
+
+    一次遍历文档树完成原来的三步：跳过REMOVED_TAGS子树（代替decompose）、
+    记录每个选择器第一个命中元素覆盖的文字区间、收集文字，之后按选择器
+    优先级取第一个清理后非空的区间，结果与"decompose + 逐个find + body回退"一致。
+
+    指定preferred（该站点此前命中的选择器）时先只匹配这一个选择器，
+    其命中元素结束即停止遍历；清理后非空则直接使用，否则按上面的方式完整提取。
+    body不作为优先选择器（否则同一站点有正文元素的页面也会整页提取），指定BODY_INDEX时直接完整提取。
+
+    Args:
+        html: 文章HTML
+        clean: 文本清理函数
+        parser: 解析器后端（"lxml"或"html.parser"），默认使用DEFAULT_PARSER
+        preferred: 优先尝试的选择器序号
+
+    Returns:
+        (正文, 命中的选择器序号) 二元组；序号为BODY_INDEX表示回退到body，
+        未提取到内容时返回("", None)
+    """
+    parser = parser or DEFAULT_PARSER
+    if parser not in PARSER_BACKENDS:
+        raise ValueError(f"不支持的解析器后端: {parser}，可选值: {', '.join(PARSER_BACKENDS)}")
+    if parser == "lxml" and etree is None:
+        raise ValueError("未安装lxml，无法使用lxml解析器后端")
+
+    walk = __walk_lxml__ if parser == "lxml" else __walk_soup__
+    if preferred is not None and preferred != BODY_INDEX:
+        strings, spans = walk(html, preferred)
+        if preferred in spans:
+            start, end = spans[preferred]
+            text = clean('\n'.join(strings[start:end]))
+            if text:
+                return text, preferred
+    strings, spans = walk(html)
+    for index in sorted(spans):
+        start, end = spans[index]
+        text = clean('\n'.join(strings[start:end]))
+        if text:
+            return text, index
+    return "", None
+
+
+def __match_selectors__(name: str, attrs: dict, spans: dict, preferred: Optional[int] = None) -> list:
+    """返回元素命中、且此前尚未命中过的选择器序号（指定preferred时只匹配该选择器）"""
+    matched = []
+    candidates = SELECTORS_BY_TAG.get(name, ()) if preferred is None else (preferred,)
+    for index in candidates:
+        if index in spans:
+            continue
+        expected = CONTENT_SELECTORS[index]['attrs'] if index < BODY_INDEX else {}
+        if all(__attr_matches__(key, attrs.get(key), value) for key, value in expected.items()):
+            matched.append(index)
+    return matched
+
+
+def __attr_matches__(key: str, actual, expected: str) -> bool:
+    """按BeautifulSoup的规则比较属性：class按空白分隔的任一值匹配，其余属性整体相等"""
+    if actual is None:
+        return False
+    if key == 'class':
+        values = actual if isinstance(actual, list) else actual.split()
+        return expected in values or ' '.join(values) == expected
+    return actual == expected
+
+
+def __walk_lxml__(html: str, preferred: Optional[int] = None) -> tuple:
+    """
+    用lxml解析并单遍遍历，返回(文字列表, 选择器序号 -> [起, 止])
+
+    指定preferred时只匹配该选择器，其命中元素结束即停止遍历
+    """
+    strings = []
+    spans = {}
+    try:
+        # 按字节解析，避免带编码声明的Unicode字符串被lxml拒绝
+        root = etree.fromstring(html.encode('utf-8', errors='replace'), etree.HTMLParser(encoding='utf-8'))
+    except etree.LxmlError:
+        return strings, spans
+    if root is None:
+        return strings, spans
+    has_body = BODY_TAG_PATTERN.search(html) is not None
+
+    def add(text):
+        if text:
+            text = text.strip()
+            if text:
+                strings.append(text)
+
+    tags = SELECTORS_BY_TAG if preferred is None else (SELECTOR_TAGS[preferred],)
+    opened = []
+    excluded = 0
+    walker = etree.iterwalk(root, events=('start', 'end', 'comment', 'pi'))
+    for event, element in walker:
+        tag = element.tag
+        if event in ('comment', 'pi'):
+            # 注释和处理指令只保留其后的文字
+            if not excluded:
+                add(element.tail)
+            continue
+        if event == 'start':
+            # 被移除的元素只保留其后的文字
+            if tag in REMOVED_TAGS:
+                walker.skip_subtree()
+                opened.append(())
+                continue
+            matched = __match_selectors__(tag, element.attrib, spans, preferred) if tag in tags else ()
+            if tag == 'body' and not has_body:
+                matched = [index for index in matched if index != BODY_INDEX]
+            for index in matched:
+                spans[index] = [len(strings), None]
+            opened.append(matched)
+            if tag in NON_CONTENT_TAGS:
+                excluded += 1
+            if not excluded:
+                add(element.text)
+        else:
+            for index in opened.pop():
+                spans[index][1] = len(strings)
+                if index == preferred:
+                    return strings, spans
+            if tag in NON_CONTENT_TAGS:
+                excluded -= 1
+            if not excluded and element is not root:
+                add(element.tail)
+    return strings, spans
+
+
+def __walk_soup__(html: str, preferred: Optional[int] = None) -> tuple:
+    """
+    用BeautifulSoup(html.parser)解析并单遍遍历，返回(文字列表, 选择器序号 -> [起, 止])
+
+    指定preferred时只匹配该选择器，其命中元素结束即停止遍历
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    tags = SELECTORS_BY_TAG if preferred is None else (SELECTOR_TAGS[preferred],)
+    strings = []
+    spans = {}
+    # 显式栈代替递归，避免深层嵌套的页面超过递归深度；None表示元素结束
+    stack = [(child, None) for child in reversed(soup.contents)]
+    while stack:
+        node, matched = stack.pop()
+        if node is None:
+            for index in matched:
+                spans[index][1] = len(strings)
+                if index == preferred:
+                    return strings, spans
+            continue
+        if isinstance(node, Tag):
+            if node.name in REMOVED_TAGS:
+                continue
+            matched = __match_selectors__(node.name, node.attrs, spans, preferred) if node.name in tags else ()
+            for index in matched:
+                spans[index] = [len(strings), None]
+            stack.append((None, matched))
+            stack.extend((child, None) for child in reversed(node.contents))
+        elif type(node) in (NavigableString, CData):
+            text = node.strip()
+            if text:
+                strings.append(text)
+    return strings, spans
@@ -0,0 +1,321 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+import aiohttp
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_info, log_global_debug, log_global_warning
+
+# 连接池总连接数上限
+POOL_LIMIT = 64
+
+# 同一主机的连接数上限
+POOL_LIMIT_PER_HOST = 8
+
+# DNS解析结果缓存时间（秒）
+DNS_CACHE_SECONDS = 600
+
+# 空闲keep-alive连接的保留时间（秒）
+KEEPALIVE_SECONDS = 60
+
+# 单次请求最多尝试次数（含首次）
+RETRY_MAX_ATTEMPTS = 3
+
+# 重试退避的基数和上限（秒），第n次重试在[0, min(上限, 基数 * 2^(n-1))]内随机等待
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8
+
+# 重试预算：每次调用存入的重试额度及额度上限，持续故障时重试（含对冲）约为调用数的20%
+RETRY_BUDGET_RATIO = 0.2
+RETRY_BUDGET_MAX = 10
+
+# 对冲请求：首个请求超过最近成功延迟的该分位数仍未返回时，再发一个相同请求
+HEDGE_PERCENTILE = 0.95
+
+# 计算延迟分位数所需的最少样本数，以及保留的最近样本数
+HEDGE_MIN_SAMPLES = 10
+LATENCY_WINDOW = 200
+
+# 可重试的HTTP状态码
+RETRYABLE_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class PooledHttpClient():
+    """
+    共享的aiohttp连接池
+
+    所有请求复用同一个ClientSession（keep-alive、按主机限制连接数、
+    DNS缓存、自动协商gzip/deflate压缩），并通过TraceConfig统计
+    新建连接与复用连接的次数。会话按事件循环创建，事件循环变化时重建。
+    """
+
+    def __init__(self, limit: int = POOL_LIMIT, limit_per_host: int = POOL_LIMIT_PER_HOST,
+                 dns_cache_seconds: int = DNS_CACHE_SECONDS, keepalive_seconds: float = KEEPALIVE_SECONDS):
+        """
+        初始化连接池配置
+
+        Args:
+            limit: 总连接数上限
+            limit_per_host: 同一主机的连接数上限
+            dns_cache_seconds: DNS缓存时间（秒）
+            keepalive_seconds: 空闲连接保留时间（秒）
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_seconds = dns_cache_seconds
+        self.keepalive_seconds = keepalive_seconds
+        self.session = None
+        self.loop = None
+        self.stats = {
+            "requests": 0,
+            "connections_opened": 0,
+            "connections_reused": 0,
+            "dns_cache_hits": 0,
+            "dns_cache_misses": 0,
+            "compressed_responses": 0,
+            "request_errors": 0,
+            "sessions_created": 0
+        }
+        self.host_stats = {}
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """
+        获取当前事件循环上的共享会话
+
+        Returns:
+            aiohttp.ClientSession实例
+        """
+        loop = asyncio.get_running_loop()
+        if self.session is None or self.session.closed or self.loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_cache_seconds,
+                keepalive_timeout=self.keepalive_seconds
+            )
+            self.session = aiohttp.ClientSession(connector=connector, trace_configs=[self.__build_trace_config__()])
+            self.loop = loop
+            self.stats["sessions_created"] += 1
+            log_global_info(f"创建HTTP连接池: 总连接上限 {self.limit}, 每主机 {self.limit_per_host}")
+        return self.session
+
+    async def close(self):
+        """关闭共享会话及其连接"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+        self.loop = None
+
+    def get_stats(self) -> dict:
+        """
+        获取连接池统计
+
+        Returns:
+            统计信息字典，包含总体计数和按主机的请求/新建连接/复用连接计数
+        """
+        stats = dict(self.stats)
+        opened = stats["connections_opened"]
+        reused = stats["connections_reused"]
+        stats["reuse_ratio"] = round(reused / (opened + reused), 4) if opened + reused else 0
+        stats["hosts"] = {host: dict(counts) for host, counts in self.host_stats.items()}
+        return stats
+
+    def __build_trace_config__(self) -> aiohttp.TraceConfig:
+        """构建统计连接复用情况的TraceConfig"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.host = params.url.host
+            self.__count__(ctx.host, "requests")
+
+        async def on_request_end(session, ctx, params):
+            if params.response.headers.get("Content-Encoding"):
+                self.stats["compressed_responses"] += 1
+
+        async def on_request_exception(session, ctx, params):
+            self.stats["request_errors"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.__count__(getattr(ctx, "host", None), "connections_opened")
+            log_global_debug(f"新建连接: {getattr(ctx, 'host', '')}")
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.__count__(getattr(ctx, "host", None), "connections_reused")
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self.stats["dns_cache_hits"] += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self.stats["dns_cache_misses"] += 1
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace_config
+
+    def __count__(self, host: Optional[str], key: str):
+        """累加总体和按主机的计数（只在事件循环线程中调用）"""
+        self.stats[key] += 1
+        if host:
+            counts = self.host_stats.setdefault(host, {"requests": 0, "connections_opened": 0, "connections_reused": 0})
+            counts[key] += 1
+
+
+def is_retryable(e: BaseException) -> bool:
+    """连接错误、超时，以及状态码（异常的status属性）可重试的HTTP错误视为暂时性错误"""
+    if isinstance(e, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+        return True
+    return getattr(e, "status", None) in RETRYABLE_STATUSES
+
+
+class RetryPolicy():
+    """
+    请求重试策略
+
+    暂时性错误按带全抖动的指数退避重试；重试受预算限制（每次调用只存入一小部分额度），
+    上游持续故障时不会把请求量放大数倍。启用对冲时，首个请求超过最近成功延迟的
+    HEDGE_PERCENTILE分位数仍未返回，就再发一个相同请求，取先成功的结果，降低尾延迟；
+    对冲请求同样消耗重试预算。延迟样本只计请求本身（从各自发出时计时），
+    请求前的节奏等待放在before中，不计入样本，对冲请求也不再等待。
+    只用于幂等的GET请求，只在事件循环线程中调用。
+    """
+
+    def __init__(self, name: str, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, budget_ratio: float = RETRY_BUDGET_RATIO,
+                 budget_max: float = RETRY_BUDGET_MAX, hedge: bool = False, hedge_percentile: float = HEDGE_PERCENTILE,
+                 hedge_min_samples: int = HEDGE_MIN_SAMPLES):
+        """
+        初始化重试策略
+
+        Args:
+            name: 请求类型名称，用于日志和统计
+            max_attempts: 最多尝试次数（含首次）
+            base_delay: 退避基数（秒）
+            max_delay: 退避上限（秒）
+            budget_ratio: 每次调用存入的重试额度
+            budget_max: 重试额度上限
+            hedge: 是否启用对冲请求
+            hedge_percentile: 触发对冲的延迟分位数
+            hedge_min_samples: 启用对冲前至少需要的成功延迟样本数
+        """
+        self.name = name
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_max = budget_max
+        self.budget = float(budget_max)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.stats = {
+            "calls": 0,
+            "attempts": 0,
+            "successes": 0,
+            "failures": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "budget_exhausted": 0
+        }
+
+    async def run(self, fn: Callable[[], Awaitable], before: Optional[Callable[[], Awaitable]] = None):
+        """
+        按策略执行请求
+
+        Args:
+            fn: 无参数的协程函数，每次尝试（含对冲）调用一次
+            before: 每次尝试前等待的无参数协程函数（如按主机的请求节奏），不计入延迟，对冲请求不调用
+
+        Returns:
+            fn的返回值
+
+        Raises:
+            不可重试的异常立即抛出；尝试次数或重试预算用尽时抛出最后一次的异常
+        """
+        self.stats["calls"] += 1
+        self.budget = min(self.budget_max, self.budget + self.budget_ratio)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if before is not None:
+                    await before()
+                result = await self.__attempt__(fn)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_attempts:
+                    self.stats["failures"] += 1
+                    raise
+                if self.budget < 1:
+                    self.stats["budget_exhausted"] += 1
+                    self.stats["failures"] += 1
+                    log_global_warning(f"{self.name}请求重试预算已用完，不再重试: {str(e) or type(e).__name__}")
+                    raise
+                self.budget -= 1
+                self.stats["retries"] += 1
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+                log_global_info(f"{self.name}请求失败（{str(e) or type(e).__name__}），{delay:.2f} 秒后第 {attempt} 次重试")
+                await asyncio.sleep(delay)
+                continue
+            self.stats["successes"] += 1
+            return result
+
+    def get_stats(self) -> dict:
+        """
+        获取重试统计
+
+        Returns:
+            统计信息字典，包含当前重试额度和对冲触发延迟
+        """
+        stats = dict(self.stats)
+        stats["budget"] = round(self.budget, 2)
+        hedge_delay = self.__hedge_delay__()
+        stats["hedge_delay_seconds"] = round(hedge_delay, 3) if hedge_delay is not None else None
+        return stats
+
+    async def __attempt__(self, fn: Callable[[], Awaitable]):
+        """一次尝试：启用对冲且首个请求超过延迟分位数仍未返回时再发一个，取先成功的结果"""
+        starts = [time.monotonic()]
+        tasks = [asyncio.ensure_future(fn())]
+        try:
+            hedge_delay = self.__hedge_delay__()
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done and self.budget >= 1:
+                    self.budget -= 1
+                    self.stats["hedges"] += 1
+                    log_global_debug(f"{self.name}请求超过 {hedge_delay:.2f} 秒未返回，发出对冲请求")
+                    starts.append(time.monotonic())
+                    tasks.append(asyncio.ensure_future(fn()))
+            self.stats["attempts"] += len(tasks)
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            self.stats["hedge_wins"] += 1
+                        self.latencies.append(time.monotonic() - starts[tasks.index(task)])
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def __hedge_delay__(self) -> Optional[float]:
+        """触发对冲的等待时间（最近成功延迟的分位数），未启用或样本不足时返回None"""
+        if not self.hedge or len(self.latencies) < self.hedge_min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.hedge_percentile))]
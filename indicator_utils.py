@@ -0,0 +1,427 @@
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_debug, log_global_warning, log_global_error
+
+
+def wilder_smooth(values: np.ndarray, window: int, seed_offset: int = 0) -> np.ndarray:
+    """
+    按行进行Wilder平滑：以窗口均值为种子，之后 avg = (avg*(window-1) + x) / window
+
+    递推等价于 alpha=1/window 的指数加权平均：种子放在第一个平滑位置、之前置为NaN，
+    整个面板按列交给pandas的ewm一次完成（与rolling_mean相同的做法）。
+
+    Args:
+        values: 待平滑的二维数组，行首的NaN视为补齐
+        window: 平滑窗口
+        seed_offset: 每行第一个有效值之后再跳过的列数（种子从该位置开始累计）
+
+    Returns:
+        平滑结果，种子之前为NaN
+    """
+    n_rows, n_cols = values.shape
+    valid = ~np.isnan(values)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), n_cols) + seed_offset
+    seed_end = first + window - 1
+    cum = np.cumsum(np.nan_to_num(values), axis=1)
+    rows = np.arange(n_rows)
+    seed_ok = seed_end < n_cols
+    seed = np.full(n_rows, np.nan)
+    end_idx = np.minimum(seed_end, n_cols - 1)
+    start_idx = first - 1
+    start_sum = np.where(start_idx >= 0, cum[rows, np.clip(start_idx, 0, n_cols - 1)], 0.)
+    seed[seed_ok] = (cum[rows, end_idx] - start_sum)[seed_ok] / window
+
+    columns = np.arange(n_cols)[None, :]
+    seeded = np.where(columns == seed_end[:, None], seed[:, None], values)
+    seeded[columns < seed_end[:, None]] = np.nan
+    result = pd.DataFrame(seeded.T).ewm(alpha=1. / window, adjust=False).mean().to_numpy().T
+    # 种子之后出现缺失值时，其后不再有有效的平滑值
+    broken = np.logical_or.accumulate(np.isnan(seeded) & (columns >= seed_end[:, None]), axis=1)
+    return np.where(broken, np.nan, result)
+
+
+def wilder_rsi_averages(close: np.ndarray, window: int = 14) -> tuple:
+    """
+    按行计算RSI的Wilder平滑平均涨幅和平均跌幅（calculate_rsi、IncrementalRSI和面板rsi14共用）
+
+    前window个涨跌幅的均值作为种子，之后第t根K线使用第t-1个涨跌幅进行平滑
+    （与原逐行循环实现一致），平滑交由wilder_smooth完成。
+
+    Args:
+        close: 收盘价二维数组（每行一只股票），行首的NaN视为补齐
+        window: RSI窗口大小
+
+    Returns:
+        (avg_up, avg_down) 两个与close形状相同的数组，种子之前为NaN
+    """
+    deltas = np.full(close.shape, np.nan)
+    deltas[:, 1:] = np.diff(close, axis=1)
+    lagged = np.full(close.shape, np.nan)
+    lagged[:, 1:] = deltas[:, :-1]
+    up_seed_values = np.where(deltas > 0, deltas, 0.)
+    down_seed_values = np.where(deltas < 0, -deltas, 0.)
+    up_step_values = np.where(lagged > 0, lagged, 0.)
+    down_step_values = np.where(lagged > 0, 0., -lagged)
+
+    valid = ~np.isnan(close)
+    first = np.where(valid.any(axis=1), valid.argmax(axis=1), close.shape[1])
+    seed_mask = np.arange(close.shape[1])[None, :] <= (first + window)[:, None]
+    up_values = np.where(seed_mask, up_seed_values, up_step_values)
+    down_values = np.where(seed_mask, down_seed_values, down_step_values)
+    up_values[~valid] = np.nan
+    down_values[~valid] = np.nan
+
+    # 涨幅和跌幅拼成一个面板一起平滑
+    averages = wilder_smooth(np.concatenate((up_values, down_values)), window, seed_offset=1)
+    return averages[:close.shape[0]], averages[close.shape[0]:]
+
+
+def rsi_values(close: np.ndarray, window: int = 14) -> np.ndarray:
+    """按行计算RSI，数据不足window+1个点的位置为NaN"""
+    avg_up, avg_down = wilder_rsi_averages(close, window)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100. - (100. / (1. + avg_up / avg_down))
+
+
+def calculate_rsi(prices: pd.Series, window: int = 14) -> pd.Series:
+    """
+    向量化计算RSI指标（Wilder平滑）
+
+    与原逐行循环实现的结果一致，计算由与面板rsi14共用的wilder_rsi_averages完成。
+
+    Args:
+        prices: 收盘价序列
+        window: RSI窗口大小，默认14
+
+    Returns:
+        与prices索引一致的RSI序列，前window个值为NaN
+    """
+    log_global_debug(f"开始计算RSI指标，窗口大小: {window}，数据点数: {len(prices)}")
+    try:
+        if len(prices) < window + 1:
+            log_global_warning(f"数据点数不足，需要至少{window + 1}个点，实际只有{len(prices)}个点")
+            return pd.Series([None] * len(prices), index=prices.index)
+
+        close = pd.Series(prices).to_numpy(dtype='float64')[None, :]
+        rsi = pd.Series(rsi_values(close, window)[0], index=prices.index, dtype='float64')
+        log_global_debug(f"RSI指标计算完成，结果长度: {len(rsi)}")
+        return rsi
+    except Exception as e:
+        log_global_error(f"RSI计算过程中发生错误: {str(e)}")
+        # 返回空的RSI序列
+        return pd.Series([None] * len(prices), index=prices.index)
+
+
+class IncrementalRSI():
+    """
+    可增量更新的RSI计算器
+
+    保存(avg_up, avg_down)平滑状态以及最近价格，追加一根K线只需O(1)计算，
+    结果与对整段序列调用calculate_rsi的最后一个值一致。
+    """
+
+    def __init__(self, window: int = 14):
+        """
+        初始化RSI计算器
+
+        Args:
+            window: RSI窗口大小，默认14
+        """
+        self.window = window
+        self.warmup_prices = []
+        self.avg_up = None
+        self.avg_down = None
+        self.last_price = None
+        self.pending_delta = None
+        self.value = None
+
+    @classmethod
+    def from_prices(cls, prices, window: int = 14) -> "IncrementalRSI":
+        """
+        用历史价格初始化状态
+
+        Args:
+            prices: 历史收盘价序列
+            window: RSI窗口大小，默认14
+
+        Returns:
+            已处理完全部历史价格的IncrementalRSI实例
+        """
+        state = cls(window)
+        prices = [float(p) for p in prices]
+        if len(prices) <= window + 1:
+            for price in prices:
+                state.update(price)
+            return state
+
+        # 用向量化结果恢复平滑状态
+        avg_up, avg_down = wilder_rsi_averages(np.array([prices]), window)
+        state.avg_up = float(avg_up[0, -1])
+        state.avg_down = float(avg_down[0, -1])
+        state.last_price = prices[-1]
+        state.pending_delta = prices[-1] - prices[-2]
+        state.value = state.__rsi__()
+        return state
+
+    def update(self, price: float) -> Optional[float]:
+        """
+        追加一根K线的收盘价
+
+        Args:
+            price: 最新收盘价
+
+        Returns:
+            最新RSI值，数据不足window+1个点时返回None
+        """
+        price = float(price)
+        if self.avg_up is None:
+            self.warmup_prices.append(price)
+            if len(self.warmup_prices) == self.window + 1:
+                deltas = np.diff(self.warmup_prices)
+                self.avg_up = deltas[deltas >= 0].sum() / self.window
+                self.avg_down = -deltas[deltas < 0].sum() / self.window
+                self.pending_delta = deltas[-1]
+                self.last_price = price
+                self.warmup_prices = []
+                self.value = self.__rsi__()
+            return self.value
+
+        delta = self.pending_delta
+        upval = delta if delta > 0 else 0.
+        downval = 0. if delta > 0 else -delta
+        self.avg_up = (self.avg_up * (self.window - 1) + upval) / self.window
+        self.avg_down = (self.avg_down * (self.window - 1) + downval) / self.window
+        self.pending_delta = price - self.last_price
+        self.last_price = price
+        self.value = self.__rsi__()
+        return self.value
+
+    def __rsi__(self) -> Optional[float]:
+        """根据当前平滑状态计算RSI"""
+        if self.avg_down == 0:
+            return 100. if self.avg_up > 0 else math.nan
+        return 100. - (100. / (1. + self.avg_up / self.avg_down))
+
+
+# 默认返回的技术指标（与早期版本的technical_indicators保持一致）
+DEFAULT_INDICATORS = ["sma5", "sma20", "rsi14"]
+
+# 面板字段与akshare日线列名的对应关系
+PANEL_FIELDS = {
+    "open": "开盘",
+    "high": "最高",
+    "low": "最低",
+    "close": "收盘",
+    "volume": "成交量"
+}
+
+# 指标注册表: 名称 -> {"func": 计算函数, "description": 说明}
+INDICATOR_REGISTRY = {}
+
+
+def register_indicator(name: str, description: str):
+    """
+    注册技术指标的装饰器
+
+    被注册的函数接收面板字典（字段 -> 形状为(股票数, 交易日数)的数组），
+    返回 分量名 -> 同形状数组 的字典；只有一个分量时分量名使用"value"。
+
+    Args:
+        name: 指标名称，即请求参数中使用的名字
+        description: 指标说明
+    """
+    def decorator(func):
+        INDICATOR_REGISTRY[name] = {"func": func, "description": description}
+        return func
+    return decorator
+
+
+def list_indicators() -> dict:
+    """
+    列出已注册的技术指标
+
+    Returns:
+        指标名称 -> 说明
+    """
+    return {name: entry["description"] for name, entry in INDICATOR_REGISTRY.items()}
+
+
+def build_panel(frames: list) -> dict:
+    """
+    将多只股票的日线DataFrame组装为右对齐的二维面板
+
+    较短的序列在左侧用NaN补齐，每行最后一列都是该股票的最新K线。
+
+    Args:
+        frames: 日线DataFrame列表，需包含开盘、最高、最低、收盘、成交量列
+
+    Returns:
+        字段 -> 形状为(股票数, 最大长度)的float64数组
+    """
+    length = max((len(df) for df in frames), default=0)
+    panel = {}
+    for field, column in PANEL_FIELDS.items():
+        values = np.full((len(frames), length), np.nan)
+        for row, df in enumerate(frames):
+            if len(df) > 0 and column in df.columns:
+                values[row, length - len(df):] = df[column].to_numpy(dtype='float64')
+        panel[field] = values
+    return panel
+
+
+def resolve_indicator_names(names: Optional[list] = None) -> list:
+    """
+    校验并去重指标名称
+
+    Args:
+        names: 指标名称列表，为空时使用DEFAULT_INDICATORS
+
+    Returns:
+        去重后的指标名称列表
+    """
+    names = list(dict.fromkeys(names or DEFAULT_INDICATORS))
+    unknown = [name for name in names if name not in INDICATOR_REGISTRY]
+    if unknown:
+        raise ValueError(f"不支持的技术指标: {', '.join(unknown)}，可选值: {', '.join(INDICATOR_REGISTRY)}")
+    return names
+
+
+def compute_indicators(panel: dict, names: Optional[list] = None) -> dict:
+    """
+    在面板上一次性计算所选技术指标
+
+    Args:
+        panel: build_panel生成的面板
+        names: 指标名称列表，为None时使用DEFAULT_INDICATORS
+
+    Returns:
+        指标名称 -> {分量名 -> 二维数组}
+    """
+    names = resolve_indicator_names(names)
+    results = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name in names:
+            results[name] = INDICATOR_REGISTRY[name]["func"](panel)
+    log_global_debug(f"技术指标计算完成: {names}，面板形状: {panel['close'].shape}")
+    return results
+
+
+def latest_indicator_values(results: dict, row: int, decimals: int = 2) -> dict:
+    """
+    提取某只股票各指标的最新值
+
+    Args:
+        results: compute_indicators的返回值
+        row: 股票在面板中的行号
+        decimals: 保留小数位数
+
+    Returns:
+        指标名称 -> 最新值（单分量指标）或 {分量名 -> 最新值}，缺失值为None
+    """
+    def latest(values):
+        value = values[row, -1] if values.shape[1] > 0 else np.nan
+        return None if np.isnan(value) or np.isinf(value) else round(float(value), decimals)
+
+    latest_values = {}
+    for name, components in results.items():
+        if list(components.keys()) == ["value"]:
+            latest_values[name] = latest(components["value"])
+        else:
+            latest_values[name] = {component: latest(values) for component, values in components.items()}
+    return latest_values
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """按行计算滚动均值，窗口内数据不足时为NaN（按列交给pandas一次计算，数值与原rolling实现一致）"""
+    return pd.DataFrame(values.T).rolling(window, min_periods=window).mean().to_numpy().T
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """按行计算滚动样本标准差，窗口内数据不足时为NaN"""
+    return pd.DataFrame(values.T).rolling(window, min_periods=window).std().to_numpy().T
+
+
+def rolling_extreme(values: np.ndarray, window: int, func) -> np.ndarray:
+    """按行计算滚动最值（忽略NaN，窗口不足时使用已有数据）"""
+    padded = np.concatenate((np.full((values.shape[0], window - 1), np.nan), values), axis=1)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=1)
+    return func.reduce(windows, axis=2)
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """按行计算指数移动平均，每行从第一个有效值开始，缺失值沿用上一个均值（按列交给pandas的ewm一次计算）"""
+    return pd.DataFrame(values.T).ewm(span=span, adjust=False, ignore_na=True).mean().to_numpy().T
+
+
+def seeded_smooth(values: np.ndarray, seed: float, alpha: float) -> np.ndarray:
+    """按行从固定初值开始做指数平滑 s = (1-alpha)*s + alpha*x，跳过缺失值（缺失位置为NaN）"""
+    seeded = np.concatenate((np.full((values.shape[0], 1), seed), values), axis=1)
+    result = pd.DataFrame(seeded.T).ewm(alpha=alpha, adjust=False, ignore_na=True).mean().to_numpy().T[:, 1:]
+    return np.where(np.isnan(values), np.nan, result)
+
+
+@register_indicator("sma5", "5日简单移动平均")
+def sma5_indicator(panel: dict) -> dict:
+    return {"value": rolling_mean(panel["close"], 5)}
+
+
+@register_indicator("sma20", "20日简单移动平均")
+def sma20_indicator(panel: dict) -> dict:
+    return {"value": rolling_mean(panel["close"], 20)}
+
+
+@register_indicator("rsi14", "14日相对强弱指标（Wilder平滑）")
+def rsi14_indicator(panel: dict) -> dict:
+    return {"value": rsi_values(panel["close"], 14)}
+
+@register_indicator("macd", "MACD(12,26,9)：DIF、DEA和柱状值2*(DIF-DEA)")
+def macd_indicator(panel: dict) -> dict:
+    dif = ema(panel["close"], 12) - ema(panel["close"], 26)
+    dea = ema(dif, 9)
+    return {"dif": dif, "dea": dea, "hist": 2 * (dif - dea)}
+
+
+@register_indicator("boll", "布林带(20,2)：中轨、上轨、下轨")
+def boll_indicator(panel: dict) -> dict:
+    close = panel["close"]
+    mid = rolling_mean(close, 20)
+    std = rolling_std(close, 20)
+    return {"mid": mid, "upper": mid + 2 * std, "lower": mid - 2 * std}
+
+
+@register_indicator("atr14", "14日平均真实波幅（Wilder平滑）")
+def atr14_indicator(panel: dict) -> dict:
+    high, low, close = panel["high"], panel["low"], panel["close"]
+    prev_close = np.full(close.shape, np.nan)
+    prev_close[:, 1:] = close[:, :-1]
+    true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+    return {"value": wilder_smooth(true_range, 14)}
+
+
+@register_indicator("kdj", "随机指标KDJ(9,3,3)")
+def kdj_indicator(panel: dict) -> dict:
+    close = panel["close"]
+    lowest = rolling_extreme(panel["low"], 9, np.fmin)
+    highest = rolling_extreme(panel["high"], 9, np.fmax)
+    rsv = np.where(highest > lowest, (close - lowest) / (highest - lowest) * 100., 50.)
+    rsv[np.isnan(close)] = np.nan
+
+    k_values = seeded_smooth(rsv, 50., 1. / 3)
+    d_values = seeded_smooth(k_values, 50., 1. / 3)
+    return {"k": k_values, "d": d_values, "j": 3 * k_values - 2 * d_values}
+
+
+@register_indicator("obv", "能量潮OBV（首日为0）")
+def obv_indicator(panel: dict) -> dict:
+    close, volume = panel["close"], panel["volume"]
+    signed = np.zeros(close.shape)
+    signed[:, 1:] = np.sign(np.diff(close, axis=1)) * volume[:, 1:]
+    signed = np.nan_to_num(signed)
+    obv = np.cumsum(signed, axis=1)
+    obv[np.isnan(close)] = np.nan
+    return {"value": obv}
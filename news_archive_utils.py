@@ -0,0 +1,327 @@
+import pathlib
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_info, log_global_debug, log_global_warning
+from news_cache_utils import CACHE_DIR, canonical_url
+
+# 新闻存档数据库
+NEWS_ARCHIVE_PATH = CACHE_DIR / "news" / "archive.sqlite3"
+
+# 抓取时尚未结束的日期（通常是当天），其存档在多长时间内视为已覆盖（分钟），之后重新抓取
+ARCHIVE_RECENT_TTL_MINUTES = 60
+
+# 全文检索使用的分词器：trigram按三个字符切分，适合没有空格的中文（SQLite 3.34+）
+FTS_TOKENIZER = "trigram"
+
+# trigram索引能匹配的最短关键词长度，更短的关键词退回LIKE扫描
+FTS_MIN_KEYWORD_CHARS = 3
+
+DATE_FORMAT = "%Y-%m-%d"
+
+# 以YYYY-MM-DD开头的新闻日期（其余为没有或无法解析的日期）
+DATED_PATTERN = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*"
+
+
+def __next_day__(day: str) -> str:
+    """日期字符串的后一天"""
+    return (datetime.strptime(day, DATE_FORMAT) + timedelta(days=1)).strftime(DATE_FORMAT)
+
+
+def __days__(start_date: str, end_date: str) -> list:
+    """起止日期（含）之间的所有日期字符串"""
+    days = []
+    day = start_date
+    while day <= end_date:
+        days.append(day)
+        day = __next_day__(day)
+    return days
+
+
+class NewsArchive():
+    """
+    本地新闻存档（SQLite + FTS5全文索引）
+
+    保存抓取到的每条新闻（标题、链接、日期、来源、正文），并按来源、关键词和日期记录
+    已抓取覆盖的范围，重复查询同一关键词和时间范围时直接从存档返回，只抓取未覆盖的日期。
+    已经结束的日期抓取后永久视为覆盖；抓取时尚未结束的日期只在ARCHIVE_RECENT_TTL_MINUTES内有效。
+    方法均为同步调用并加锁，可在线程池中执行。
+    """
+
+    def __init__(self, db_path: Optional[pathlib.Path] = None, recent_ttl_minutes: float = ARCHIVE_RECENT_TTL_MINUTES):
+        """
+        初始化新闻存档
+
+        Args:
+            db_path: 数据库文件路径，默认为项目下的cache/news/archive.sqlite3
+            recent_ttl_minutes: 抓取时尚未结束的日期的覆盖有效期（分钟）
+        """
+        self.db_path = pathlib.Path(db_path) if db_path else NEWS_ARCHIVE_PATH
+        self.recent_ttl_seconds = recent_ttl_minutes * 60
+        self.lock = threading.Lock()
+        self.conn = None
+        self.fts = False
+        self.stats = {
+            "stored": 0,
+            "served": 0,
+            "covered_days": 0,
+            "missing_days": 0,
+            "searches": 0
+        }
+
+    def add(self, items: list, search_term: str) -> int:
+        """
+        保存新闻（按规范化URL去重，已有正文的条目不会被空正文覆盖）
+
+        Args:
+            items: 新闻列表，content为None或缺失表示没有正文
+            search_term: 抓取时使用的关键词
+
+        Returns:
+            保存的条数
+        """
+        now = time.time()
+        with self.lock:
+            conn = self.__connect__()
+            for item in items:
+                url_key = canonical_url(item['url'])
+                conn.execute(
+                    "INSERT INTO news (url_key, url, title, date, source, content, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (url_key) DO UPDATE SET url = excluded.url, title = excluded.title, date = excluded.date, "
+                    "source = excluded.source, content = COALESCE(excluded.content, news.content), archived_at = excluded.archived_at",
+                    (url_key, item['url'], item['title'], item.get('date') or "", item.get('source') or "",
+                     item.get('content'), now)
+                )
+                conn.execute(
+                    "INSERT OR IGNORE INTO news_terms (search_term, news_id) SELECT ?, id FROM news WHERE url_key = ?",
+                    (search_term, url_key)
+                )
+            conn.commit()
+            self.stats["stored"] += len(items)
+        return len(items)
+
+    def query(self, search_term: str, start_date: str, end_date: str, with_content: bool = True) -> list:
+        """
+        读取某个关键词在日期范围内的存档新闻（按日期倒序）
+
+        抓取时没有或无法解析日期的新闻会被保留，存档中按写入存档的日期匹配，
+        否则其所在日期标记为已覆盖后这些新闻既不会从存档返回，也不会再被抓取。
+
+        Args:
+            search_term: 抓取时使用的关键词
+            start_date: 开始日期（YYYY-MM-DD）
+            end_date: 结束日期（YYYY-MM-DD，含）
+            with_content: 是否返回正文（没有存档正文的条目content为None）
+
+        Returns:
+            新闻列表
+        """
+        with self.lock:
+            rows = self.__connect__().execute(
+                "SELECT news.source, news.title, news.url, news.date, news.content FROM news "
+                "JOIN news_terms ON news_terms.news_id = news.id "
+                "WHERE news_terms.search_term = ? AND ((news.date >= ? AND news.date < ? AND news.date GLOB ?) "
+                "OR (news.date NOT GLOB ? AND date(news.archived_at, 'unixepoch', 'localtime') BETWEEN ? AND ?)) "
+                "ORDER BY news.date DESC",
+                (search_term, start_date, __next_day__(end_date), DATED_PATTERN, DATED_PATTERN, start_date, end_date)
+            ).fetchall()
+            self.stats["served"] += len(rows)
+        return [self.__build_item__(row, search_term, with_content) for row in rows]
+
+    def missing_ranges(self, source: str, search_term: str, start_date: str, end_date: str,
+                       with_content: bool = True) -> list:
+        """
+        计算日期范围内尚未被抓取覆盖的区间
+
+        Args:
+            source: 新闻源名称
+            search_term: 关键词
+            start_date: 开始日期（YYYY-MM-DD）
+            end_date: 结束日期（YYYY-MM-DD，含）
+            with_content: 是否要求抓取时获取了正文
+
+        Returns:
+            按时间倒序排列的(开始日期, 结束日期)列表，连续的未覆盖日期合并为一个区间
+        """
+        now = time.time()
+        with self.lock:
+            rows = self.__connect__().execute(
+                "SELECT day, with_content, crawled_at FROM coverage "
+                "WHERE source = ? AND search_term = ? AND day >= ? AND day <= ?",
+                (source, search_term, start_date, end_date)
+            ).fetchall()
+            covered = {
+                day for day, has_content, crawled_at in rows
+                if (has_content or not with_content) and
+                (day < datetime.fromtimestamp(crawled_at).strftime(DATE_FORMAT) or now - crawled_at < self.recent_ttl_seconds)
+            }
+            ranges = []
+            for day in __days__(start_date, end_date):
+                if day in covered:
+                    continue
+                if ranges and ranges[-1][1] == (datetime.strptime(day, DATE_FORMAT) - timedelta(days=1)).strftime(DATE_FORMAT):
+                    ranges[-1][1] = day
+                else:
+                    ranges.append([day, day])
+            missing = sum(len(__days__(start, end)) for start, end in ranges)
+            self.stats["missing_days"] += missing
+            self.stats["covered_days"] += len(__days__(start_date, end_date)) - missing
+        return [tuple(r) for r in reversed(ranges)]
+
+    def mark_covered(self, source: str, search_term: str, start_date: str, end_date: str, with_content: bool = True):
+        """
+        记录日期范围已抓取覆盖（已有正文覆盖的日期不会降级为无正文）
+
+        Args:
+            source: 新闻源名称
+            search_term: 关键词
+            start_date: 开始日期（YYYY-MM-DD）
+            end_date: 结束日期（YYYY-MM-DD，含）
+            with_content: 抓取时是否获取了正文
+        """
+        now = time.time()
+        with self.lock:
+            conn = self.__connect__()
+            conn.executemany(
+                "INSERT INTO coverage (source, search_term, day, with_content, crawled_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (source, search_term, day) DO UPDATE SET "
+                "with_content = MAX(coverage.with_content, excluded.with_content), crawled_at = excluded.crawled_at",
+                [(source, search_term, day, int(with_content), now) for day in __days__(start_date, end_date)]
+            )
+            conn.commit()
+        log_global_debug(f"存档覆盖: {source}/{search_term} {start_date} 至 {end_date}")
+
+    def search(self, keyword: str = "", start_date: str = "", end_date: str = "", limit: int = 50,
+               with_content: bool = False) -> list:
+        """
+        按关键词和日期范围检索存档（按日期倒序）
+
+        空格分隔的多个关键词需同时出现在标题或正文中；不少于FTS_MIN_KEYWORD_CHARS个字符的
+        关键词使用全文索引，更短的关键词（如两个字的中文词）在日期范围内做LIKE匹配。
+
+        Args:
+            keyword: 关键词，为空时只按日期筛选
+            start_date: 开始日期（YYYY-MM-DD），为空表示不限
+            end_date: 结束日期（YYYY-MM-DD，含），为空表示不限
+            limit: 最多返回条数
+            with_content: 是否返回正文
+
+        Returns:
+            新闻列表，search_term为命中的关键词
+        """
+        conditions = []
+        params = []
+        words = keyword.split()
+        fts_words = [word for word in words if self.fts and len(word) >= FTS_MIN_KEYWORD_CHARS] if words else []
+        if fts_words:
+            conditions.append("news.id IN (SELECT rowid FROM news_fts WHERE news_fts MATCH ?)")
+            params.append(" AND ".join('"' + word.replace('"', '""') + '"' for word in fts_words))
+        for word in words:
+            if word in fts_words:
+                continue
+            pattern = "%" + word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(news.title LIKE ? ESCAPE '\\' OR news.content LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        if start_date:
+            conditions.append("news.date >= ?")
+            params.append(start_date)
+        if end_date:
+            conditions.append("news.date < ?")
+            params.append(__next_day__(end_date))
+        sql = "SELECT news.source, news.title, news.url, news.date, news.content FROM news"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY news.date DESC LIMIT ?"
+        params.append(max(0, limit))
+        with self.lock:
+            rows = self.__connect__().execute(sql, params).fetchall()
+            self.stats["searches"] += 1
+        return [self.__build_item__(row, keyword, with_content) for row in rows]
+
+    def get_stats(self) -> dict:
+        """
+        获取存档统计
+
+        Returns:
+            统计信息字典
+        """
+        with self.lock:
+            conn = self.__connect__()
+            stats = dict(self.stats)
+            stats["items"] = conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+            stats["search_terms"] = conn.execute("SELECT COUNT(DISTINCT search_term) FROM news_terms").fetchone()[0]
+            stats["coverage_days"] = conn.execute("SELECT COUNT(*) FROM coverage").fetchone()[0]
+            stats["full_text_index"] = FTS_TOKENIZER if self.fts else "none"
+        return stats
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def __build_item__(self, row: tuple, search_term: str, with_content: bool) -> dict:
+        """由查询结果构建新闻条目"""
+        item = {
+            'source': row[0],
+            'title': row[1],
+            'url': row[2],
+            'date': row[3],
+            'search_term': search_term
+        }
+        if with_content:
+            item['content'] = row[4]
+        return item
+
+    def __connect__(self) -> sqlite3.Connection:
+        """打开数据库并建表，SQLite不支持FTS5或trigram分词器时只用LIKE检索（调用方持有锁）"""
+        if self.conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS news ("
+                "id INTEGER PRIMARY KEY, url_key TEXT UNIQUE, url TEXT, title TEXT, date TEXT, source TEXT, "
+                "content TEXT, archived_at REAL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_news_date ON news (date)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS news_terms (search_term TEXT, news_id INTEGER, PRIMARY KEY (search_term, news_id))"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS coverage ("
+                "source TEXT, search_term TEXT, day TEXT, with_content INTEGER, crawled_at REAL, "
+                "PRIMARY KEY (source, search_term, day))"
+            )
+            try:
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5("
+                    f"title, content, content='news', content_rowid='id', tokenize='{FTS_TOKENIZER}')"
+                )
+                # 外部内容表的索引由触发器与news表保持同步
+                self.conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS news_fts_insert AFTER INSERT ON news BEGIN "
+                    "INSERT INTO news_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END"
+                )
+                self.conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS news_fts_delete AFTER DELETE ON news BEGIN "
+                    "INSERT INTO news_fts (news_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); END"
+                )
+                self.conn.execute(
+                    "CREATE TRIGGER IF NOT EXISTS news_fts_update AFTER UPDATE ON news BEGIN "
+                    "INSERT INTO news_fts (news_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content); "
+                    "INSERT INTO news_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END"
+                )
+                self.fts = True
+            except sqlite3.OperationalError as e:
+                log_global_warning(f"SQLite不支持FTS5 {FTS_TOKENIZER} 分词器，存档检索退回LIKE匹配: {str(e)}")
+                self.fts = False
+            self.conn.commit()
+            count = self.conn.execute("SELECT COUNT(*) FROM news").fetchone()[0]
+            log_global_info(f"新闻存档已打开: {self.db_path}, 共 {count} 条")
+        return self.conn
@@ -0,0 +1,469 @@
+import pathlib
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_info, log_global_debug
+
+# 本地缓存目录
+CACHE_DIR = pathlib.Path(__file__).parent / "cache"
+
+# 文章缓存数据库
+ARTICLE_CACHE_PATH = CACHE_DIR / "news" / "articles.sqlite3"
+
+# 文章缓存容量上限（MB，按压缩后大小计），超出后按最近访问时间淘汰
+ARTICLE_CACHE_MAX_MB = 200
+
+# 文章缓存在多长时间内直接使用（小时），超过后用ETag/Last-Modified向源站确认
+ARTICLE_CACHE_FRESH_HOURS = 24
+
+# 淘汰时清理到容量上限的比例，避免每次写入都触发淘汰
+EVICTION_TARGET_RATIO = 0.9
+
+# 规范化URL时去掉的跟踪参数
+TRACKING_PARAMS = ("utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content", "spm")
+
+# 只在新浪站点上去掉的跟踪参数（其他站点可能用它们选择内容）
+SINA_TRACKING_PARAMS = ("from", "source")
+
+# 新浪站点的域名后缀
+SINA_HOST_SUFFIXES = ("sina.com.cn", "sina.cn")
+
+# 压缩级别
+COMPRESS_LEVEL = 6
+
+
+def canonical_url(url: str) -> str:
+    """
+    规范化URL，作为缓存键
+
+    协议和主机名转小写，去掉默认端口、片段和跟踪参数（from、source只在新浪站点上去掉），
+    其余查询参数排序。
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        规范化后的URL
+    """
+    if not url:
+        return ""
+    if url.startswith('//'):
+        url = 'https:' + url
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    dropped = TRACKING_PARAMS
+    if any(host == suffix or host.endswith("." + suffix) for suffix in SINA_HOST_SUFFIXES):
+        dropped = TRACKING_PARAMS + SINA_TRACKING_PARAMS
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k.lower() not in dropped)
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class ArticleCache():
+    """
+    文章正文的SQLite缓存
+
+    以规范化URL为键，保存zlib压缩后的原始HTML和提取后的正文，以及
+    ETag/Last-Modified用于条件请求；按压缩后总大小做LRU淘汰。
+    方法均为同步调用并加锁，可在线程池中执行。
+    """
+
+    def __init__(self, db_path: Optional[pathlib.Path] = None, max_mb: float = ARTICLE_CACHE_MAX_MB,
+                 fresh_hours: float = ARTICLE_CACHE_FRESH_HOURS):
+        """
+        初始化文章缓存
+
+        Args:
+            db_path: 数据库文件路径，默认为项目下的cache/news/articles.sqlite3
+            max_mb: 容量上限（MB）
+            fresh_hours: 无需向源站确认即可直接使用的时长（小时）
+        """
+        self.db_path = pathlib.Path(db_path) if db_path else ARTICLE_CACHE_PATH
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.fresh_seconds = fresh_hours * 3600
+        self.lock = threading.Lock()
+        self.conn = None
+        self.total_bytes = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale": 0,
+            "revalidated": 0,
+            "stored": 0,
+            "evictions": 0
+        }
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        读取缓存的文章
+
+        Args:
+            url: 文章URL
+
+        Returns:
+            包含text、etag、last_modified、fetched_at、fresh的字典，未缓存时返回None
+        """
+        key = canonical_url(url)
+        with self.lock:
+            row = self.__connect__().execute(
+                "SELECT text, etag, last_modified, fetched_at FROM articles WHERE url = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            now = time.time()
+            self.conn.execute("UPDATE articles SET accessed_at = ? WHERE url = ?", (now, key))
+            self.conn.commit()
+            fresh = now - row[3] < self.fresh_seconds
+            self.stats["hits" if fresh else "stale"] += 1
+        return {
+            "text": zlib.decompress(row[0]).decode('utf-8'),
+            "etag": row[1],
+            "last_modified": row[2],
+            "fetched_at": row[3],
+            "fresh": fresh
+        }
+
+    def get_html(self, url: str) -> Optional[str]:
+        """读取缓存的原始HTML，未缓存时返回None"""
+        with self.lock:
+            row = self.__connect__().execute(
+                "SELECT html FROM articles WHERE url = ?", (canonical_url(url),)
+            ).fetchone()
+        return zlib.decompress(row[0]).decode('utf-8') if row else None
+
+    def put(self, url: str, html: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """
+        写入文章，必要时淘汰最久未访问的条目
+
+        Args:
+            url: 文章URL
+            html: 原始HTML
+            text: 提取后的正文
+            etag: 响应的ETag
+            last_modified: 响应的Last-Modified
+        """
+        key = canonical_url(url)
+        html_blob = zlib.compress(html.encode('utf-8'), COMPRESS_LEVEL)
+        text_blob = zlib.compress(text.encode('utf-8'), COMPRESS_LEVEL)
+        size = len(html_blob) + len(text_blob)
+        now = time.time()
+        with self.lock:
+            conn = self.__connect__()
+            old = conn.execute("SELECT size FROM articles WHERE url = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO articles (url, html, text, etag, last_modified, fetched_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, html_blob, text_blob, etag, last_modified, now, now, size)
+            )
+            self.total_bytes += size - (old[0] if old else 0)
+            self.stats["stored"] += 1
+            if self.total_bytes > self.max_bytes:
+                self.__evict__()
+            conn.commit()
+
+    def touch(self, url: str):
+        """源站确认未修改（304）后刷新获取时间"""
+        now = time.time()
+        with self.lock:
+            self.__connect__().execute(
+                "UPDATE articles SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, canonical_url(url))
+            )
+            self.conn.commit()
+            self.stats["revalidated"] += 1
+
+    def get_stats(self) -> dict:
+        """
+        获取缓存统计
+
+        Returns:
+            统计信息字典
+        """
+        with self.lock:
+            entries = self.__connect__().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            stats = dict(self.stats)
+        stats["entries"] = entries
+        stats["size_mb"] = round(self.total_bytes / 1024 / 1024, 2)
+        stats["max_mb"] = round(self.max_bytes / 1024 / 1024, 2)
+        return stats
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def __connect__(self) -> sqlite3.Connection:
+        """打开数据库并建表（调用方持有锁）"""
+        if self.conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                "url TEXT PRIMARY KEY, html BLOB, text BLOB, etag TEXT, last_modified TEXT, "
+                "fetched_at REAL, accessed_at REAL, size INTEGER)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_accessed ON articles (accessed_at)")
+            self.conn.commit()
+            self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM articles").fetchone()[0]
+            log_global_info(f"文章缓存已打开: {self.db_path}, 当前大小 {self.total_bytes / 1024 / 1024:.2f}MB")
+        return self.conn
+
+    def __evict__(self):
+        """按最近访问时间淘汰，直到低于容量上限的目标比例（调用方持有锁）"""
+        target = self.max_bytes * EVICTION_TARGET_RATIO
+        evicted = 0
+        for url, size in self.conn.execute("SELECT url, size FROM articles ORDER BY accessed_at").fetchall():
+            if self.total_bytes <= target:
+                break
+            self.conn.execute("DELETE FROM articles WHERE url = ?", (url,))
+            self.total_bytes -= size
+            evicted += 1
+        self.stats["evictions"] += evicted
+        log_global_debug(f"文章缓存淘汰 {evicted} 条，当前大小 {self.total_bytes / 1024 / 1024:.2f}MB")
+
+
+# 跳转链接缓存数据库
+REDIRECT_CACHE_PATH = CACHE_DIR / "news" / "redirects.sqlite3"
+
+# 跳转链接解析结果的有效期（小时）
+REDIRECT_CACHE_TTL_HOURS = 24 * 30
+
+
+class RedirectCache():
+    """
+    跳转链接（如link.sina.com.cn）解析结果缓存
+
+    首次使用时把未过期的记录全部载入内存，查询只访问内存，
+    新的解析结果同时写入内存和SQLite，跨重启复用。
+    """
+
+    def __init__(self, db_path: Optional[pathlib.Path] = None, ttl_hours: float = REDIRECT_CACHE_TTL_HOURS):
+        """
+        初始化跳转链接缓存
+
+        Args:
+            db_path: 数据库文件路径，默认为项目下的cache/news/redirects.sqlite3
+            ttl_hours: 解析结果有效期（小时）
+        """
+        self.db_path = pathlib.Path(db_path) if db_path else REDIRECT_CACHE_PATH
+        self.ttl_seconds = ttl_hours * 3600
+        self.lock = threading.Lock()
+        self.conn = None
+        self.entries = {}  # 跳转链接 -> (目标URL, 解析时间)
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "stored": 0,
+            "failures": 0
+        }
+
+    def get(self, url: str) -> Optional[str]:
+        """
+        查询跳转链接的目标URL
+
+        Args:
+            url: 跳转链接
+
+        Returns:
+            未过期的目标URL，没有时返回None
+        """
+        key = canonical_url(url)
+        with self.lock:
+            self.__connect__()
+            entry = self.entries.get(key)
+            if entry and time.time() - entry[1] < self.ttl_seconds:
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, url: str, target: str):
+        """
+        保存解析结果
+
+        Args:
+            url: 跳转链接
+            target: 目标URL
+        """
+        key = canonical_url(url)
+        now = time.time()
+        with self.lock:
+            conn = self.__connect__()
+            self.entries[key] = (target, now)
+            conn.execute("INSERT OR REPLACE INTO redirects (url, target, resolved_at) VALUES (?, ?, ?)", (key, target, now))
+            conn.commit()
+            self.stats["stored"] += 1
+
+    def count(self, key: str, n: int = 1):
+        """线程安全地累加统计计数（供调用方记录合并、失败次数）"""
+        with self.lock:
+            self.stats[key] += n
+
+    def get_stats(self) -> dict:
+        """
+        获取缓存统计
+
+        Returns:
+            统计信息字典
+        """
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        return stats
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def __connect__(self) -> sqlite3.Connection:
+        """打开数据库、清理过期记录并载入内存（调用方持有锁）"""
+        if self.conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self.conn.execute("CREATE TABLE IF NOT EXISTS redirects (url TEXT PRIMARY KEY, target TEXT, resolved_at REAL)")
+            self.conn.execute("DELETE FROM redirects WHERE resolved_at < ?", (time.time() - self.ttl_seconds,))
+            self.conn.commit()
+            self.entries = {
+                url: (target, resolved_at)
+                for url, target, resolved_at in self.conn.execute("SELECT url, target, resolved_at FROM redirects")
+            }
+            log_global_info(f"跳转链接缓存已载入 {len(self.entries)} 条")
+        return self.conn
+
+
+# 站点正文选择器数据库
+SELECTOR_CACHE_PATH = CACHE_DIR / "news" / "selectors.sqlite3"
+
+
+class SelectorCache():
+    """
+    按站点（主机名）记录正文提取命中的选择器
+
+    提取时先尝试该站点上次命中的选择器；同时累计每个站点的提取次数、
+    学习到的选择器直接命中的次数、回退到body的次数和未提取到内容的次数，
+    用于观察哪些站点只能整页提取。首次使用时全部载入内存，更新同时写入SQLite。
+    """
+
+    def __init__(self, db_path: Optional[pathlib.Path] = None):
+        """
+        初始化选择器缓存
+
+        Args:
+            db_path: 数据库文件路径，默认为项目下的cache/news/selectors.sqlite3
+        """
+        self.db_path = pathlib.Path(db_path) if db_path else SELECTOR_CACHE_PATH
+        self.lock = threading.Lock()
+        self.conn = None
+        self.domains = {}  # 主机名 -> {"selector", "extractions", "hits", "body_fallbacks", "empty"}
+
+    def get(self, domain: str) -> Optional[str]:
+        """
+        查询站点学习到的选择器
+
+        Args:
+            domain: 主机名
+
+        Returns:
+            选择器标识，没有时返回None
+        """
+        with self.lock:
+            self.__connect__()
+            entry = self.domains.get(domain)
+            return entry["selector"] if entry else None
+
+    def record(self, domain: str, selector: Optional[str], hit: bool, body_fallback: bool):
+        """
+        记录一次提取结果，命中的选择器与学习到的不同时更新
+
+        回退到body不会被学习为站点的选择器（只计入body_fallbacks），
+        否则该站点之后有正文元素的页面也会整页提取。
+
+        Args:
+            domain: 主机名
+            selector: 本次命中的选择器标识，未提取到内容时为None（保留原有选择器）
+            hit: 是否由学习到的选择器直接命中
+            body_fallback: 是否回退到body（保留原有选择器）
+        """
+        with self.lock:
+            conn = self.__connect__()
+            entry = self.domains.setdefault(
+                domain, {"selector": None, "extractions": 0, "hits": 0, "body_fallbacks": 0, "empty": 0}
+            )
+            if selector is not None and not body_fallback and selector != entry["selector"]:
+                log_global_debug(f"站点 {domain} 的正文选择器更新为: {selector}")
+                entry["selector"] = selector
+            entry["extractions"] += 1
+            entry["hits"] += hit
+            entry["body_fallbacks"] += body_fallback
+            entry["empty"] += selector is None
+            conn.execute(
+                "INSERT OR REPLACE INTO selectors (domain, selector, extractions, hits, body_fallbacks, empty, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (domain, entry["selector"], entry["extractions"], entry["hits"], entry["body_fallbacks"], entry["empty"],
+                 time.time())
+            )
+            conn.commit()
+
+    def get_stats(self) -> dict:
+        """
+        获取按站点的命中统计
+
+        Returns:
+            统计信息字典，domains中每个站点包含选择器、提取次数、命中率和body回退率
+        """
+        with self.lock:
+            self.__connect__()
+            domains = {domain: dict(entry) for domain, entry in self.domains.items()}
+        for entry in domains.values():
+            extractions = entry["extractions"]
+            entry["hit_rate"] = round(entry["hits"] / extractions, 4) if extractions else 0
+            entry["body_rate"] = round(entry["body_fallbacks"] / extractions, 4) if extractions else 0
+        return {
+            "domains_learned": sum(1 for entry in domains.values() if entry["selector"]),
+            "extractions": sum(entry["extractions"] for entry in domains.values()),
+            "hits": sum(entry["hits"] for entry in domains.values()),
+            "body_fallbacks": sum(entry["body_fallbacks"] for entry in domains.values()),
+            "domains": domains
+        }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def __connect__(self) -> sqlite3.Connection:
+        """打开数据库并载入内存（调用方持有锁）"""
+        if self.conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS selectors ("
+                "domain TEXT PRIMARY KEY, selector TEXT, extractions INTEGER, hits INTEGER, "
+                "body_fallbacks INTEGER, empty INTEGER, updated_at REAL)"
+            )
+            self.conn.commit()
+            self.domains = {
+                domain: {"selector": selector, "extractions": extractions, "hits": hits,
+                         "body_fallbacks": body_fallbacks, "empty": empty}
+                for domain, selector, extractions, hits, body_fallbacks, empty in self.conn.execute(
+                    "SELECT domain, selector, extractions, hits, body_fallbacks, empty FROM selectors"
+                )
+            }
+            log_global_info(f"正文选择器缓存已载入 {len(self.domains)} 个站点")
+        return self.conn
@@ -0,0 +1,153 @@
+import hashlib
+import re
+from typing import Optional
+
+import numpy as np
+
+# SimHash指纹位数
+SIMHASH_BITS = 64
+
+# 文本切分为字符n-gram的长度（中文没有空格分词，按相邻两个字符切分）
+SHINGLE_SIZE = 2
+
+# 指纹汉明距离不超过该值视为近似重复（按标题+正文开头的转载稿调校）
+NEAR_DUPLICATE_DISTANCE = 8
+
+# 计算指纹时使用的正文开头字符数（相当于第一段）
+FINGERPRINT_CONTENT_CHARS = 200
+
+# 文本至少包含多少个不同的n-gram才做近似重复判断（过短的文本指纹波动大，只做完全去重）
+MIN_SHINGLES = 8
+
+# 计算指纹前去掉的字符（标点、空白等非文字字符）
+NON_WORD_PATTERN = re.compile(r'[^\w]')
+
+
+def shingles(text: str, shingle_size: int = SHINGLE_SIZE) -> set:
+    """文本规范化（转小写、去掉标点和空白）后切分为字符n-gram集合"""
+    normalized = NON_WORD_PATTERN.sub('', text.lower())
+    if not normalized:
+        return set()
+    return {normalized[i:i + shingle_size] for i in range(max(1, len(normalized) - shingle_size + 1))}
+
+
+def simhash(text: str, shingle_size: int = SHINGLE_SIZE) -> int:
+    """
+    计算文本的64位SimHash指纹
+
+    每个字符n-gram的64位哈希按位投票，票数为正的位置为1，
+    相似文本的指纹汉明距离小。
+
+    Args:
+        text: 文本
+        shingle_size: n-gram长度
+
+    Returns:
+        64位整数指纹，空文本返回0
+    """
+    return __simhash_shingles__(shingles(text, shingle_size))
+
+
+def fingerprint(text: str) -> Optional[int]:
+    """
+    计算用于近似重复判断的指纹
+
+    Args:
+        text: 文本
+
+    Returns:
+        SimHash指纹，文本过短（不足MIN_SHINGLES个n-gram）时返回None
+    """
+    text_shingles = shingles(text)
+    if len(text_shingles) < MIN_SHINGLES:
+        return None
+    return __simhash_shingles__(text_shingles)
+
+
+def __simhash_shingles__(text_shingles: set) -> int:
+    """按n-gram集合计算SimHash"""
+    if not text_shingles:
+        return 0
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') for s in text_shingles],
+        dtype=np.uint64
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int(np.packbits(votes > 0, bitorder='little').view(np.uint64)[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin(a ^ b).count('1')
+
+
+class NearDuplicateIndex():
+    """
+    SimHash指纹的LSH索引
+
+    64位指纹切分为max_distance+1段，由抽屉原理，汉明距离不超过max_distance
+    的两个指纹至少有一段完全相同；每段按值分桶，查询只比较同桶的候选，
+    整体对结果集为线性时间。
+    """
+
+    def __init__(self, max_distance: int = NEAR_DUPLICATE_DISTANCE):
+        """
+        初始化索引
+
+        Args:
+            max_distance: 视为近似重复的最大汉明距离
+        """
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = SIMHASH_BITS // bands
+        # 每段的(起始位, 位宽)，余下的位并入最后一段
+        self.bands = [(i * width, width if i < bands - 1 else SIMHASH_BITS - i * width) for i in range(bands)]
+        self.buckets = {}  # (段序号, 段值) -> 条目序号列表
+        self.fingerprints = []
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def find(self, fingerprint: int) -> Optional[int]:
+        """
+        查找近似重复的已有条目
+
+        Args:
+            fingerprint: SimHash指纹
+
+        Returns:
+            距离最近的已有条目序号，没有近似重复时返回None
+        """
+        best = None
+        best_distance = self.max_distance + 1
+        checked = set()
+        for key in self.__band_keys__(fingerprint):
+            for entry in self.buckets.get(key, ()):
+                if entry in checked:
+                    continue
+                checked.add(entry)
+                distance = hamming_distance(fingerprint, self.fingerprints[entry])
+                if distance < best_distance:
+                    best, best_distance = entry, distance
+        return best
+
+    def add(self, fingerprint: int) -> int:
+        """
+        加入一个指纹
+
+        Args:
+            fingerprint: SimHash指纹
+
+        Returns:
+            新条目的序号
+        """
+        entry = len(self.fingerprints)
+        self.fingerprints.append(fingerprint)
+        for key in self.__band_keys__(fingerprint):
+            self.buckets.setdefault(key, []).append(entry)
+        return entry
+
+    def __band_keys__(self, fingerprint: int) -> list:
+        """指纹各段的分桶键"""
+        return [(i, (fingerprint >> start) & ((1 << width) - 1)) for i, (start, width) in enumerate(self.bands)]
@@ -0,0 +1,49 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+# 单个新闻源处理一个关键词的默认时间上限（秒），超时后只使用已经返回的新闻
+SOURCE_TIMEOUT = 60
+
+# 单个新闻源每个关键词默认最多返回的新闻数
+SOURCE_MAX_RESULTS = 50
+
+
+class NewsSource(ABC):
+    """
+    新闻源适配器接口
+
+    每个新闻源实现iter_news，按关键词和日期范围逐条产出统一格式的新闻
+    （source、title、url、date、search_term，获取正文时还有content）。
+    采集器对所有新闻源和关键词并发调用，每次调用受timeout和max_results限制。
+    未实现iter_news的子类在实例化时即抛出TypeError。
+    """
+
+    # 新闻源名称，用于日志和存档覆盖范围记录
+    name = ""
+
+    def __init__(self, timeout: float = SOURCE_TIMEOUT, max_results: int = SOURCE_MAX_RESULTS):
+        """
+        初始化新闻源
+
+        Args:
+            timeout: 处理一个关键词的时间上限（秒）
+            max_results: 每个关键词最多返回的新闻数
+        """
+        self.timeout = timeout
+        self.max_results = max_results
+
+    @abstractmethod
+    def iter_news(self, keyword: str, industry: str, start_date: str, end_date: str, include_content: bool = True,
+                  progress: Optional[dict] = None):
+        """
+        逐条产出新闻（异步生成器）
+
+        Args:
+            keyword: 搜索关键词
+            industry: 行业名称
+            start_date: 开始日期（YYYY-MM-DD）
+            end_date: 结束日期（YYYY-MM-DD）
+            include_content: 是否获取正文
+            progress: 不为None时，完整覆盖日期范围后设置progress["complete"]为True
+        """
+        raise NotImplementedError
@@ -0,0 +1,128 @@
+import math
+import re
+
+import numpy as np
+
+from news_dedupe_utils import shingles
+
+# 每篇文章正文的建议字符上限（超出时做抽取式摘要），也是summarize的默认值；fetch_news默认不限制
+SUMMARY_MAX_CHARS = 800
+
+# 一次返回中所有正文的建议字符上限（按文章长度均分，短文章用不完的额度分给长文章）；fetch_news默认不限制
+RESPONSE_MAX_CHARS = 30000
+
+# 参与排序的最多句子数（超长文章只取前面的句子，控制相似度矩阵的大小）
+MAX_SENTENCES = 200
+
+# TextRank阻尼系数、最大迭代次数和收敛阈值
+DAMPING = 0.85
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-6
+
+# 句子切分：以中英文句末标点结尾，句末的引号、括号归入本句
+SENTENCE_PATTERN = re.compile(r'[^。！？!?；;]+[。！？!?；;]*[”’"\'」』）)]*')
+
+# 截断句子时追加的省略号
+ELLIPSIS = "…"
+
+
+def split_sentences(text: str) -> list:
+    """
+    把正文切分为句子
+
+    Args:
+        text: 正文
+
+    Returns:
+        去掉首尾空白后的非空句子列表
+    """
+    return [sentence.strip() for sentence in SENTENCE_PATTERN.findall(text) if sentence.strip()]
+
+
+def rank_sentences(sentences: list) -> np.ndarray:
+    """
+    用TextRank计算句子的重要性
+
+    两句的相似度为共有的字符二元组数除以两句二元组数的对数之和（TextRank原文的定义），
+    在相似度图上做带阻尼的PageRank迭代。
+
+    Args:
+        sentences: 句子列表
+
+    Returns:
+        与句子一一对应的得分数组
+    """
+    count = len(sentences)
+    if count == 0:
+        return np.zeros(0)
+    sentence_shingles = [shingles(sentence) for sentence in sentences]
+    weights = np.zeros((count, count))
+    for i in range(count):
+        for j in range(i + 1, count):
+            common = len(sentence_shingles[i] & sentence_shingles[j])
+            if common:
+                norm = math.log(len(sentence_shingles[i]) + 1) + math.log(len(sentence_shingles[j]) + 1)
+                weights[i, j] = weights[j, i] = common / norm
+    out_weights = weights.sum(axis=1)
+    # 没有相似句子的孤立句只保留阻尼项得分
+    transition = np.divide(weights, out_weights[:, None], out=np.zeros_like(weights), where=out_weights[:, None] > 0)
+    scores = np.full(count, 1.0 / count)
+    for _ in range(MAX_ITERATIONS):
+        updated = (1 - DAMPING) / count + DAMPING * transition.T @ scores
+        if np.abs(updated - scores).sum() < TOLERANCE:
+            return updated
+        scores = updated
+    return scores
+
+
+def summarize(text: str, max_chars: int = SUMMARY_MAX_CHARS) -> str:
+    """
+    抽取式摘要：按TextRank得分从高到低选句，直到达到字符上限，再按原文顺序拼接
+
+    Args:
+        text: 正文
+        max_chars: 摘要的字符上限，不大于0表示不限制
+
+    Returns:
+        摘要；正文不超过上限时原样返回
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    sentences = split_sentences(text)[:MAX_SENTENCES]
+    if not sentences:
+        return text[:max_chars - 1] + ELLIPSIS
+    scores = rank_sentences(sentences)
+    chosen = []
+    used = 0
+    for index in np.argsort(-scores, kind='stable'):
+        length = len(sentences[index])
+        if used + length <= max_chars:
+            chosen.append(index)
+            used += length
+    if not chosen:
+        # 最重要的句子也超过上限时截断该句
+        return sentences[int(np.argmax(scores))][:max_chars - 1] + ELLIPSIS
+    return "".join(sentences[index] for index in sorted(chosen))
+
+
+def allocate_budget(lengths: list, total: int) -> list:
+    """
+    按总字符上限为每篇文章分配额度（水位线分配：短于平均额度的文章全部保留，余量分给其余文章）
+
+    Args:
+        lengths: 各篇正文的长度
+        total: 总字符上限，不大于0表示不限制
+
+    Returns:
+        与lengths一一对应的每篇字符上限
+    """
+    if total <= 0 or sum(lengths) <= total:
+        return list(lengths)
+    budgets = [0] * len(lengths)
+    remaining = total
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        budgets[i] = min(lengths[i], share)
+        remaining -= budgets[i]
+    return budgets
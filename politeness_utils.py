@@ -0,0 +1,187 @@
+import asyncio
+import re
+import time
+from typing import Optional
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_info, log_global_debug
+
+# 每个主机的初始请求速率（次/秒）
+POLITENESS_INITIAL_RATE = 0.5
+
+# 速率下限和上限（次/秒）：下限即最长请求间隔5秒，上限即最短请求间隔0.25秒
+POLITENESS_MIN_RATE = 0.2
+POLITENESS_MAX_RATE = 4
+
+# 加性增：每个快速且正常的响应把速率提高的量（次/秒）
+POLITENESS_RATE_STEP = 0.1
+
+# 乘性减：被限流、被拒绝、响应过慢或出错时速率乘以该系数
+POLITENESS_BACKOFF_FACTOR = 0.5
+
+# 响应时间超过该值（秒）视为主机吃紧
+SLOW_RESPONSE_SECONDS = 3
+
+# 表示被限流或拒绝访问的HTTP状态码
+THROTTLE_STATUSES = frozenset([403, 429, 503])
+
+# Retry-After最多遵守的秒数
+MAX_RETRY_AFTER_SECONDS = 60
+
+# 验证码/拦截页面的标题关键词
+CAPTCHA_TITLE_MARKERS = ("验证码", "安全验证", "访问受限", "captcha")
+
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+
+
+class BlockedError(Exception):
+    """返回了验证码或拦截页面（按429处理，可在退避后重试）"""
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.status = 429
+
+
+def looks_like_captcha(html: str) -> bool:
+    """根据页面标题判断是否为验证码或拦截页面"""
+    match = TITLE_PATTERN.search(html[:4096])
+    if not match:
+        return False
+    title = match.group(1).lower()
+    return any(marker in title for marker in CAPTCHA_TITLE_MARKERS)
+
+
+class PolitenessController():
+    """
+    按主机的自适应请求节奏控制（AIMD）
+
+    每个主机维护一个请求速率，同一主机的请求按1/速率的间隔依次放行；
+    响应快且正常时速率加性增加，遇到429/403/503、验证码页面、慢响应或网络错误时
+    速率乘性减少并推迟下一次请求，速率始终在[min_rate, max_rate]之间。
+    只在事件循环线程中调用。
+    """
+
+    def __init__(self, initial_rate: float = POLITENESS_INITIAL_RATE, min_rate: float = POLITENESS_MIN_RATE,
+                 max_rate: float = POLITENESS_MAX_RATE, rate_step: float = POLITENESS_RATE_STEP,
+                 backoff_factor: float = POLITENESS_BACKOFF_FACTOR, slow_seconds: float = SLOW_RESPONSE_SECONDS):
+        """
+        初始化节奏控制
+
+        Args:
+            initial_rate: 每个主机的初始速率（次/秒）
+            min_rate: 速率下限（次/秒）
+            max_rate: 速率上限（次/秒）
+            rate_step: 正常响应后速率的增量（次/秒）
+            backoff_factor: 异常响应后速率的乘数
+            slow_seconds: 视为慢响应的响应时间（秒）
+        """
+        self.min_rate = min_rate
+        self.max_rate = max(min_rate, max_rate)
+        self.initial_rate = min(self.max_rate, max(min_rate, initial_rate))
+        self.rate_step = rate_step
+        self.backoff_factor = backoff_factor
+        self.slow_seconds = slow_seconds
+        self.hosts = {}
+
+    async def acquire(self, host: str) -> float:
+        """
+        等待到该主机允许发出下一个请求
+
+        Args:
+            host: 主机名
+
+        Returns:
+            实际等待的秒数
+        """
+        state = self.__state__(host)
+        now = time.monotonic()
+        start = max(now, state["next_at"])
+        state["next_at"] = start + 1 / state["rate"]
+        state["requests"] += 1
+        wait = start - now
+        if wait > 0:
+            state["wait_seconds"] += wait
+            await asyncio.sleep(wait)
+        return wait
+
+    def record(self, host: str, latency: float, status: Optional[int] = None, blocked: bool = False,
+               retry_after: Optional[str] = None):
+        """
+        根据响应调整主机速率
+
+        Args:
+            host: 主机名
+            latency: 响应时间（秒）
+            status: HTTP状态码
+            blocked: 是否为验证码或拦截页面
+            retry_after: 响应的Retry-After头（秒数）
+        """
+        state = self.__state__(host)
+        if blocked:
+            state["blocked"] += 1
+            self.__back_off__(host, state, "验证码或拦截页面", retry_after)
+        elif status in THROTTLE_STATUSES:
+            state["throttled"] += 1
+            self.__back_off__(host, state, f"HTTP {status}", retry_after)
+        elif latency > self.slow_seconds:
+            state["slow"] += 1
+            self.__back_off__(host, state, f"响应时间 {latency:.2f} 秒")
+        else:
+            rate = min(self.max_rate, state["rate"] + self.rate_step)
+            if rate > state["rate"]:
+                state["speedups"] += 1
+            state["rate"] = rate
+
+    def record_error(self, host: str):
+        """网络错误或超时后降低主机速率"""
+        state = self.__state__(host)
+        state["errors"] += 1
+        self.__back_off__(host, state, "网络错误")
+
+    def get_stats(self) -> dict:
+        """
+        获取各主机当前速率和调整次数
+
+        Returns:
+            统计信息字典，hosts中每个主机包含rate（次/秒）、interval_seconds和各类计数
+        """
+        hosts = {}
+        for host, state in self.hosts.items():
+            stats = {key: value for key, value in state.items() if key != "next_at"}
+            stats["rate"] = round(state["rate"], 3)
+            stats["interval_seconds"] = round(1 / state["rate"], 3)
+            stats["wait_seconds"] = round(state["wait_seconds"], 2)
+            hosts[host] = stats
+        return {
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "hosts": hosts
+        }
+
+    def __state__(self, host: str) -> dict:
+        """获取主机状态，首次请求时初始化"""
+        if host not in self.hosts:
+            self.hosts[host] = {
+                "rate": self.initial_rate,
+                "next_at": 0.0,
+                "requests": 0,
+                "wait_seconds": 0.0,
+                "speedups": 0,
+                "backoffs": 0,
+                "throttled": 0,
+                "blocked": 0,
+                "slow": 0,
+                "errors": 0
+            }
+        return self.hosts[host]
+
+    def __back_off__(self, host: str, state: dict, reason: str, retry_after: Optional[str] = None):
+        """乘性降低速率，并把下一次请求推迟到新的间隔（或Retry-After）之后"""
+        state["rate"] = max(self.min_rate, state["rate"] * self.backoff_factor)
+        state["backoffs"] += 1
+        delay = 1 / state["rate"]
+        if retry_after and retry_after.strip().isdigit():
+            delay = max(delay, min(MAX_RETRY_AFTER_SECONDS, int(retry_after.strip())))
+        state["next_at"] = max(state["next_at"], time.monotonic() + delay)
+        log_global_info(f"主机 {host} {reason}，请求速率降至 {state['rate']:.2f} 次/秒")
+        log_global_debug(f"主机 {host} 下一次请求推迟 {delay:.2f} 秒")
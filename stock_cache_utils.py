@@ -0,0 +1,543 @@
+import json
+import os
+import pathlib
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_info, log_global_debug, log_global_warning, log_global_error
+
+# 本地缓存目录（证券主数据快照等）
+CACHE_DIR = pathlib.Path(__file__).parent / "cache"
+
+# 证券主数据缓存有效期（小时），默认一天刷新一次
+SECURITY_MASTER_TTL_HOURS = 24
+
+
+class SecurityMasterCache():
+    """
+    证券主数据缓存（进程内缓存 + 磁盘快照）
+
+    每张表通过 register_table 注册一个加载函数，首次使用时依次尝试
+    内存、磁盘快照、上游接口，过期后自动重新加载；重新加载失败时
+    继续使用过期数据，避免上游故障导致代码查询不可用。
+    """
+
+    def __init__(self, cache_dir: Optional[pathlib.Path] = None, ttl_hours: float = SECURITY_MASTER_TTL_HOURS):
+        """
+        初始化证券主数据缓存
+
+        Args:
+            cache_dir: 磁盘快照目录，默认为项目下的cache/security_master
+            ttl_hours: 默认缓存有效期（小时）
+        """
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir else CACHE_DIR / "security_master"
+        self.ttl_hours = ttl_hours
+        self.loaders = {}
+        self.ttls = {}
+        self.tables = {}  # name -> (loaded_at时间戳, DataFrame)
+        self.locks = {}
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_loads": 0,
+            "refreshes": 0,
+            "stale_served": 0,
+            "load_errors": 0
+        }
+
+    def register_table(self, name: str, loader: Callable[[], pd.DataFrame], ttl_hours: Optional[float] = None):
+        """
+        注册一张主数据表
+
+        Args:
+            name: 表名，同时作为快照文件名
+            loader: 从上游加载整张表的函数
+            ttl_hours: 该表的有效期（小时），为None时使用默认值
+        """
+        self.loaders[name] = loader
+        self.ttls[name] = ttl_hours if ttl_hours is not None else self.ttl_hours
+        self.locks.setdefault(name, threading.Lock())
+
+    def get_table(self, name: str) -> pd.DataFrame:
+        """
+        获取主数据表，优先使用未过期的内存或磁盘缓存
+
+        Args:
+            name: 已注册的表名
+
+        Returns:
+            表数据DataFrame
+        """
+        if name not in self.loaders:
+            raise KeyError(f"未注册的主数据表: {name}")
+
+        cached = self.tables.get(name)
+        if cached and not self.__is_expired__(name, cached[0]):
+            self.__count__("hits")
+            return cached[1]
+
+        with self.locks[name]:
+            # 等待锁期间可能已被其他线程加载
+            cached = self.tables.get(name)
+            if cached and not self.__is_expired__(name, cached[0]):
+                self.__count__("hits")
+                return cached[1]
+
+            if cached is None:
+                snapshot = self.__load_snapshot__(name)
+                if snapshot is not None:
+                    self.tables[name] = snapshot
+                    if not self.__is_expired__(name, snapshot[0]):
+                        self.__count__("disk_loads")
+                        log_global_info(f"从磁盘快照加载主数据表'{name}'，共 {len(snapshot[1])} 行")
+                        return snapshot[1]
+                    cached = snapshot
+
+            self.__count__("misses")
+            return self.__reload__(name, stale=cached)
+
+    def refresh(self, name: Optional[str] = None) -> dict:
+        """
+        立即从上游重新加载主数据表
+
+        Args:
+            name: 要刷新的表名，为None时刷新全部已注册表
+
+        Returns:
+            每张表刷新后的行数，刷新失败时为错误信息
+        """
+        names = [name] if name else list(self.loaders.keys())
+        result = {}
+        for table_name in names:
+            if table_name not in self.loaders:
+                result[table_name] = f"未注册的主数据表: {table_name}"
+                continue
+            with self.locks[table_name]:
+                self.__count__("refreshes")
+                try:
+                    df = self.__reload__(table_name, stale=None)
+                    result[table_name] = len(df)
+                except Exception as e:
+                    result[table_name] = f"刷新失败: {str(e)}"
+        return result
+
+    def get_stats(self) -> dict:
+        """
+        获取缓存命中统计和各表状态
+
+        Returns:
+            统计信息字典
+        """
+        now = time.time()
+        with self.stats_lock:
+            stats = dict(self.stats)
+        stats["ttl_hours"] = self.ttl_hours
+        stats["tables"] = {
+            name: {
+                "rows": len(df),
+                "loaded_at": datetime.fromtimestamp(loaded_at).strftime('%Y-%m-%d %H:%M:%S'),
+                "age_hours": round((now - loaded_at) / 3600, 2),
+                "expired": self.__is_expired__(name, loaded_at)
+            }
+            for name, (loaded_at, df) in self.tables.items()
+        }
+        return stats
+
+    def __reload__(self, name: str, stale=None) -> pd.DataFrame:
+        """从上游加载表并写入内存和磁盘，失败时回退到过期数据"""
+        log_global_info(f"从上游加载主数据表'{name}'")
+        try:
+            df = self.loaders[name]()
+            if df is None or df.empty:
+                raise ValueError(f"上游返回的主数据表'{name}'为空")
+        except Exception as e:
+            self.__count__("load_errors")
+            if stale is not None:
+                self.__count__("stale_served")
+                log_global_warning(f"加载主数据表'{name}'失败，使用过期缓存: {str(e)}")
+                return stale[1]
+            log_global_error(f"加载主数据表'{name}'失败: {str(e)}")
+            raise
+
+        df = df.reset_index(drop=True)
+        loaded_at = time.time()
+        self.tables[name] = (loaded_at, df)
+        self.__save_snapshot__(name, loaded_at, df)
+        log_global_info(f"主数据表'{name}'加载完成，共 {len(df)} 行")
+        return df
+
+    def __is_expired__(self, name: str, loaded_at: float) -> bool:
+        """判断缓存是否超过有效期"""
+        ttl_hours = self.ttls.get(name, self.ttl_hours)
+        return time.time() - loaded_at > ttl_hours * 3600
+
+    def __snapshot_path__(self, name: str) -> pathlib.Path:
+        """获取快照文件路径"""
+        return self.cache_dir / f"{name}.json"
+
+    def __load_snapshot__(self, name: str):
+        """读取磁盘快照，返回(loaded_at, DataFrame)或None"""
+        path = self.__snapshot_path__(name)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            df = pd.DataFrame(snapshot["records"], columns=snapshot["columns"])
+            return snapshot["saved_at"], df
+        except Exception as e:
+            log_global_warning(f"读取主数据快照'{path}'失败: {str(e)}")
+            return None
+
+    def __save_snapshot__(self, name: str, loaded_at: float, df: pd.DataFrame):
+        """将表写入磁盘快照（先写临时文件再替换，避免写入中断导致快照损坏）"""
+        path = self.__snapshot_path__(name)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            snapshot = {
+                "saved_at": loaded_at,
+                "columns": [str(c) for c in df.columns],
+                "records": df.astype(object).where(df.notna(), None).values.tolist()
+            }
+            tmp_path = path.with_suffix(".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            log_global_debug(f"主数据快照已保存: {path}")
+        except Exception as e:
+            log_global_warning(f"保存主数据快照'{path}'失败: {str(e)}")
+
+    def __count__(self, key: str, n: int = 1):
+        """线程安全地累加统计计数"""
+        with self.stats_lock:
+            self.stats[key] += n
+
+
+# 日线数据本地存储目录
+BAR_STORE_DIR = CACHE_DIR / "bars"
+
+# 收盘后多久认为当日K线已定型（时, 分）
+MARKET_SETTLE_TIME = (15, 30)
+
+
+class BarStore():
+    """
+    按(股票代码, 复权方式)存储的本地日线列存
+
+    每个键对应一个目录，每列保存为一个.npy文件并以内存映射方式读取，
+    请求时只向上游补齐本地缺失的日期区间。前复权数据在除权后会整体
+    变化，因此每次增量获取都会重取最后一根已存K线并校验收盘价，
+    不一致时丢弃本地数据重新拉取。
+    上游获取失败（包括断路器打开）时返回本地已存的部分。
+    """
+
+    def __init__(self, store_dir: Optional[pathlib.Path] = None):
+        """
+        初始化日线存储
+
+        Args:
+            store_dir: 存储目录，默认为项目下的cache/bars
+        """
+        self.store_dir = pathlib.Path(store_dir) if store_dir else BAR_STORE_DIR
+        self.locks = {}
+        self.locks_guard = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "upstream_calls": 0,
+            "upstream_rows": 0,
+            "disk_rows": 0,
+            "full_hits": 0,
+            "invalidations": 0,
+            "stale_served": 0
+        }
+
+    def get_bars(self, symbol: str, adjust: str, start_date: str, end_date: str,
+                 fetcher: Callable[[str, str], pd.DataFrame]) -> pd.DataFrame:
+        """
+        获取[start_date, end_date]区间的日线，只向上游请求本地缺失的部分
+
+        Args:
+            symbol: 6位股票代码
+            adjust: 复权方式（""、"qfq"、"hfq"）
+            start_date: 开始日期，格式YYYYMMDD
+            end_date: 结束日期，格式YYYYMMDD
+            fetcher: 上游获取函数，参数为(start_date, end_date)，格式YYYYMMDD
+
+        Returns:
+            区间内的日线DataFrame，'日期'列为datetime64类型；上游失败时返回本地已存的部分
+        """
+        self.__count__("requests")
+        start = pd.Timestamp(start_date)
+        end = pd.Timestamp(end_date)
+        with self.__lock_for__(symbol, adjust):
+            stored, meta = self.load(symbol, adjust)
+            try:
+                return self.__update__(symbol, adjust, start, end, fetcher, stored, meta)
+            except Exception as e:
+                stale = self.__slice__(stored, start, end) if stored is not None and not stored.empty else None
+                if stale is None or stale.empty:
+                    raise
+                self.__count__("stale_served")
+                log_global_warning(f"上游获取{symbol}({adjust})日线失败，使用本地已存数据: {str(e)}")
+                return stale
+
+    def __update__(self, symbol: str, adjust: str, start: pd.Timestamp, end: pd.Timestamp, fetcher,
+                   stored: Optional[pd.DataFrame], meta: Optional[dict]) -> pd.DataFrame:
+        """补齐本地缺失的区间并返回请求区间的数据（调用方持有键对应的锁）"""
+        if stored is None or stored.empty:
+            df = self.__fetch__(fetcher, start, end)
+            if not df.empty:
+                self.save(symbol, adjust, df, covered_from=start, checked_through=self.__settled_through__(end))
+            return self.__slice__(df, start, end)
+
+        covered_from = pd.Timestamp(meta["covered_from"])
+        checked_through = pd.Timestamp(meta["checked_through"])
+        last_date = stored['日期'].iloc[-1]
+        parts = [stored]
+
+        # 1. 向前补齐早于本地覆盖范围的数据
+        if start < covered_from:
+            parts.insert(0, self.__fetch__(fetcher, start, covered_from - pd.Timedelta(days=1)))
+            covered_from = start
+
+        # 2. 向后增量获取，从最后一根已存K线开始（用于校验复权和更新未定型的K线）
+        if checked_through < end:
+            tail = self.__fetch__(fetcher, last_date, end)
+            if not tail.empty and last_date <= checked_through and not self.__is_consistent__(stored, tail, last_date):
+                self.__count__("invalidations")
+                log_global_warning(f"{symbol}({adjust})复权数据已变化，重新获取完整区间")
+                full = self.__fetch__(fetcher, covered_from, max(end, checked_through))
+                self.save(symbol, adjust, full, covered_from=covered_from,
+                          checked_through=self.__settled_through__(max(end, checked_through)))
+                return self.__slice__(full, start, end)
+            parts.append(tail)
+            checked_through = self.__settled_through__(end)
+        elif len(parts) == 1:
+            self.__count__("full_hits")
+
+        merged = pd.concat([p for p in parts if not p.empty], ignore_index=True)
+        merged = merged.drop_duplicates(subset='日期', keep='last').sort_values('日期').reset_index(drop=True)
+        if len(parts) > 1:
+            self.save(symbol, adjust, merged, covered_from=covered_from, checked_through=checked_through)
+        result = self.__slice__(merged, start, end)
+        self.__count__("disk_rows", int(result['日期'].isin(stored['日期']).sum()))
+        return result
+
+    def load(self, symbol: str, adjust: str):
+        """
+        读取本地存储的全部日线
+
+        Args:
+            symbol: 6位股票代码
+            adjust: 复权方式
+
+        Returns:
+            (DataFrame, meta字典)，不存在时为(None, None)
+        """
+        key_dir = self.__key_dir__(symbol, adjust)
+        meta_path = key_dir / "meta.json"
+        if not meta_path.exists():
+            return None, None
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            data = {}
+            for idx, column in enumerate(meta["columns"]):
+                data[column] = np.load(key_dir / f"{idx}.npy", mmap_mode='r')
+            df = pd.DataFrame({column: np.asarray(values) for column, values in data.items()})
+            df['日期'] = pd.to_datetime(df['日期'])
+            return df, meta
+        except Exception as e:
+            log_global_warning(f"读取本地日线{symbol}({adjust})失败: {str(e)}")
+            return None, None
+
+    def save(self, symbol: str, adjust: str, df: pd.DataFrame, covered_from: pd.Timestamp,
+             checked_through: pd.Timestamp):
+        """
+        写入日线（先写临时目录再替换，避免读到写了一半的数据）
+
+        Args:
+            symbol: 6位股票代码
+            adjust: 复权方式
+            df: 日线数据，需包含'日期'列
+            covered_from: 本地数据覆盖的最早请求日期
+            checked_through: 截至该日期（含）的K线均已定型，无需再向上游确认
+        """
+        key_dir = self.__key_dir__(symbol, adjust)
+        tmp_dir = key_dir.with_name(key_dir.name + ".tmp")
+        try:
+            tmp_dir.mkdir(parents=True, exist_ok=True)
+            columns = ['日期'] + [c for c in df.columns if c != '日期' and pd.api.types.is_numeric_dtype(df[c])]
+            for idx, column in enumerate(columns):
+                if column == '日期':
+                    values = pd.to_datetime(df[column]).values.astype('datetime64[D]')
+                else:
+                    values = df[column].to_numpy(dtype='float64')
+                np.save(tmp_dir / f"{idx}.npy", values)
+            meta = {
+                "columns": columns,
+                "covered_from": pd.Timestamp(covered_from).strftime('%Y-%m-%d'),
+                "checked_through": pd.Timestamp(checked_through).strftime('%Y-%m-%d'),
+                "fetched_at": time.time(),
+                "rows": len(df)
+            }
+            with open(tmp_dir / "meta.json", 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+            if key_dir.exists():
+                old_dir = key_dir.with_name(key_dir.name + ".old")
+                if old_dir.exists():
+                    shutil.rmtree(old_dir)
+                os.replace(key_dir, old_dir)
+                os.replace(tmp_dir, key_dir)
+                shutil.rmtree(old_dir, ignore_errors=True)
+            else:
+                os.replace(tmp_dir, key_dir)
+            log_global_debug(f"本地日线{symbol}({adjust})已保存，共 {len(df)} 行")
+        except Exception as e:
+            log_global_warning(f"保存本地日线{symbol}({adjust})失败: {str(e)}")
+
+    def get_stats(self) -> dict:
+        """
+        获取日线存储统计
+
+        Returns:
+            统计信息字典
+        """
+        with self.stats_lock:
+            return dict(self.stats)
+
+    def __fetch__(self, fetcher, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """调用上游获取区间数据并规范'日期'列"""
+        if start > end:
+            return pd.DataFrame()
+        log_global_info(f"从上游获取日线: {start.strftime('%Y%m%d')} 到 {end.strftime('%Y%m%d')}")
+        df = fetcher(start.strftime('%Y%m%d'), end.strftime('%Y%m%d'))
+        self.__count__("upstream_calls")
+        if df is None or df.empty:
+            return pd.DataFrame()
+        df = df.copy()
+        df['日期'] = pd.to_datetime(df['日期'])
+        self.__count__("upstream_rows", len(df))
+        return df
+
+    def __settled_through__(self, end: pd.Timestamp) -> pd.Timestamp:
+        """计算本次获取后可视为已定型的最后日期（当日收盘结算前的K线仍可能变化）"""
+        now = datetime.now()
+        settled = pd.Timestamp(now.date())
+        if (now.hour, now.minute) < MARKET_SETTLE_TIME:
+            settled -= pd.Timedelta(days=1)
+        return min(end.normalize(), settled)
+
+    def __is_consistent__(self, stored: pd.DataFrame, tail: pd.DataFrame, last_date: pd.Timestamp) -> bool:
+        """校验重取的最后一根已定型K线与本地是否一致（复权因子是否变化）"""
+        new_row = tail[tail['日期'] == last_date]
+        if new_row.empty:
+            return True
+        old_close = float(stored['收盘'].iloc[-1])
+        new_close = float(new_row['收盘'].iloc[0])
+        return abs(old_close - new_close) < 1e-6
+
+    def __slice__(self, df: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        """截取日期区间"""
+        dates = df['日期'].values
+        lo = np.searchsorted(dates, start.to_datetime64(), side='left')
+        hi = np.searchsorted(dates, (end + pd.Timedelta(days=1)).to_datetime64(), side='left')
+        return df.iloc[lo:hi].reset_index(drop=True).copy()
+
+    def __key_dir__(self, symbol: str, adjust: str) -> pathlib.Path:
+        """获取键对应的存储目录"""
+        return self.store_dir / f"{symbol}_{adjust or 'none'}"
+
+    def __lock_for__(self, symbol: str, adjust: str) -> threading.Lock:
+        """获取键对应的锁"""
+        with self.locks_guard:
+            return self.locks.setdefault((symbol, adjust), threading.Lock())
+
+    def __count__(self, key: str, n: int = 1):
+        """线程安全地累加统计计数"""
+        with self.stats_lock:
+            self.stats[key] += n
+
+
+class SingleFlight():
+    """
+    进程内的请求合并（single-flight）
+
+    同一个键同时只执行一次计算：第一个调用者执行，其余并发调用者
+    等待并共享同一个结果或异常。计算完成后立即移除，不做结果缓存。
+    """
+
+    def __init__(self):
+        """初始化请求合并器"""
+        self.in_flight = {}  # key -> Future
+        self.guard = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            "calls": 0,
+            "executions": 0,
+            "coalesced": 0,
+            "errors": 0
+        }
+
+    def do(self, key, fn: Callable[[], object]):
+        """
+        执行或加入键对应的计算
+
+        Args:
+            key: 可哈希的请求键
+            fn: 无参计算函数
+
+        Returns:
+            计算结果；并发调用者得到同一个对象，调用方不应原地修改
+        """
+        with self.guard:
+            future = self.in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.in_flight[key] = future
+        self.__count__("calls")
+
+        if not leader:
+            self.__count__("coalesced")
+            log_global_debug(f"合并进行中的请求: {key}")
+            return future.result()
+
+        self.__count__("executions")
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            self.__count__("errors")
+            future.set_exception(e)
+        finally:
+            with self.guard:
+                self.in_flight.pop(key, None)
+        return future.result()
+
+    def get_stats(self) -> dict:
+        """
+        获取请求合并统计
+
+        Returns:
+            统计信息字典
+        """
+        with self.stats_lock:
+            stats = dict(self.stats)
+        with self.guard:
+            stats["in_flight"] = len(self.in_flight)
+        return stats
+
+    def __count__(self, key: str, n: int = 1):
+        """线程安全地累加统计计数"""
+        with self.stats_lock:
+            self.stats[key] += n
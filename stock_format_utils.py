@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta
+
+# 紧凑格式版本号
+COMPACT_FORMAT = "compact-v1"
+
+# 支持的返回格式
+RESPONSE_FORMATS = ("full", "compact")
+
+
+def choose_scale(values: list, candidates=(100, 10000)) -> int:
+    """
+    选择能无损表示所有数值的最小十进制缩放倍数
+
+    Args:
+        values: 浮点数列表
+        candidates: 候选缩放倍数，从小到大
+
+    Returns:
+        缩放倍数
+    """
+    for scale in candidates:
+        if all(abs(v * scale - round(v * scale)) < 1e-6 for v in values):
+            return scale
+    return candidates[-1]
+
+
+def pack_ints(values: list) -> str:
+    """将整数列表打包为逗号分隔的字符串"""
+    return ",".join(str(v) for v in values)
+
+
+def unpack_ints(text: str) -> list:
+    """将逗号分隔的字符串解包为整数列表"""
+    return [int(v) for v in text.split(",")] if text else []
+
+
+def delta_encode(values: list) -> list:
+    """差分编码：首项保留原值，其余为与前一项之差"""
+    return [v if i == 0 else v - values[i - 1] for i, v in enumerate(values)]
+
+
+def delta_decode(deltas: list) -> list:
+    """差分解码"""
+    values = []
+    for d in deltas:
+        values.append(d if not values else values[-1] + d)
+    return values
+
+
+def encode_compact_time_series(time_series: dict) -> dict:
+    """
+    将完整格式的time_series编码为紧凑格式
+
+    - 日期: 起始日期 + 相邻日期间隔天数
+    - 收盘价: 按price_scale放大为整数后差分编码
+    - 开盘/最高/最低价: 与当日收盘价的整数偏移
+    - 成交量: 差分编码
+    - 涨跌幅: 按pct_scale放大为整数
+    所有整数列以逗号分隔的字符串返回，避免逐元素的JSON开销。
+
+    Args:
+        time_series: fetch_stock_data返回的完整time_series
+
+    Returns:
+        紧凑格式的time_series字典
+    """
+    dates = time_series["dates"]
+    ohlc = time_series["ohlc"]
+    price_scale = choose_scale(ohlc["open"] + ohlc["high"] + ohlc["low"] + ohlc["close"])
+    pct_scale = choose_scale(time_series["pct_change"])
+
+    def scaled(values, scale):
+        return [int(round(v * scale)) for v in values]
+
+    close = scaled(ohlc["close"], price_scale)
+    day_numbers = [datetime.strptime(d, '%Y-%m-%d').toordinal() for d in dates]
+    return {
+        "format": COMPACT_FORMAT,
+        "length": len(dates),
+        "start_date": dates[0] if dates else "",
+        "date_gaps": pack_ints(delta_encode(day_numbers)[1:]),
+        "price_scale": price_scale,
+        "close": pack_ints(delta_encode(close)),
+        "open_offset": pack_ints([o - c for o, c in zip(scaled(ohlc["open"], price_scale), close)]),
+        "high_offset": pack_ints([h - c for h, c in zip(scaled(ohlc["high"], price_scale), close)]),
+        "low_offset": pack_ints([l - c for l, c in zip(scaled(ohlc["low"], price_scale), close)]),
+        "volume": pack_ints(delta_encode([int(v) for v in time_series["volume"]])),
+        "pct_scale": pct_scale,
+        "pct_change": pack_ints(scaled(time_series["pct_change"], pct_scale))
+    }
+
+
+def decode_compact_time_series(compact: dict) -> dict:
+    """
+    将紧凑格式的time_series还原为完整格式
+
+    Args:
+        compact: encode_compact_time_series的返回值
+
+    Returns:
+        与fetch_stock_data完整格式相同结构的time_series
+    """
+    if compact.get("format") != COMPACT_FORMAT:
+        raise ValueError(f"不支持的time_series格式: {compact.get('format')}")
+    if not compact["length"]:
+        return {"dates": [], "ohlc": {"open": [], "high": [], "low": [], "close": []}, "volume": [], "pct_change": []}
+
+    start = datetime.strptime(compact["start_date"], '%Y-%m-%d')
+    offsets = delta_decode([0] + unpack_ints(compact["date_gaps"]))
+    price_scale = compact["price_scale"]
+    price_digits = len(str(price_scale)) - 1
+    pct_digits = len(str(compact["pct_scale"])) - 1
+    close = delta_decode(unpack_ints(compact["close"]))
+
+    def prices(offset_key):
+        return [round((c + o) / price_scale, price_digits) for c, o in zip(close, unpack_ints(compact[offset_key]))]
+
+    return {
+        "dates": [(start + timedelta(days=o)).strftime('%Y-%m-%d') for o in offsets],
+        "ohlc": {
+            "open": prices("open_offset"),
+            "high": prices("high_offset"),
+            "low": prices("low_offset"),
+            "close": [round(c / price_scale, price_digits) for c in close]
+        },
+        "volume": delta_decode(unpack_ints(compact["volume"])),
+        "pct_change": [round(p / compact["pct_scale"], pct_digits) for p in unpack_ints(compact["pct_change"])]
+    }
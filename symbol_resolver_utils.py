@@ -0,0 +1,302 @@
+import re
+import time
+import unicodedata
+from typing import Iterable, Optional
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_info, log_global_debug
+
+# 拼音首字母别名为可选功能，未安装pypinyin时跳过
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+    Style = None
+
+# 股票简称中的状态前缀（ST、除权除息、新股上市等）
+STATUS_PREFIX_PATTERN = re.compile(r'^(\*?ST|S\*ST|XD|XR|DR|N|C)(?=[\u4e00-\u9fff])')
+
+# 常见地域前缀，用于生成"茅台"→"贵州茅台"这类简称
+REGION_PREFIXES = (
+    "中国", "北京", "天津", "上海", "重庆", "河北", "山西", "辽宁", "吉林", "黑龙江",
+    "江苏", "浙江", "安徽", "福建", "江西", "山东", "河南", "湖北", "湖南", "广东",
+    "海南", "四川", "贵州", "云南", "陕西", "甘肃", "青海", "内蒙古", "广西", "西藏",
+    "宁夏", "新疆", "深圳", "广州", "杭州", "南京", "武汉", "成都", "西安", "厦门",
+    "青岛", "大连", "宁波", "苏州"
+)
+
+# 常见公司名称后缀，去掉后作为简称
+NAME_SUFFIXES = ("股份", "集团", "控股")
+
+# 市场上约定俗成、无法从名称规则推导出的简称
+COMMON_ALIASES = {
+    "工行": "工商银行",
+    "农行": "农业银行",
+    "中行": "中国银行",
+    "建行": "建设银行",
+    "交行": "交通银行",
+    "招行": "招商银行",
+    "浦发": "浦发银行",
+    "民生": "民生银行",
+    "兴业": "兴业银行",
+    "邮储": "邮储银行",
+    "国寿": "中国人寿",
+    "中石油": "中国石油",
+    "中石化": "中国石化",
+    "中移动": "中国移动",
+    "宁德": "宁德时代",
+    "茅台": "贵州茅台"
+}
+
+# 查询中可能带有的法定名称后缀
+LEGAL_SUFFIXES = ("股份有限公司", "有限责任公司", "有限公司", "公司")
+
+# 各匹配方式的基础得分
+MATCH_SCORES = {
+    "exact": 1.0,
+    "code": 1.0,
+    "alias": 0.95,
+    "pinyin": 0.9,
+    "substring": 0.8,
+    "fuzzy": 0.75
+}
+
+# 多只股票共享的别名（如去掉地域前缀后的"银行"）只作为候选，匹配方式标记为该值，不会被自动采用
+SHARED_ALIAS_MATCH = "shared_alias"
+
+# 自动采用最高分候选时，其得分至少领先第二名的分数
+AUTO_RESOLVE_MARGIN = 0.03
+
+
+def get_market_by_code(code: str) -> str:
+    """
+    根据股票代码判断交易所
+
+    Args:
+        code: 6位股票代码
+
+    Returns:
+        交易所代码，SH或SZ
+    """
+    if code.startswith(('6', '9')):
+        return "SH"
+    elif code.startswith(('0', '2', '3')):
+        return "SZ"
+    return "SH"  # 默认
+
+
+def normalize_name(name: str) -> str:
+    """
+    规范化名称：全角转半角、去空白、英文转大写
+
+    Args:
+        name: 原始名称
+
+    Returns:
+        规范化后的名称
+    """
+    if not name:
+        return ""
+    name = unicodedata.normalize('NFKC', str(name))
+    return re.sub(r'\s+', '', name).upper()
+
+
+class SymbolResolver():
+    """
+    公司名称到股票代码的索引解析器
+
+    构建时一次性生成精确名称表、简称/拼音首字母别名表、二元字符倒排索引，
+    查询时只访问少量候选，返回按得分排序的候选列表。
+    """
+
+    def __init__(self, records: Iterable[tuple]):
+        """
+        根据(代码, 名称)记录构建索引
+
+        Args:
+            records: (code, name) 二元组序列
+        """
+        start_time = time.time()
+        self.codes = []
+        self.names = []
+        self.normalized = []
+        self.gram_counts = []
+        self.exact_index = {}
+        self.code_index = {}
+        self.alias_index = {}
+        self.gram_index = {}
+
+        for code, name in records:
+            code = str(code).strip()
+            name = str(name).strip()
+            if not code or not name or code in self.code_index:
+                continue
+            idx = len(self.codes)
+            norm = normalize_name(name)
+            self.codes.append(code)
+            self.names.append(name)
+            self.normalized.append(norm)
+            self.code_index[code] = idx
+            self.exact_index.setdefault(norm, []).append(idx)
+
+            for alias, kind in self.__build_aliases__(norm):
+                self.alias_index.setdefault(alias, []).append((idx, kind))
+
+            grams = self.__grams__(norm)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.gram_index.setdefault(gram, set()).add(idx)
+
+        for alias, full_name in COMMON_ALIASES.items():
+            for idx in self.exact_index.get(normalize_name(full_name), []):
+                owners = self.alias_index.setdefault(alias, [])
+                if all(owner != idx for owner, _ in owners):
+                    owners.append((idx, "alias"))
+
+        log_global_info(
+            f"股票名称索引构建完成: {len(self.codes)} 只股票, {len(self.alias_index)} 个别名, "
+            f"{len(self.gram_index)} 个二元组, 耗时 {(time.time() - start_time) * 1000:.1f}ms"
+        )
+
+    def resolve(self, query: str, limit: int = 5) -> list:
+        """
+        解析公司名称，返回按得分排序的候选
+
+        Args:
+            query: 公司名称、简称、拼音首字母或股票代码
+            limit: 最多返回的候选数量
+
+        Returns:
+            候选列表，每项包含code、name、market、symbol、score、match
+        """
+        query = self.__normalize_query__(query)
+        if not query:
+            return []
+
+        scores = {}
+
+        def add(idx, score, kind):
+            if idx not in scores or scores[idx][0] < score:
+                scores[idx] = (score, kind)
+
+        # 1. 股票代码
+        code = query.split('.')[0]
+        if code in self.code_index:
+            add(self.code_index[code], MATCH_SCORES["code"], "code")
+
+        # 2. 精确名称
+        for idx in self.exact_index.get(query, []):
+            add(idx, MATCH_SCORES["exact"], "exact")
+
+        # 3. 简称和拼音首字母别名（多个公司共享的别名适当降分，并标记为共享别名）
+        owners = self.alias_index.get(query, [])
+        for idx, kind in owners:
+            add(idx, MATCH_SCORES[kind] - 0.02 * (len(owners) - 1), kind if len(owners) == 1 else SHARED_ALIAS_MATCH)
+
+        # 4. 二元字符倒排索引召回，按包含关系或Dice系数打分
+        if len(scores) < limit:
+            query_grams = self.__grams__(query)
+            counts = {}
+            for gram in query_grams:
+                for idx in self.gram_index.get(gram, ()):
+                    counts[idx] = counts.get(idx, 0) + 1
+            for idx, shared in counts.items():
+                name = self.normalized[idx]
+                if query in name:
+                    score = MATCH_SCORES["substring"] + 0.15 * len(query) / len(name)
+                    if name.startswith(query):
+                        score += 0.04
+                    add(idx, score, "substring")
+                else:
+                    dice = 2.0 * shared / (len(query_grams) + self.gram_counts[idx])
+                    add(idx, MATCH_SCORES["fuzzy"] * dice, "fuzzy")
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1][0], len(self.names[kv[0]]), self.codes[kv[0]]))
+        candidates = []
+        for idx, (score, kind) in ranked[:max(limit, 0)]:
+            code = self.codes[idx]
+            market = get_market_by_code(code)
+            candidates.append({
+                "code": code,
+                "name": self.names[idx],
+                "market": market,
+                "symbol": f"{code}.{'SS' if market == 'SH' else 'SZ'}",
+                "score": round(min(score, 1.0), 4),
+                "match": kind
+            })
+        log_global_debug(f"名称解析'{query}'得到 {len(candidates)} 个候选")
+        return candidates
+
+    def pick(self, query: str, min_score: float, margin: float = AUTO_RESOLVE_MARGIN, limit: int = 5) -> tuple:
+        """
+        解析公司名称并判断能否自动采用最高分候选
+
+        最高分候选需不低于min_score、不是共享别名匹配，并且是唯一候选或领先第二名至少margin，
+        否则视为有歧义，由调用方返回候选列表或报错。
+
+        Args:
+            query: 公司名称、简称、拼音首字母或股票代码
+            min_score: 自动采用的最低得分
+            margin: 最高分至少领先第二名的分数
+            limit: 最多返回的候选数量
+
+        Returns:
+            (采用的候选或None, 候选列表) 二元组
+        """
+        candidates = self.resolve(query, limit=max(limit, 2))
+        if not candidates:
+            return None, candidates
+        best = candidates[0]
+        if best["score"] < min_score or best["match"] == SHARED_ALIAS_MATCH:
+            return None, candidates[:limit]
+        if len(candidates) > 1 and best["score"] - candidates[1]["score"] < margin:
+            return None, candidates[:limit]
+        return best, candidates[:limit]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __normalize_query__(self, query: str) -> str:
+        """规范化查询并去掉法定名称后缀"""
+        query = normalize_name(query)
+        for suffix in LEGAL_SUFFIXES:
+            if query.endswith(suffix) and len(query) > len(suffix) + 1:
+                query = query[:-len(suffix)]
+                break
+        return query
+
+    def __build_aliases__(self, norm: str) -> list:
+        """生成名称的简称和拼音首字母别名"""
+        aliases = set()
+        base = STATUS_PREFIX_PATTERN.sub('', norm)
+        if base != norm:
+            aliases.add(base)
+
+        for prefix in REGION_PREFIXES:
+            if base.startswith(prefix) and len(base) - len(prefix) >= 2:
+                aliases.add(base[len(prefix):])
+                break
+        for suffix in NAME_SUFFIXES:
+            if base.endswith(suffix) and len(base) - len(suffix) >= 2:
+                aliases.add(base[:-len(suffix)])
+                break
+        aliases.discard(norm)
+
+        result = [(alias, "alias") for alias in aliases]
+        initials = self.__pinyin_initials__(base)
+        if initials and len(initials) >= 2:
+            result.append((initials, "pinyin"))
+        return result
+
+    def __pinyin_initials__(self, text: str) -> Optional[str]:
+        """获取拼音首字母缩写，如"贵州茅台"→"GZMT"""
+        if lazy_pinyin is None or not re.search(r'[\u4e00-\u9fff]', text):
+            return None
+        parts = lazy_pinyin(text, style=Style.FIRST_LETTER)
+        return ''.join(parts).upper()
+
+    def __grams__(self, text: str) -> set:
+        """生成字符二元组集合，单字名称退化为单字"""
+        if len(text) < 2:
+            return {text} if text else set()
+        return {text[i:i + 2] for i in range(len(text) - 1)}
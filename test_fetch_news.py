@@ -1,8 +1,25 @@
 from FetchSinaNewsDataMCP import NewsDataCollector
-from FetchPaperNewsDataMCP import PaperNewsDataCollector
+import FetchSinaNewsDataMCP
+from news_cache_utils import ArticleCache, RedirectCache, SelectorCache, canonical_url
+import article_extract_utils
+from news_dedupe_utils import NearDuplicateIndex, fingerprint, simhash
+from news_summary_utils import summarize, split_sentences, allocate_budget
+from news_archive_utils import NewsArchive
+from news_source_utils import NewsSource
+from http_utils import RetryPolicy
+from politeness_utils import PolitenessController, looks_like_captcha
+import aiohttp
+from bs4 import BeautifulSoup
 import json
 import logging
 import asyncio
+import os
+import pathlib
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from aiohttp import web
 
 # 确保日志配置生效
 logging.basicConfig(
@@ -11,57 +28,1083 @@ logging.basicConfig(
     force=True
 )
 
-async def test_fetch_news():
-    #collector = NewsDataCollector()
-    collector = PaperNewsDataCollector()
+def temp_collector(**kwargs) -> NewsDataCollector:
+    """创建采集器，未指定的文章缓存、跳转缓存、选择器缓存和新闻存档放在临时目录，不写入项目的cache/news"""
+    directory = pathlib.Path(tempfile.mkdtemp())
+    kwargs.setdefault("cache", ArticleCache(directory / "articles.sqlite3"))
+    kwargs.setdefault("redirects", RedirectCache(directory / "redirects.sqlite3"))
+    kwargs.setdefault("selectors", SelectorCache(directory / "selectors.sqlite3"))
+    kwargs.setdefault("archive", NewsArchive(directory / "archive.sqlite3"))
+    return NewsDataCollector(**kwargs)
+
+def test_fetch_news():
+    async def run():
+        collector = temp_collector()
     
-    # 测试用例1: 搜索公司新闻
-    print("测试1: 搜索工商银行相关新闻")
-    try:
-        result = await collector.fetch_news(company="工商银行", days=1, max_results=50)
-        print(f"结果类型: {type(result)}")
-        print(f"新闻数量: {len(result)}")
+        # 测试用例1: 搜索公司新闻
+        print("测试1: 搜索工商银行相关新闻")
+        try:
+            result = await collector.fetch_news(company="工商银行", days=1, max_results=50)
+            print(f"结果类型: {type(result)}")
+            print(f"新闻数量: {len(result)}")
         
-        if result:
-            print("第一条新闻:")
-            print(json.dumps(result[0], ensure_ascii=False, indent=2))
-            print("测试1通过\n")
-        else:
-            print("未获取到新闻数据")
+            if result:
+                print("第一条新闻:")
+                print(json.dumps(result["新闻1"], ensure_ascii=False, indent=2))
+                print("测试1通过\n")
+            else:
+                print("未获取到新闻数据")
+                print("测试1失败\n")
+        except Exception as e:
+            print(f"错误: {e}")
             print("测试1失败\n")
-    except Exception as e:
-        print(f"错误: {e}")
-        print("测试1失败\n")
     
-    # 测试用例2: 搜索行业新闻
-    print("测试2: 搜索财经政策相关新闻")
-    try:
-        result = await collector.fetch_news(industry="财经政策", days=1, max_results=5)
-        print(f"结果类型: {type(result)}")
-        print(f"新闻数量: {len(result)}")
+        # 测试用例2: 搜索行业新闻
+        print("测试2: 搜索财经政策相关新闻")
+        try:
+            result = await collector.fetch_news(industry="财经政策", days=1, max_results=5)
+            print(f"结果类型: {type(result)}")
+            print(f"新闻数量: {len(result)}")
         
-        if result:
-            print("第一条新闻:")
-            print(json.dumps(result[0], ensure_ascii=False, indent=2))
-            print("测试2通过\n")
-        else:
-            print("未获取到新闻数据")
+            if result:
+                print("第一条新闻:")
+                print(json.dumps(result["新闻1"], ensure_ascii=False, indent=2))
+                print("测试2通过\n")
+            else:
+                print("未获取到新闻数据")
+                print("测试2失败\n")
+        except Exception as e:
+            print(f"错误: {e}")
             print("测试2失败\n")
-    except Exception as e:
-        print(f"错误: {e}")
-        print("测试2失败\n")
     
-    # 测试用例3: 错误情况 - 无参数
-    print("测试3: 不提供公司或行业参数")
+        # 测试用例3: 错误情况 - 无参数
+        print("测试3: 不提供公司或行业参数")
+        try:
+            result = await collector.fetch_news(days=1, max_results=5)
+            print("测试3失败 - 应该抛出异常\n")
+        except ValueError as e:
+            print(f"正确捕获错误: {e}")
+            print("测试3通过\n")
+        except Exception as e:
+            print(f"意外错误: {e}")
+            print("测试3失败\n")
+        
+        await FetchSinaNewsDataMCP.http_client.close()
+    
+    asyncio.run(run())
+
+async def start_fake_sina(pages: int = 2, per_page: int = 6, article_delay: float = 0.1, link_host: str = None,
+                          articles: list = None, hours_step: float = 0, search_failures: int = 0,
+                          captcha_articles: int = 0):
+    """
+    启动本地模拟的新浪搜索和文章服务，返回(runner, 搜索URL, 统计)
+    
+    link_host为跳转链接使用的主机名；articles为(标题, 正文)列表，默认为"标题k"/"正文k"；
+    hours_step为相邻两条新闻的发布时间间隔（小时），第k条发布于当前时间之前k * hours_step小时；
+    search_failures为前几次搜索请求返回503的次数；captcha_articles为前几次文章请求返回验证码页面的次数；
+    同时把模块共享的缓存和新闻存档换成临时目录下的空实例（避免命中其他测试或上次运行的结果，
+    也不写入项目的cache/news），并换用不限速的请求节奏控制，测试不等待请求间隔；
+    runner.cleanup()时恢复原来的模块对象
+    """
+    directory = pathlib.Path(tempfile.mkdtemp())
+    replaced = {
+        "article_cache": ArticleCache(directory / "articles.sqlite3"),
+        "redirect_cache": RedirectCache(directory / "redirects.sqlite3"),
+        "selector_cache": SelectorCache(directory / "selectors.sqlite3"),
+        "news_archive": NewsArchive(directory / "archive.sqlite3"),
+        "politeness_controller": PolitenessController(initial_rate=1000, min_rate=1000, max_rate=1000)
+    }
+    originals = {name: getattr(FetchSinaNewsDataMCP, name) for name in replaced}
+    for name, value in replaced.items():
+        setattr(FetchSinaNewsDataMCP, name, value)
+    stats = {"active": 0, "max_active": 0, "articles": 0, "not_modified": 0, "links": 0, "searches": 0, "captchas": 0}
+
+    async def search(request):
+        stats["searches"] += 1
+        if stats["searches"] <= search_failures:
+            return web.Response(status=503)
+        page = int(request.query.get("page", 1))
+        if page > pages:
+            return web.Response(text="<html><body></body></html>", content_type="text/html")
+        boxes = ""
+        for j in range(per_page):
+            k = (page - 1) * per_page + j
+            link = f"http://{link_host}:{request.url.port}" if link_host else f"http://{request.host}"
+            href = f"{link}/link/{k}" if k % 3 == 0 else f"http://{request.host}/article/{k}"
+            date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - k * hours_step * 3600))
+            title = articles[k][0] if articles else f"标题{k}"
+            boxes += f"<div class='box-result'><h2><a href='{href}'>{title}</a></h2><span class='fgray_time'>新浪财经 {date}</span></div>"
+        return web.Response(text=f"<html><body>{boxes}</body></html>", content_type="text/html")
+
+    async def link(request):
+        stats["links"] += 1
+        return web.Response(status=302, headers={"Location": f"http://127.0.0.1:{request.url.port}/article/{request.match_info['k']}"})
+
+    async def article(request):
+        stats["articles"] += 1
+        if stats["captchas"] < captcha_articles:
+            stats["captchas"] += 1
+            return web.Response(text="<html><head><title>新浪安全验证</title></head><body></body></html>",
+                                content_type="text/html")
+        k = request.match_info['k']
+        if request.headers.get("If-None-Match") == f'"v{k}"':
+            stats["not_modified"] += 1
+            return web.Response(status=304)
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+        await asyncio.sleep(article_delay)
+        stats["active"] -= 1
+        body = articles[int(k)][1] if articles else f"正文{k}"
+        return web.Response(text=f"<html><body><article><p>{body}</p><script>x</script></article></body></html>",
+                            content_type="text/html", headers={"ETag": f'"v{k}"'})
+
+    async def restore(app):
+        for name, value in originals.items():
+            setattr(FetchSinaNewsDataMCP, name, value)
+
+    app = web.Application()
+    app.on_cleanup.append(restore)
+    app.router.add_get("/", search)
+    app.router.add_get("/link/{k}", link)
+    app.router.add_get("/article/{k}", article)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/", stats
+
+
+def test_concurrent_fetch_news():
+    async def run():
+        runner, search_url, stats = await start_fake_sina()
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            cache = ArticleCache(pathlib.Path(tempfile.mkdtemp()) / "articles.sqlite3")
+            collectors = [temp_collector(per_host_concurrency=3, cache=cache) for _ in range(2)]
+            
+            # 测试用例1: 文章正文并发获取且不超过每主机并发上限，跳转后的正文可正常获取
+            print("测试1: 并发获取文章正文")
+            start = time.time()
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            ticker_task = asyncio.create_task(ticker())
+            results = await asyncio.gather(
+                collectors[0].fetch_news(company="工商银行", max_results=12),
+                collectors[1].fetch_news(industry="银行", max_results=12)
+            )
+            elapsed = time.time() - start
+            ticker_task.cancel()
+            for result in results:
+                assert len(result) == 12
+                assert all(item["content"] == f"正文{item['title'][2:]}" for item in result.values())
+            # 两个采集器共用每主机的并发上限
+            assert stats["max_active"] <= 3
+            # 串行获取24篇文章至少需要2.4秒
+            assert elapsed < 2.4
+            # 获取期间事件循环保持响应
+            assert ticks > elapsed * 50
+            print("测试1通过\n")
+            
+            # 测试用例2: 共享连接池复用keep-alive连接，新建连接数不超过每主机上限
+            print("测试2: 连接复用")
+            stats = FetchSinaNewsDataMCP.http_client.get_stats()["hosts"]["127.0.0.1"]
+            assert stats["connections_opened"] <= FetchSinaNewsDataMCP.http_client.limit_per_host
+            assert stats["connections_reused"] > stats["connections_opened"]
+            print("测试2通过\n")
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+def test_article_cache():
+    cache_dir = pathlib.Path(tempfile.mkdtemp())
+    
+    # 测试用例1: 规范化URL作为缓存键，正文和HTML可还原
+    print("测试1: 缓存读写")
+    cache = ArticleCache(cache_dir / "articles.sqlite3")
+    cache.put("HTTPS://Finance.Sina.com.cn:443/a.shtml?b=2&a=1&utm_source=x#top", "<html>正文</html>", "正文",
+              etag='"v1"')
+    assert canonical_url("https://finance.sina.com.cn/a.shtml?a=1&b=2") == "https://finance.sina.com.cn/a.shtml?a=1&b=2"
+    # from、source只在新浪站点上视为跟踪参数
+    assert canonical_url("https://finance.sina.com.cn/a.shtml?from=wap&spm=1") == "https://finance.sina.com.cn/a.shtml"
+    assert canonical_url("https://example.com/list?source=rss&page=2") == "https://example.com/list?page=2&source=rss"
+    cached = cache.get("https://finance.sina.com.cn/a.shtml?a=1&b=2")
+    assert cached["text"] == "正文" and cached["etag"] == '"v1"' and cached["fresh"]
+    assert cache.get_html("https://finance.sina.com.cn/a.shtml?a=1&b=2") == "<html>正文</html>"
+    assert cache.get("https://finance.sina.com.cn/other.shtml") is None
+    print("测试1通过\n")
+    
+    # 测试用例2: 超过容量上限时淘汰最久未访问的条目
+    print("测试2: LRU淘汰")
+    small = ArticleCache(cache_dir / "small.sqlite3", max_mb=0.015)
+    for i in range(3):
+        small.put(f"https://news.sina.com.cn/{i}", os.urandom(6000).hex(), "正文")
+        time.sleep(0.01)
+        if i == 1:
+            small.get("https://news.sina.com.cn/0")
+    assert small.get("https://news.sina.com.cn/1") is None
+    assert small.get("https://news.sina.com.cn/0") is not None
+    assert small.get("https://news.sina.com.cn/2") is not None
+    stats = small.get_stats()
+    assert stats["evictions"] > 0 and stats["size_mb"] <= stats["max_mb"]
+    print("测试2通过\n")
+    
+    # 测试用例3: 重复获取直接命中缓存，过期后用ETag条件请求
+    print("测试3: 重复运行与条件请求")
+
+    async def run():
+        runner, search_url, server_stats = await start_fake_sina(pages=1, article_delay=0)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            cache = ArticleCache(cache_dir / "run.sqlite3")
+            collector = temp_collector(cache=cache)
+            first = await collector.fetch_news(company="工商银行", max_results=6)
+            downloads = server_stats["articles"]
+            second = await collector.fetch_news(company="工商银行", max_results=6, refresh=True)
+            assert server_stats["articles"] == downloads
+            # 同一页的新闻按完成顺序产出，按标题比较正文
+            assert {item["title"]: item["content"] for item in first.values()} == {item["title"]: item["content"] for item in second.values()}
+            
+            cache.fresh_seconds = 0
+            third = await collector.fetch_news(company="工商银行", max_results=6, refresh=True)
+            assert server_stats["not_modified"] == 6
+            assert {item["title"]: item["content"] for item in third.values()} == {item["title"]: item["content"] for item in first.values()}
+            assert cache.get_stats()["revalidated"] == 6
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
+    print("测试3通过\n")
+
+def test_redirect_cache():
+    cache_dir = pathlib.Path(tempfile.mkdtemp())
+    
+    async def run():
+        runner, search_url, server_stats = await start_fake_sina(pages=2, article_delay=0, link_host="localhost")
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        original_hosts = FetchSinaNewsDataMCP.SINA_REDIRECT_HOSTS
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        FetchSinaNewsDataMCP.SINA_REDIRECT_HOSTS = ("link.sina.com.cn", "localhost")
+        try:
+            redirects = RedirectCache(cache_dir / "redirects.sqlite3")
+            cache = ArticleCache(cache_dir / "articles.sqlite3")
+            collectors = [temp_collector(cache=cache, redirects=redirects) for _ in range(2)]
+            
+            # 测试用例1: 并发搜索同一关键词，每个跳转链接只请求一次，正文来自跳转目标
+            print("测试1: 跳转链接并发去重")
+            results = await asyncio.gather(*(collector.fetch_news(company="工商银行", max_results=12) for collector in collectors))
+            for result in results:
+                assert len(result) == 12
+                assert all(item["content"] == f"正文{item['title'][2:]}" for item in result.values())
+                assert all("/link/" not in item["url"] for item in result.values())
+            assert server_stats["links"] == 4
+            stats = redirects.get_stats()
+            # 另一个采集器要么合并到进行中的解析，要么直接命中缓存
+            assert stats["stored"] == 4 and stats["coalesced"] + stats["hits"] == 4 and stats["entries"] == 4
+            print("测试1通过\n")
+            
+            # 测试用例2: 解析结果持久化，重启后（新的缓存实例）不再请求跳转链接，过期结果不再使用
+            print("测试2: 跳转链接缓存持久化")
+            redirects.close()
+            reopened = RedirectCache(cache_dir / "redirects.sqlite3")
+            collector = temp_collector(cache=cache, redirects=reopened)
+            result = await collector.fetch_news(company="工商银行", max_results=12, refresh=True)
+            assert len(result) == 12
+            assert server_stats["links"] == 4
+            assert reopened.get_stats()["hits"] == 4
+            expired = RedirectCache(cache_dir / "redirects.sqlite3", ttl_hours=0)
+            assert expired.get(search_url.replace("127.0.0.1", "localhost") + "link/0") is None
+            print("测试2通过\n")
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            FetchSinaNewsDataMCP.SINA_REDIRECT_HOSTS = original_hosts
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+
+def legacy_extract_article_text(html: str, clean) -> str:
+    """原实现：html.parser解析，decompose后逐个find选择器，最后回退到body"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(['script', 'style', 'iframe', 'nav', 'footer', 'aside', 'header', 'button', 'a']):
+        element.decompose()
+    for selector in article_extract_utils.CONTENT_SELECTORS:
+        content = soup.find(selector['selector'], **selector['attrs'])
+        if content:
+            text = clean(content.get_text(separator='\n', strip=True))
+            if text:
+                return text
+    body = soup.find('body')
+    if body:
+        text = clean(body.get_text(separator='\n', strip=True))
+        if text:
+            return text
+    return ""
+
+def article_fixtures() -> list:
+    """构造正文提取的样例页面：常见的新浪页面结构和各类边界情况"""
+    paragraphs = "".join(
+        f"<p>　　第{i}段，工商银行&nbsp;公告称营收增长{i % 17}%<a href='/s/{i}'>相关</a>。<!-- ad -->"
+        f"<span class='x'>数据&lt;来源&gt;</span></p>\n" for i in range(200)
+    )
+    head = "<head><meta charset='utf-8'><title>标题</title><style>p{color:red}</style><script>var a='<p>x</p>';</script></head>"
+    nav = "<div class='top'><nav><ul>" + "".join(f"<li><a href='/{i}'>频道{i}</a></li>" for i in range(30)) + "</ul></nav></div>"
+    side = "<aside><div class='article'>侧栏</div></aside><footer>版权所有</footer>"
+    pages = [
+        f"<article><h1>标题</h1>{paragraphs}</article>",
+        f"<div class='main article clearfix'>{paragraphs}</div>",
+        f"<div id='article'>{paragraphs}</div>",
+        f"<div class='content-wrapper'>{paragraphs}</div>",
+        f"<div class='article-content' id='artibody'>{paragraphs}</div>",
+        f"<article><a href='x'>只有链接</a></article><div id='article'>{paragraphs}</div>",
+        f"<header><article>页头</article></header><article>{paragraphs}</article>",
+        f"<div class='article'><template><p>模板</p></template><ruby>漢<rt>han</rt></ruby>{paragraphs}</div>",
+        f"<div class='content-wrapper'><p>未闭合段落<p>第二段<div>嵌套<br>换行</div>{paragraphs}",
+        f"<div id='article'></div><div class='content-wrapper'>  　 </div>{paragraphs}",
+    ]
+    fixtures = [f"<!DOCTYPE html><html>{head}<body>{nav}{page}{side}<script>track()</script></body></html>" for page in pages]
+    return fixtures + [
+        "<html><head><title>t</title></head><div>没有body标签的正文</div></html>",
+        "<?xml version='1.0' encoding='utf-8'?><html><body><article>XHTML正文</article></body></html>",
+        "<html><BODY><ARTICLE>大写标签<P>段落</P></ARTICLE></BODY></html>",
+        "<html><body><div class='Article'>大小写不同</div><div class='a\tarticle'>制表符分隔</div></body></html>",
+        "<html><body><div>正文</div></body></html>后面的文字",
+        "<html><body><noscript>请启用脚本</noscript><div class='content-wrapper'>a<!--c-->b<?pi x?>c</div></body></html>",
+        "<html><body><p>链接<a href=x>未闭合的链接<p>后续段落</p></body></html>",
+        "<html><body><article>&lt;b&gt;实体&lt;/b&gt; &amp; &#x4e2d;&#25991;</article></body></html>",
+        "<html><body><div class='article'><div class='article'>内层</div>外层</div></body></html>",
+        "<html><body><script>x</script></body></html>",
+        "<p>片段 <b>加粗</b> 文字</p>",
+        ""
+    ]
+
+def test_article_extraction():
+    clean = temp_collector().__clean_text__
+    fixtures = article_fixtures()
+    
+    # 测试用例1: 两种解析器后端的单遍提取结果与原实现完全一致
+    print("测试1: 正文提取结果一致")
+    for html in fixtures:
+        expected = legacy_extract_article_text(html, clean)
+        for parser in article_extract_utils.PARSER_BACKENDS:
+            assert article_extract_utils.extract_article_text(html, clean, parser)[0] == expected, (parser, html[:80])
+    print("测试1通过\n")
+    
+    # 测试用例2: 每页提取耗时
+    print("测试2: 每页提取耗时")
+    pages = fixtures[:10]
+    timings = {}
+    for name, extract in [
+        ("legacy", lambda html: legacy_extract_article_text(html, clean)),
+        ("html.parser", lambda html: article_extract_utils.extract_article_text(html, clean, "html.parser")),
+        ("lxml", lambda html: article_extract_utils.extract_article_text(html, clean, "lxml"))
+    ]:
+        start = time.perf_counter()
+        for _ in range(5):
+            for html in pages:
+                extract(html)
+        timings[name] = (time.perf_counter() - start) / (5 * len(pages)) * 1000
+        print(f"{name}: {timings[name]:.2f} ms/页，加速 {timings['legacy'] / timings[name]:.1f}x")
+    assert timings["lxml"] < timings["legacy"]
+    print("测试2通过\n")
+
+def test_headlines_mode():
+    async def run():
+        runner, search_url, server_stats = await start_fake_sina(pages=2, article_delay=0.2)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            collector = temp_collector()
+            
+            # 测试用例1: 只返回标题、链接、日期和来源，不下载正文
+            print("测试1: 标题模式")
+            start = time.time()
+            result = await collector.fetch_news(company="工商银行", max_results=12, include_content=False)
+            assert len(result) == 12
+            assert server_stats["articles"] == 0
+            assert all("content" not in item and item["title"] and item["url"] and item["date"] for item in result.values())
+            assert time.time() - start < 1
+            print("测试1通过\n")
+            
+            # 测试用例2: 按需批量获取正文，失败的链接单独返回错误
+            print("测试2: 按需获取正文")
+            urls = [item["url"] for item in list(result.values())[:3]]
+            missing = search_url + "missing/0"
+            batch = await FetchSinaNewsDataMCP.fetch_articles(urls + [urls[0], missing])
+            assert batch["summary"] == {"requested": 4, "succeeded": 3, "failed": 1, "elapsed_seconds": batch["summary"]["elapsed_seconds"]}
+            for item in list(result.values())[:3]:
+                assert batch["results"][item["url"]]["content"] == f"正文{item['title'][2:]}"
+            assert "404" in batch["errors"][missing]["error"]
+            single = await FetchSinaNewsDataMCP.fetch_article(urls[0])
+            assert single == batch["results"][urls[0]]
+            assert server_stats["articles"] == 3
+            print("测试2通过\n")
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+
+def test_streaming_news():
+    async def run():
+        runner, search_url, server_stats = await start_fake_sina(pages=2, article_delay=0.2)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            # 测试用例1: 第一条新闻在第一篇正文完成后即产出，不等待全部获取完成
+            print("测试1: 逐条产出新闻")
+            collector = temp_collector(per_host_concurrency=2)
+            start = time.time()
+            arrivals = []
+            async for item in collector.iter_news(company="工商银行", max_results=12):
+                arrivals.append(time.time() - start)
+                assert item["content"] == f"正文{item['title'][2:]}"
+            assert len(arrivals) == 12
+            # 每主机2个并发、每篇0.2秒，12篇至少1.2秒；第一条只需一次搜索加一篇正文
+            assert arrivals[-1] >= 1.2
+            assert arrivals[0] < arrivals[-1] / 3
+            print(f"首条 {arrivals[0]:.2f}s，全部 {arrivals[-1]:.2f}s")
+            print("测试1通过\n")
+            
+            # 测试用例2: MCP工具推送进度和部分结果，最终结果与一次性返回一致
+            print("测试2: 进度通知与部分结果")
+            
+            class FakeContext():
+                def __init__(self):
+                    self.progress = []
+                    self.batches = []
+                
+                async def report_progress(self, progress, total=None, message=None):
+                    self.progress.append((progress, total))
+                
+                async def log(self, level, message, logger_name=None):
+                    self.batches.append(json.loads(message))
+            
+            ctx = FakeContext()
+            result = await FetchSinaNewsDataMCP.fetch_news(company="工商银行", max_results=12, include_content=False, ctx=ctx)
+            assert len(result) == 12
+            assert ctx.progress == [(i, 12) for i in range(1, 13)]
+            assert [batch["batch"] for batch in ctx.batches] == [1, 2, 3]
+            streamed = [item["url"] for batch in ctx.batches for item in batch["items"]]
+            assert sorted(streamed) == sorted(item["url"] for item in result.values())
+            
+            # 没有上下文时照常返回
+            assert len(await FetchSinaNewsDataMCP.fetch_news(company="工商银行", max_results=12, include_content=False)) == 12
+            print("测试2通过\n")
+            
+            # 测试用例3: stream_only时最终结果不再重复已推送的正文
+            print("测试3: 只推送正文")
+            ctx = FakeContext()
+            result = await FetchSinaNewsDataMCP.fetch_news(company="工商银行", max_results=12, stream_only=True, ctx=ctx)
+            assert len(result) == 12
+            assert all(item["streamed"] and "content" not in item and item["title"] for item in result.values())
+            contents = {item["url"]: item["content"] for batch in ctx.batches for item in batch["items"]}
+            assert sorted(contents) == sorted(item["url"] for item in result.values())
+            assert all(contents[item["url"]] == f"正文{item['title'][2:]}" for item in result.values())
+            # 没有上下文时无法推送，照常返回正文
+            result = await FetchSinaNewsDataMCP.fetch_news(company="工商银行", max_results=12, stream_only=True)
+            assert all("content" in item and "streamed" not in item for item in result.values())
+            print("测试3通过\n")
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+
+def test_near_duplicates():
+    # 测试用例1: 转载稿（标题略有改动、正文相同）指纹相近，不同新闻指纹相距较远
+    print("测试1: SimHash近似重复索引")
+    paragraph = ("工商银行10月30日晚间发布三季报，前三季度实现营业收入6000亿元，同比增长1.2%；归母净利润2700亿元，同比增长5.2%。"
+                 "截至9月末，不良贷款率1.33%，较上年末下降0.03个百分点，拨备覆盖率保持在215%以上，资本充足率稳中有升。")
+    reprints = [
+        "工商银行前三季度净利润增长5.2%，不良贷款率持续下降",
+        "【快讯】工商银行前三季度净利润增长5.2%，不良贷款率持续下降",
+        "工商银行：前三季度净利润增长5.2% 不良贷款率持续下降",
+        "工商银行前三季度净利润增长5.2%，不良率持续下降（附图）"
+    ]
+    others = [
+        ("建设银行前三季度净利润增长3.1%，不良贷款率持平", "建设银行披露三季度报告，前三季度归母净利润同比增长3.1%，净息差收窄至1.5%，不良贷款率与年初持平。"),
+        ("工商银行发布公告：董事会换届选举完成", "工商银行董事会审议通过换届议案，选举产生新一届董事会成员。"),
+        ("央行开展逆回购操作，净投放资金1000亿元", "中国人民银行今日以利率招标方式开展了7天期逆回购操作。")
+    ]
+    index = NearDuplicateIndex()
+    first = index.add(simhash(reprints[0] + paragraph))
+    for title in reprints[1:]:
+        assert index.find(simhash(title + paragraph)) == first
+    for title, body in others:
+        assert index.find(simhash(title + body)) is None
+        index.add(simhash(title + body))
+    assert len(index) == 4
+    # 过短的文本不做近似判断
+    assert fingerprint("标题1") is None and fingerprint(reprints[0]) is not None
+    print("测试1通过\n")
+    
+    # 测试用例2: fetch_news只保留每组转载中的一条，并记录重复数
+    print("测试2: 合并转载新闻")
+    
+    async def run():
+        articles = [(title, paragraph) for title in reprints] + others
+        articles += [
+            ("沪指震荡收涨0.5%，券商板块午后走强", "今日A股三大指数震荡走高，沪指收涨0.5%，两市成交额超过一万亿元，券商、保险板块午后拉升。"),
+            ("多地出台楼市新政，首付比例进一步下调", "近期多个城市宣布调整住房信贷政策，首套房首付比例下调至15%，并取消部分限购措施。"),
+            ("国际油价连续三日下跌，布伦特原油跌破70美元", "受需求前景担忧影响，国际油价连续第三个交易日下跌，布伦特原油期货收于每桶69美元。"),
+            ("新能源汽车10月销量同比增长三成", "乘联会数据显示，10月新能源乘用车零售销量同比增长约三成，渗透率再创新高。"),
+            ("人民币对美元汇率中间价上调120个基点", "中国外汇交易中心公布，人民币对美元汇率中间价报7.1020，较前一交易日上调120个基点。")
+        ]
+        runner, search_url, server_stats = await start_fake_sina(pages=2, article_delay=0, articles=articles)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            collector = temp_collector()
+            result = await collector.fetch_news(company="工商银行", max_results=12)
+            assert len(result) == 9
+            merged = [item for item in result.values() if item["title"] in reprints]
+            assert len(merged) == 1 and merged[0]["duplicates"] == 3
+            assert sum(item["duplicates"] for item in result.values()) == 3
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+    print("测试2通过\n")
+
+
+def test_date_filter_before_fetch():
+    # 测试用例1: 日期范围外的新闻不获取正文，出现早于开始日期的新闻后停止翻页
+    print("测试1: 获取正文前按日期过滤")
+    
+    async def run():
+        runner, search_url, stats = await start_fake_sina(pages=5, article_delay=0, hours_step=10)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            collector = temp_collector()
+            result = await collector.fetch_news(company="工商银行", days=3)
+            start_date = (datetime.now() - timedelta(days=3)).strftime("%Y-%m-%d")
+            assert len(result) > 0
+            assert all(item["date"][:10] >= start_date for item in result.values())
+            # 只请求了范围内新闻的正文（跳转链接也只解析范围内的）
+            assert stats["articles"] == len(result)
+            assert stats["links"] <= len([item for item in result.values() if int(item["title"][2:]) % 3 == 0])
+            # 共5页，第2页已出现早于开始日期的新闻，之后不再翻页
+            assert stats["searches"] == 2
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+    print("测试1通过\n")
+
+def test_selector_cache():
+    clean = temp_collector().__clean_text__
+    
+    # 测试用例1: 优先尝试学习到的选择器，命中时结果与完整提取一致，未命中时回退到完整提取
+    print("测试1: 优先尝试学习到的选择器")
+    for html in article_fixtures():
+        for parser in article_extract_utils.PARSER_BACKENDS:
+            expected = article_extract_utils.extract_article_text(html, clean, parser)
+            if expected[1] is None:
+                continue
+            assert article_extract_utils.extract_article_text(html, clean, parser, preferred=expected[1]) == expected
+            other = (expected[1] + 1) % (article_extract_utils.BODY_INDEX + 1)
+            assert article_extract_utils.extract_article_text(html, clean, parser, preferred=other)[0] == expected[0]
+    print("测试1通过\n")
+    
+    # 测试用例2: 按站点记录命中的选择器和命中率，重启后保留
+    print("测试2: 按站点记录选择器命中率")
+    path = pathlib.Path(tempfile.mkdtemp()) / "selectors.sqlite3"
+    selectors = SelectorCache(path)
+    collector = temp_collector(selectors=selectors)
+    for k in range(4):
+        text = collector.__extract_article_text__(f"<html><body><div class='article'><p>正文{k}</p></div></body></html>",
+                                                  f"https://finance.sina.com.cn/a/{k}.shtml")
+        assert text == f"正文{k}"
+        collector.__extract_article_text__(f"<html><body><p>只有body的正文{k}</p></body></html>", f"https://example.com/{k}")
+    stats = selectors.get_stats()
+    sina = stats["domains"]["finance.sina.com.cn"]
+    assert sina["selector"] == "div[class=article]" and sina["extractions"] == 4 and sina["hits"] == 3
+    assert sina["hit_rate"] == 0.75 and sina["body_rate"] == 0
+    assert stats["domains"]["example.com"]["body_rate"] == 1
+    selectors.close()
+    reopened = SelectorCache(path)
+    assert reopened.get("finance.sina.com.cn") == "div[class=article]"
+    assert reopened.get_stats()["extractions"] == 8
+    assert reopened.get("example.com") is None
+    reopened.close()
+    print("测试2通过\n")
+    
+    # 测试用例3: 同一站点部分页面没有正文元素时回退到body，但不把body学习为该站点的选择器
+    print("测试3: 混合版式站点")
+    path = pathlib.Path(tempfile.mkdtemp()) / "selectors.sqlite3"
+    selectors = SelectorCache(path)
+    collector = temp_collector(selectors=selectors)
+    text = collector.__extract_article_text__("<html><body><p>导航 菜单</p><p>只有body的正文</p></body></html>",
+                                              "https://mixed.example.com/1")
+    assert "只有body的正文" in text
+    assert selectors.get("mixed.example.com") is None
+    page = "<html><body><p>导航 菜单 广告</p><article><p>真正的正文</p></article></body></html>"
+    assert collector.__extract_article_text__(page, "https://mixed.example.com/2") == "真正的正文"
+    assert selectors.get("mixed.example.com") == "article"
+    # 学习到的选择器未命中时按优先级完整提取，之后仍能命中有正文元素的页面
+    page3 = "<html><body><p>导航</p><div class='article'><p>另一种版式的正文</p></div></body></html>"
+    assert collector.__extract_article_text__(page3, "https://mixed.example.com/3") == "另一种版式的正文"
+    assert collector.__extract_article_text__(page, "https://mixed.example.com/4") == "真正的正文"
+    mixed = selectors.get_stats()["domains"]["mixed.example.com"]
+    assert mixed["extractions"] == 4 and mixed["body_fallbacks"] == 1
+    selectors.close()
+    print("测试3通过\n")
+
+def test_summarization():
+    # 测试用例1: 抽取式摘要不超过字符上限，保留原文句子和顺序，优先选中心句
+    print("测试1: 抽取式摘要")
+    text = ("工商银行前三季度营收同比增长3%，净利润稳步增长。今日本市天气晴朗，最高气温二十五度。"
+            "工商银行表示，营收增长主要来自利息净收入增长。工商银行净利润增长得益于资产质量改善。"
+            "分析师认为工商银行营收和净利润增长将持续。")
+    summary = summarize(text, 60)
+    assert 0 < len(summary) <= 60
+    sentences = split_sentences(text)
+    chosen = split_sentences(summary)
+    assert all(sentence in sentences for sentence in chosen)
+    assert [sentences.index(sentence) for sentence in chosen] == sorted(sentences.index(sentence) for sentence in chosen)
+    assert "天气" not in summary
+    assert summarize(text, len(text)) == text and summarize(text, 0) == text
+    # 单句超过上限时截断
+    assert len(summarize("工商银行" * 50, 20)) == 20
+    # 总额度：短文章全部保留，余量均分给长文章
+    assert allocate_budget([100, 500, 900], 900) == [100, 400, 400]
+    assert allocate_budget([100, 200], 1000) == [100, 200]
+    print("测试1通过\n")
+    
+    # 测试用例2: fetch_news工具按每篇和总额度压缩正文，全文仍可通过fetch_article获取
+    print("测试2: 按额度压缩fetch_news结果")
+    
+    async def run():
+        chars = "银行证券基金保险营收利润增长下降市场资金政策公司股份投资业务风险管理客户产品数据发展经济"
+        articles = []
+        for k in range(12):
+            rng = random.Random(k)
+            body = "".join("".join(rng.choice(chars) for _ in range(rng.randint(15, 30))) + "。" for _ in range(30))
+            articles.append((f"标题{k}", body))
+        runner, search_url, server_stats = await start_fake_sina(pages=2, article_delay=0, articles=articles)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            bodies = dict(articles)
+            result = await FetchSinaNewsDataMCP.fetch_news(company="工商银行", max_results=12, max_content_chars=200,
+                                                           max_total_chars=1200)
+            assert len(result) == 12
+            for item in result.values():
+                full = bodies[item["title"]]
+                assert item["summarized"] and item["content_length"] == len(full)
+                assert 0 < len(item["content"]) <= 100
+                assert all(sentence in full for sentence in split_sentences(item["content"]))
+                article = await FetchSinaNewsDataMCP.fetch_article(item["url"])
+                assert article["content"] == full
+            # 默认不限制，返回全文
+            result = await FetchSinaNewsDataMCP.fetch_news(company="工商银行", max_results=12)
+            assert all(item["content"] == bodies[item["title"]] and "summarized" not in item for item in result.values())
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+    print("测试2通过\n")
+
+def test_news_archive():
+    # 测试用例1: 存档读写、全文检索和覆盖范围
+    print("测试1: 存档读写与检索")
+    archive = NewsArchive(pathlib.Path(tempfile.mkdtemp()) / "archive.sqlite3")
+    today = datetime.now().strftime("%Y-%m-%d")
+    days = [(datetime.now() - timedelta(days=d)).strftime("%Y-%m-%d") for d in range(4)]
+    archive.add([
+        {"source": "新浪财经", "title": "工商银行三季度净利润增长", "url": "https://finance.sina.com.cn/a/1.shtml",
+         "date": f"{days[1]} 10:00:00", "content": "工商银行公布三季报，净利润同比增长。"},
+        {"source": "新浪财经", "title": "银行板块午后走强", "url": "https://finance.sina.com.cn/a/2.shtml?utm_source=x",
+         "date": f"{days[2]} 15:00:00", "content": None}
+    ], "工商银行")
+    # 相同链接再次写入时不会用空正文覆盖已有正文
+    archive.add([{"source": "新浪财经", "title": "工商银行三季度净利润增长", "url": "https://finance.sina.com.cn/a/1.shtml",
+                  "date": f"{days[1]} 10:00:00"}], "银行")
+    items = archive.query("工商银行", days[3], today)
+    assert [item["url"] for item in items] == ["https://finance.sina.com.cn/a/1.shtml", "https://finance.sina.com.cn/a/2.shtml?utm_source=x"]
+    assert items[0]["content"] == "工商银行公布三季报，净利润同比增长。" and items[1]["content"] is None
+    assert [item["title"] for item in archive.query("银行", days[3], today, with_content=False)] == ["工商银行三季度净利润增长"]
+    assert archive.get_stats()["full_text_index"] == "trigram"
+    assert [item["title"] for item in archive.search("三季报")] == ["工商银行三季度净利润增长"]
+    assert len(archive.search("银行")) == 2 and len(archive.search("银行 走强")) == 1
+    assert len(archive.search("银行", start_date=days[1], end_date=today)) == 1
+    assert archive.search("三季报 走强") == []
+    # 没有日期的新闻按写入存档的日期匹配，覆盖范围标记后仍能从存档返回
+    archive.add([{"source": "新浪财经", "title": "工商银行发布公告", "url": "https://finance.sina.com.cn/a/3.shtml", "date": ""}],
+                "工商银行")
+    assert [item["title"] for item in archive.query("工商银行", days[3], today)][-1] == "工商银行发布公告"
+    assert archive.query("工商银行", days[3], days[1]) == items
+    
+    assert archive.missing_ranges("sina", "工商银行", days[3], today) == [(days[3], today)]
+    archive.mark_covered("sina", "工商银行", days[2], today, with_content=False)
+    assert archive.missing_ranges("sina", "工商银行", days[3], today, with_content=False) == [(days[3], days[3])]
+    assert archive.missing_ranges("sina", "工商银行", days[3], today) == [(days[3], today)]
+    archive.mark_covered("sina", "工商银行", days[1], days[1])
+    assert archive.missing_ranges("sina", "工商银行", days[3], today) == [(today, today), (days[3], days[2])]
+    # 抓取时尚未结束的当天过了有效期后需要重新抓取，已经结束的日期一直有效
+    archive.recent_ttl_seconds = 0
+    assert archive.missing_ranges("sina", "工商银行", days[2], today, with_content=False) == [(today, today)]
+    archive.close()
+    print("测试1通过\n")
+    
+    # 测试用例2: 重复查询直接从存档返回，只抓取未覆盖的日期
+    print("测试2: 重复查询命中存档")
+    
+    async def run():
+        runner, search_url, stats = await start_fake_sina(pages=5, article_delay=0, hours_step=10)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        try:
+            archive = FetchSinaNewsDataMCP.news_archive
+            collector = temp_collector(archive=archive)
+            first = await collector.fetch_news(company="工商银行", days=3)
+            searches, downloads = stats["searches"], stats["articles"]
+            assert len(first) > 0 and searches == 2
+            
+            second = await collector.fetch_news(company="工商银行", days=3)
+            assert stats["searches"] == searches and stats["articles"] == downloads
+            assert {item["title"]: item["content"] for item in second.values()} == {item["title"]: item["content"] for item in first.values()}
+            
+            # 当天的存档过期后只重新搜索当天，正文命中文章缓存
+            archive.recent_ttl_seconds = 0
+            third = await collector.fetch_news(company="工商银行", days=3)
+            assert stats["searches"] == searches + 1 and stats["articles"] == downloads
+            assert {item["title"] for item in third.values()} == {item["title"] for item in first.values()}
+            
+            # 存档检索工具
+            result = await FetchSinaNewsDataMCP.search_news_archive(keyword="标题1")
+            assert result["results"] and all("标题1" in item["title"] for item in result["results"])
+            result = await FetchSinaNewsDataMCP.search_news_archive(keyword="标题", include_content=True)
+            assert result["summary"]["matched"] == len(first)
+            assert all(item["content"] == f"正文{item['title'][2:]}" for item in result["results"])
+            print(f"存档检索耗时 {result['summary']['elapsed_ms']}ms")
+            assert "error" in await FetchSinaNewsDataMCP.search_news_archive(keyword="标题", start_date="2025/01/01")
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run())
+    print("测试2通过\n")
+
+class FakeNewsSource(NewsSource):
+    """测试用新闻源：每个关键词等待delay秒后产出count条新闻，之后挂起hang秒；fail为True时直接抛出异常"""
+    
+    def __init__(self, name: str, count: int, delay: float = 0, hang: float = 0, fail: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.name = name
+        self.count = count
+        self.delay = delay
+        self.hang = hang
+        self.fail = fail
+        self.calls = []
+    
+    async def iter_news(self, keyword, industry, start_date, end_date, include_content=True, progress=None):
+        self.calls.append(keyword)
+        if self.fail:
+            raise RuntimeError("新闻源不可用")
+        await asyncio.sleep(self.delay)
+        for k in range(self.count):
+            # 各条正文互不相似，避免被合并为近似重复
+            rng = random.Random(f"{self.name}-{keyword}-{k}")
+            content = "".join(rng.choice("银行证券基金保险营收利润增长下降市场资金政策公司股份投资") for _ in range(60))
+            yield {"source": self.name, "title": f"{self.name}-{keyword}-{k}", "url": f"https://{self.name}.example.com/{keyword}/{k}",
+                   "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "search_term": keyword, "content": content}
+        await asyncio.sleep(self.hang)
+        if progress is not None:
+            progress["complete"] = True
+
+
+def test_news_sources():
+    # 测试用例1: 新闻源和关键词并发抓取，超时的新闻源只使用已返回的新闻，数量上限和异常互不影响
+    print("测试1: 多新闻源并发抓取")
+    
+    async def run():
+        fast = FakeNewsSource("fast", 3, delay=0.3)
+        slow = FakeNewsSource("slow", 2, delay=0.3, hang=30, timeout=0.8)
+        noisy = FakeNewsSource("noisy", 100, delay=0.3, max_results=5)
+        broken = FakeNewsSource("broken", 3, fail=True)
+        collector = temp_collector(sources=[fast, slow, noisy, broken])
+        start = time.time()
+        result = await collector.fetch_news(company="工商银行", industry="银行", max_results=100)
+        elapsed = time.time() - start
+        counts = {}
+        for item in result.values():
+            counts[item["source"]] = counts.get(item["source"], 0) + 1
+        assert counts == {"fast": 6, "slow": 4, "noisy": 10}
+        assert sorted(broken.calls) == ["工商银行", "银行"]
+        # 4个新闻源 x 2个关键词并发，总耗时取决于最慢新闻源的时间上限，而不是各自耗时之和
+        assert elapsed < 1.5
+        print(f"耗时 {elapsed:.2f}s")
+        
+        # 超时未完成的日期不记为已覆盖，完整返回的新闻源再次查询时直接使用存档
+        result = await collector.fetch_news(company="工商银行", industry="银行", max_results=100)
+        assert len(result) == 20
+        assert sorted(fast.calls) == ["工商银行", "银行"]
+        assert len(slow.calls) == 4
+        
+        # 默认新闻源为新浪新闻；没有关键词时报错
+        assert [source.name for source in temp_collector().sources] == ["sina"]
+        try:
+            await collector.fetch_news()
+            assert False, "应该抛出ValueError"
+        except ValueError:
+            pass
+    
+    asyncio.run(run())
+    print("测试1通过\n")
+    
+    # 测试用例2: 未实现iter_news的新闻源在实例化时报错
+    print("测试2: 新闻源接口检查")
+    
+    class IncompleteSource(NewsSource):
+        name = "incomplete"
+    
     try:
-        result = await collector.fetch_news(days=1, max_results=5)
-        print("测试3失败 - 应该抛出异常\n")
-    except ValueError as e:
-        print(f"正确捕获错误: {e}")
-        print("测试3通过\n")
-    except Exception as e:
-        print(f"意外错误: {e}")
-        print("测试3失败\n")
+        IncompleteSource()
+        assert False, "应该抛出TypeError"
+    except TypeError:
+        pass
+    print("测试2通过\n")
+
+def test_retry_policy():
+    # 测试用例1: 暂时性错误按退避重试，不可重试的错误立即抛出，重试受预算限制
+    print("测试1: 重试与重试预算")
+    
+    async def run_retries():
+        calls = []
+        
+        async def flaky():
+            calls.append(1)
+            if len(calls) < 3:
+                raise aiohttp.ClientConnectionError("连接被重置")
+            return "ok"
+        
+        policy = RetryPolicy("测试", base_delay=0.01)
+        assert await policy.run(flaky) == "ok" and len(calls) == 3
+        assert policy.get_stats()["retries"] == 2
+        
+        async def invalid():
+            calls.append(1)
+            raise ValueError("参数错误")
+        
+        calls.clear()
+        try:
+            await policy.run(invalid)
+            assert False, "应该抛出ValueError"
+        except ValueError:
+            assert len(calls) == 1
+        
+        async def down():
+            calls.append(1)
+            raise asyncio.TimeoutError()
+        
+        calls.clear()
+        limited = RetryPolicy("测试", base_delay=0.01, budget_ratio=0, budget_max=1)
+        for _ in range(2):
+            try:
+                await limited.run(down)
+                assert False, "应该抛出TimeoutError"
+            except asyncio.TimeoutError:
+                pass
+        # 第一次调用用掉唯一的重试额度，第二次调用不再重试
+        assert len(calls) == 3 and limited.get_stats()["budget_exhausted"] == 2
+    
+    asyncio.run(run_retries())
+    print("测试1通过\n")
+    
+    # 测试用例2: 请求超过延迟分位数仍未返回时发出对冲请求，取先返回的结果
+    print("测试2: 对冲请求")
+    
+    async def run_hedge():
+        policy = RetryPolicy("测试", hedge=True, hedge_min_samples=5)
+        
+        async def fast():
+            await asyncio.sleep(0.01)
+            return "fast"
+        
+        for _ in range(5):
+            await policy.run(fast)
+        delays = iter([2, 0.01])
+        
+        async def tail():
+            await asyncio.sleep(next(delays))
+            return "done"
+        
+        start = time.time()
+        assert await policy.run(tail) == "done"
+        assert time.time() - start < 0.5
+        stats = policy.get_stats()
+        assert stats["hedges"] == 1 and stats["hedge_wins"] == 1
+    
+    asyncio.run(run_hedge())
+    print("测试2通过\n")
+    
+    # 测试用例3: 请求前的节奏等待不计入延迟样本，对冲请求的延迟从其发出时计时
+    print("测试3: 延迟样本只计请求本身")
+    
+    async def run_samples():
+        policy = RetryPolicy("测试", hedge=True, hedge_min_samples=5)
+        waits = []
+        
+        async def pace():
+            waits.append(1)
+            await asyncio.sleep(0.2)
+        
+        async def fast():
+            await asyncio.sleep(0.01)
+            return "fast"
+        
+        for _ in range(5):
+            await policy.run(fast, pace)
+        assert len(waits) == 5 and policy.get_stats()["hedge_delay_seconds"] < 0.1
+        
+        policy = RetryPolicy("测试", hedge=True, hedge_min_samples=5)
+        
+        async def moderate():
+            await asyncio.sleep(0.3)
+            return "moderate"
+        
+        for _ in range(5):
+            await policy.run(moderate)
+        delays = iter([2, 0.05])
+        
+        async def tail():
+            await asyncio.sleep(next(delays))
+            return "done"
+        
+        assert await policy.run(tail, pace) == "done"
+        # 对冲请求0.05秒返回，样本不包含首个请求已经等待的时间；对冲请求不再等待节奏
+        assert policy.latencies[-1] < 0.2 and len(waits) == 6
+    
+    asyncio.run(run_samples())
+    print("测试3通过\n")
+    
+    # 测试用例4: 搜索页请求失败后重试成功，重试得到的页面正常解析，不丢页
+    print("测试4: 搜索页重试")
+    
+    async def run_search():
+        runner, search_url, stats = await start_fake_sina(pages=2, article_delay=0, search_failures=2)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        original_retry = FetchSinaNewsDataMCP.search_retry
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        FetchSinaNewsDataMCP.search_retry = RetryPolicy("搜索", base_delay=0.01)
+        try:
+            collector = temp_collector()
+            result = await collector.fetch_news(company="工商银行", max_results=12)
+            assert len(result) == 12
+            assert FetchSinaNewsDataMCP.search_retry.get_stats()["retries"] == 2
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            FetchSinaNewsDataMCP.search_retry = original_retry
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run_search())
+    print("测试4通过\n")
+
+def test_politeness():
+    # 测试用例1: 正常响应加性增速，限流、验证码、慢响应乘性减速，速率不超出上下限
+    print("测试1: AIMD调整请求速率")
+    controller = PolitenessController(initial_rate=1, min_rate=0.5, max_rate=1.3, rate_step=0.1, slow_seconds=1)
+    for _ in range(5):
+        controller.record("a.com", 0.1, 200)
+    host = controller.get_stats()["hosts"]["a.com"]
+    assert host["rate"] == 1.3 and host["speedups"] == 3
+    controller.record("a.com", 0.1, 429)
+    assert controller.get_stats()["hosts"]["a.com"]["rate"] == 0.65
+    controller.record("a.com", 0.1, 200, blocked=True)
+    controller.record("a.com", 2, 200)
+    controller.record_error("a.com")
+    host = controller.get_stats()["hosts"]["a.com"]
+    assert host["rate"] == 0.5 and host["interval_seconds"] == 2
+    assert (host["throttled"], host["blocked"], host["slow"], host["errors"], host["backoffs"]) == (1, 1, 1, 1, 4)
+    # 其他主机不受影响
+    controller.record("b.com", 0.1, 404)
+    assert controller.get_stats()["hosts"]["b.com"]["rate"] == 1.1
+    assert looks_like_captcha("<html><head><title>新浪安全验证</title></head></html>")
+    assert not looks_like_captcha("<html><head><title>工商银行发布年报</title></head></html>")
+    print("测试1通过\n")
+    
+    # 测试用例2: 同一主机的请求按速率间隔放行，退避后遵守Retry-After
+    print("测试2: 请求间隔与Retry-After")
+    
+    async def run_spacing():
+        controller = PolitenessController(initial_rate=20, min_rate=10, max_rate=20)
+        start = time.monotonic()
+        for _ in range(4):
+            await controller.acquire("a.com")
+        await controller.acquire("b.com")
+        # a.com的4个请求间隔0.05秒，b.com不必等待a.com
+        assert 0.14 <= time.monotonic() - start < 0.3
+        controller.record("a.com", 0.1, 503, retry_after="1")
+        assert await controller.acquire("a.com") >= 0.9
+    
+    asyncio.run(run_spacing())
+    print("测试2通过\n")
+    
+    # 测试用例3: 文章返回验证码页面时降速并重试，最终正文完整
+    print("测试3: 验证码页面退避重试")
+    
+    async def run_captcha():
+        runner, search_url, stats = await start_fake_sina(pages=2, article_delay=0, captcha_articles=2)
+        original_url = FetchSinaNewsDataMCP.SINA_SEARCH_URL
+        original_retry = FetchSinaNewsDataMCP.article_retry
+        FetchSinaNewsDataMCP.SINA_SEARCH_URL = search_url
+        FetchSinaNewsDataMCP.article_retry = RetryPolicy("文章", base_delay=0.01)
+        try:
+            collector = temp_collector()
+            result = await collector.fetch_news(company="工商银行", max_results=12)
+            assert len(result) == 12
+            assert all(item["content"] == f"正文{item['title'][2:]}" for item in result.values())
+            host = FetchSinaNewsDataMCP.politeness_controller.get_stats()["hosts"]["127.0.0.1"]
+            assert stats["captchas"] == 2 and host["blocked"] == 2 and host["backoffs"] == 2
+            assert FetchSinaNewsDataMCP.article_retry.get_stats()["retries"] == 2
+        finally:
+            FetchSinaNewsDataMCP.SINA_SEARCH_URL = original_url
+            FetchSinaNewsDataMCP.article_retry = original_retry
+            await FetchSinaNewsDataMCP.http_client.close()
+            await runner.cleanup()
+    
+    asyncio.run(run_captcha())
+    print("测试3通过\n")
 
 if __name__ == "__main__":
-    asyncio.run(test_fetch_news())
\ No newline at end of file
+    test_fetch_news()
+    test_concurrent_fetch_news()
+    test_article_cache()
+    test_redirect_cache()
+    test_article_extraction()
+    test_headlines_mode()
+    test_streaming_news()
+    test_near_duplicates()
+    test_date_filter_before_fetch()
+    test_selector_cache()
+    test_summarization()
+    test_news_archive()
+    test_news_sources()
+    test_retry_policy()
+    test_politeness()
\ No newline at end of file
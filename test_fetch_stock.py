@@ -1,6 +1,17 @@
 from FetchStockerDataMCP import StockerDataCollector
+from stock_cache_utils import SecurityMasterCache, BarStore, SingleFlight
+from symbol_resolver_utils import SymbolResolver
+from upstream_utils import UpstreamGuard, UpstreamUnavailableError, UpstreamTimeoutError
+from trading_calendar_utils import TradingCalendar, latest_bar_date
+from indicator_utils import calculate_rsi, IncrementalRSI, build_panel, compute_indicators, latest_indicator_values, INDICATOR_REGISTRY
+from stock_format_utils import encode_compact_time_series, decode_compact_time_series
 import json
 import logging
+import tempfile
+import threading
+import time
+from datetime import datetime
+import pandas as pd
 
 # 确保日志配置生效
 logging.basicConfig(
@@ -36,5 +47,353 @@ def test_fetch_stock_data():
     else:
         print("测试2失败\n")
 
+def test_security_master_cache():
+    cache_dir = tempfile.mkdtemp()
+    load_count = [0]
+
+    def loader():
+        load_count[0] += 1
+        return pd.DataFrame({"code": ["600519", "000001"], "name": ["贵州茅台", "平安银行"]})
+
+    # 测试用例1: 首次加载走上游，之后命中内存
+    print("测试1: 主数据缓存命中")
+    cache = SecurityMasterCache(cache_dir=cache_dir)
+    cache.register_table("a_code_name", loader)
+    cache.get_table("a_code_name")
+    cache.get_table("a_code_name")
+    stats = cache.get_stats()
+    assert load_count[0] == 1
+    assert stats["misses"] == 1 and stats["hits"] == 1
+    print("测试1通过\n")
+
+    # 测试用例2: 新实例从磁盘快照恢复，代码保持字符串
+    print("测试2: 从磁盘快照恢复")
+    restarted = SecurityMasterCache(cache_dir=cache_dir)
+    restarted.register_table("a_code_name", loader)
+    table = restarted.get_table("a_code_name")
+    assert load_count[0] == 1
+    assert table.iloc[1]["code"] == "000001"
+    assert restarted.get_stats()["disk_loads"] == 1
+    print("测试2通过\n")
+
+    # 测试用例3: 过期后上游失败时使用过期数据
+    print("测试3: 过期后回退到旧数据")
+    def failing_loader():
+        raise ConnectionError("upstream down")
+    stale = SecurityMasterCache(cache_dir=cache_dir, ttl_hours=0)
+    stale.register_table("a_code_name", failing_loader)
+    assert len(stale.get_table("a_code_name")) == 2
+    assert stale.get_stats()["stale_served"] == 1
+    print("测试3通过\n")
+
+def test_symbol_resolver():
+    resolver = SymbolResolver([
+        ("600519", "贵州茅台"),
+        ("601318", "中国平安"),
+        ("000001", "平安银行"),
+        ("601398", "工商银行"),
+        ("600518", "ST康美")
+    ])
+
+    # 测试用例1: 精确名称、代码、简称、拼音首字母
+    print("测试1: 名称解析")
+    assert resolver.resolve("贵州茅台")[0]["match"] == "exact"
+    assert resolver.resolve("600519")[0]["name"] == "贵州茅台"
+    assert resolver.resolve("茅台")[0]["symbol"] == "600519.SS"
+    assert resolver.resolve("工行")[0]["code"] == "601398"
+    assert resolver.resolve("康美")[0]["code"] == "600518"
+    print("测试1通过\n")
+
+    # 测试用例2: 名称重叠时按得分排序返回多个候选
+    print("测试2: 候选排序")
+    candidates = resolver.resolve("平安", limit=5)
+    assert [c["code"] for c in candidates] == ["601318", "000001"]
+    assert candidates[0]["score"] > candidates[1]["score"]
+    assert resolver.resolve("不存在的公司") == []
+    print("测试2通过\n")
+
+    # 测试用例3: 多只股票共享的简称只作为候选，得分接近时不自动采用
+    print("测试3: 歧义名称")
+    banks = SymbolResolver([("601988", "中国银行"), ("601229", "上海银行"), ("601169", "北京银行"),
+                            ("601398", "工商银行"), ("600519", "贵州茅台")])
+    best, candidates = banks.pick("银行", 0.6)
+    assert best is None and len(candidates) == 4
+    assert banks.resolve("银行", limit=1)[0]["match"] == "shared_alias"
+    assert banks.pick("中国银行", 0.6)[0]["code"] == "601988"
+    assert banks.pick("茅台", 0.6)[0]["code"] == "600519"
+    assert banks.pick("工行", 0.6)[0]["code"] == "601398"
+    assert resolver.pick("平安", 0.6)[0]["code"] == "601318"
+    assert banks.pick("不存在的公司", 0.6) == (None, [])
+    print("测试3通过\n")
+
+def test_bar_store_incremental():
+    dates = pd.bdate_range(end="2024-06-28", periods=300)
+    history = pd.DataFrame({
+        "日期": [d.date() for d in dates],
+        "开盘": [10.0 + i * 0.01 for i in range(300)],
+        "收盘": [10.0 + i * 0.01 for i in range(300)],
+        "最高": [10.5 + i * 0.01 for i in range(300)],
+        "最低": [9.5 + i * 0.01 for i in range(300)],
+        "成交量": [1000 + i for i in range(300)],
+        "涨跌幅": [0.1] * 300
+    })
+    calls = []
+
+    def fetcher(start_date, end_date):
+        calls.append((start_date, end_date))
+        d = pd.to_datetime(history["日期"])
+        return history[(d >= pd.Timestamp(start_date)) & (d <= pd.Timestamp(end_date))]
+
+    store = BarStore(tempfile.mkdtemp())
+
+    # 测试用例1: 首次请求全量获取，重复请求不再访问上游
+    print("测试1: 本地日线命中")
+    first = store.get_bars("600519", "qfq", "20240101", "20240628", fetcher)
+    second = store.get_bars("600519", "qfq", "20240101", "20240628", fetcher)
+    assert len(calls) == 1
+    assert second["收盘"].tolist() == first["收盘"].tolist()
+    print("测试1通过\n")
+
+    # 测试用例2: 更早的开始日期只补齐缺失区间
+    print("测试2: 向前补齐缺失区间")
+    longer = store.get_bars("600519", "qfq", "20231101", "20240628", fetcher)
+    assert calls[-1] == ("20231101", "20231231")
+    assert longer["日期"].iloc[0] >= pd.Timestamp("2023-11-01")
+    assert longer["日期"].is_monotonic_increasing
+    print("测试2通过\n")
+
+def legacy_rsi(prices, window=14):
+    """逐行循环的RSI实现，作为向量化版本的对照"""
+    deltas = prices.diff()
+    seed = deltas[:window+1]
+    up = seed[seed >= 0].sum()/window
+    down = -seed[seed < 0].sum()/window
+    rsi = pd.Series(index=prices.index, dtype='float64')
+    rsi.iloc[window] = 100. - (100./(1.+up/down))
+    for i in range(window+1, len(prices)):
+        delta = deltas.iloc[i-1]
+        upval = delta if delta > 0 else 0.
+        downval = 0. if delta > 0 else -delta
+        up = (up*(window-1) + upval)/window
+        down = (down*(window-1) + downval)/window
+        rsi.iloc[i] = 100. - (100./(1.+up/down))
+    return rsi
+
+def test_rsi_matches_legacy():
+    prices = pd.Series([10.0, 10.2, 10.1, 10.4, 10.3, 10.8, 10.6, 10.5, 10.9, 11.2,
+                        11.0, 10.7, 10.9, 11.3, 11.1, 11.4, 11.2, 11.0, 11.5, 11.7,
+                        11.6, 11.9, 11.4, 11.3, 11.8, 12.0, 11.7, 11.9, 12.3, 12.1])
+
+    # 测试用例1: 向量化结果与逐行循环一致
+    print("测试1: 向量化RSI与原实现一致")
+    expected = legacy_rsi(prices)
+    actual = calculate_rsi(prices)
+    assert actual.isna().equals(expected.isna())
+    assert (actual - expected).abs().max() < 1e-9
+    assert actual.round(2).equals(expected.round(2))
+    print("测试1通过\n")
+
+    # 测试用例2: 增量更新与整段重算一致
+    print("测试2: 增量RSI")
+    streaming = IncrementalRSI(14)
+    values = [streaming.update(p) for p in prices]
+    assert abs(values[-1] - expected.iloc[-1]) < 1e-9
+    resumed = IncrementalRSI.from_prices(prices[:-1])
+    assert abs(resumed.update(prices.iloc[-1]) - expected.iloc[-1]) < 1e-9
+    print("测试2通过\n")
+
+def test_indicator_panel():
+    closes = [10.0 + 0.1 * ((i * 7) % 11) - 0.05 * i for i in range(40)]
+    long_df = pd.DataFrame({"开盘": closes, "收盘": closes, "最高": [c + 0.2 for c in closes],
+                            "最低": [c - 0.2 for c in closes], "成交量": [1000 + i for i in range(40)]})
+    short_df = long_df.tail(18).reset_index(drop=True)
+
+    # 测试用例1: 面板中不同长度的股票与单独计算结果一致
+    print("测试1: 多股票面板计算")
+    names = list(INDICATOR_REGISTRY)
+    panel_results = compute_indicators(build_panel([long_df, short_df]), names)
+    for row, df in enumerate([long_df, short_df]):
+        single = latest_indicator_values(compute_indicators(build_panel([df]), names), 0)
+        assert latest_indicator_values(panel_results, row) == single
+    print("测试1通过\n")
+
+    # 测试用例2: 默认指标与原实现一致，数据不足时为None
+    print("测试2: 默认指标")
+    latest = latest_indicator_values(compute_indicators(build_panel([long_df, short_df])), 0)
+    assert latest["sma5"] == round(long_df["收盘"].rolling(5, min_periods=1).mean().iloc[-1], 2)
+    assert latest["sma20"] == round(long_df["收盘"].rolling(20, min_periods=1).mean().iloc[-1], 2)
+    assert latest["rsi14"] == round(legacy_rsi(long_df["收盘"]).iloc[-1], 2)
+    short_latest = latest_indicator_values(compute_indicators(build_panel([short_df])), 0)
+    assert short_latest["sma20"] is None
+    print("测试2通过\n")
+
+def test_compact_time_series():
+    time_series = {
+        "dates": ["2025-01-02", "2025-01-03", "2025-01-06", "2025-01-07", "2025-01-10"],
+        "ohlc": {
+            "open": [1520.0, 1512.35, 1498.0, 1501.11, 1523.5],
+            "high": [1530.88, 1520.0, 1510.2, 1525.0, 1540.0],
+            "low": [1505.1, 1495.0, 1490.01, 1499.99, 1518.0],
+            "close": [1510.0, 1499.5, 1502.3, 1522.0, 1535.55]
+        },
+        "volume": [35210, 28001, 30450, 41200, 39999],
+        "pct_change": [-0.66, -0.7, 0.19, 1.31, 0.89]
+    }
+
+    # 测试用例1: 紧凑格式可无损还原，且JSON体积更小
+    print("测试1: 紧凑格式往返")
+    compact = encode_compact_time_series(time_series)
+    assert decode_compact_time_series(json.loads(json.dumps(compact))) == time_series
+    assert len(json.dumps(compact)) < len(json.dumps(time_series))
+    print("测试1通过\n")
+
+    # 测试用例2: 超过两位小数的数值自动提高缩放倍数，空序列也可往返
+    print("测试2: 缩放倍数与空序列")
+    precise = json.loads(json.dumps(time_series))
+    precise["pct_change"][0] = -0.6612
+    compact = encode_compact_time_series(precise)
+    assert compact["pct_scale"] == 10000
+    assert decode_compact_time_series(compact) == precise
+    empty = {"dates": [], "ohlc": {"open": [], "high": [], "low": [], "close": []}, "volume": [], "pct_change": []}
+    assert decode_compact_time_series(encode_compact_time_series(empty)) == empty
+    print("测试2通过\n")
+
+def test_single_flight():
+    flight = SingleFlight()
+    calls = []
+
+    def slow_fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"rows": 20}
+
+    # 测试用例1: 相同键的并发请求只执行一次并共享结果
+    print("测试1: 并发请求合并")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do(("600519", 30, "qfq"), slow_fetch)))
+               for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len(results) == 5 and all(r is results[0] for r in results)
+    stats = flight.get_stats()
+    assert stats["executions"] == 1 and stats["coalesced"] == 4 and stats["in_flight"] == 0
+    print("测试1通过\n")
+
+    # 测试用例2: 完成后不缓存结果，异常同样抛给调用者
+    print("测试2: 完成后重新执行与异常传递")
+    flight.do(("600519", 30, "qfq"), slow_fetch)
+    assert len(calls) == 2
+    try:
+        flight.do("error", lambda: 1 / 0)
+        assert False
+    except ZeroDivisionError:
+        pass
+    assert flight.get_stats()["errors"] == 1
+    print("测试2通过\n")
+
+def test_trading_calendar():
+    # 2025年国庆假期: 10月1日-8日休市，10月11日(周六)调休不开市
+    holidays = pd.to_datetime(["2025-10-01", "2025-10-02", "2025-10-03", "2025-10-06", "2025-10-07", "2025-10-08"])
+    days = pd.bdate_range("2025-09-01", "2025-10-31").difference(holidays)
+    calendar = TradingCalendar(d.strftime('%Y-%m-%d') for d in days)
+
+    # 测试用例1: N个交易日换算为精确区间，跨越假期和周末
+    print("测试1: 交易日区间")
+    assert calendar.window(5, "2025-10-12") == (pd.Timestamp("2025-09-26"), pd.Timestamp("2025-10-10"))
+    assert calendar.window(1, "2025-10-10") == (pd.Timestamp("2025-10-10"), pd.Timestamp("2025-10-10"))
+    assert calendar.last_trading_day("2025-10-05") == pd.Timestamp("2025-09-30")
+    assert not calendar.is_trading_day("2025-10-08") and calendar.is_trading_day("2025-10-09")
+    print("测试1通过\n")
+
+    # 测试用例2: 超出日历范围或历史不足时返回None，由调用方回退
+    print("测试2: 日历范围外")
+    assert calendar.window(5, "2026-01-05") is None
+    assert calendar.window(len(calendar) + 1, "2025-10-31") is None
+    assert latest_bar_date(datetime(2025, 10, 10, 9, 0)) == datetime(2025, 10, 9)
+    assert latest_bar_date(datetime(2025, 10, 10, 15, 0)) == datetime(2025, 10, 10)
+    print("测试2通过\n")
+
+def test_upstream_guard():
+    guard = UpstreamGuard()
+    guard.register_endpoint("flaky", rate_per_second=100, burst=100, timeout_seconds=0.2,
+                            failure_threshold=3, reset_seconds=0.2)
+
+    def fail():
+        raise ConnectionError("upstream down")
+
+    # 测试用例1: 连续失败后断路器打开并快速失败
+    print("测试1: 断路器打开")
+    for _ in range(3):
+        try:
+            guard.call("flaky", fail)
+            assert False
+        except ConnectionError:
+            pass
+    try:
+        guard.call("flaky", lambda: "ok")
+        assert False
+    except UpstreamUnavailableError:
+        pass
+    stats = guard.get_stats()["flaky"]
+    assert stats["failures"] == 3 and stats["rejected"] == 1 and stats["breaker"]["state"] == "open"
+    print("测试1通过\n")
+
+    # 测试用例2: 冷却后试探成功即关闭，超时计入失败
+    print("测试2: 半开试探与截止时间")
+    time.sleep(0.25)
+    assert guard.call("flaky", lambda: "ok") == "ok"
+    assert guard.get_stats()["flaky"]["breaker"]["state"] == "closed"
+    try:
+        guard.call("flaky", time.sleep, 1)
+        assert False
+    except UpstreamTimeoutError:
+        pass
+    assert guard.get_stats()["flaky"]["timeouts"] == 1
+    print("测试2通过\n")
+
+    # 测试用例3: 令牌桶限制调用速率
+    print("测试3: 限流")
+    guard.register_endpoint("limited", rate_per_second=20, burst=1, timeout_seconds=1)
+    start = time.time()
+    for _ in range(5):
+        guard.call("limited", lambda: None)
+    assert time.time() - start >= 0.18
+    print("测试3通过\n")
+
+    # 测试用例4: 超时后仍占用线程的调用达到上限时直接失败，线程释放后恢复
+    print("测试4: 挂起调用占满线程池")
+    guard = UpstreamGuard(max_workers=2, max_abandoned=1)
+    guard.register_endpoint("hung", rate_per_second=100, burst=100, timeout_seconds=0.05)
+    try:
+        guard.call("hung", time.sleep, 0.5)
+        assert False
+    except UpstreamTimeoutError:
+        pass
+    calls = []
+    try:
+        guard.call("hung", calls.append, 1)
+        assert False
+    except UpstreamUnavailableError:
+        pass
+    stats = guard.get_stats()["hung"]
+    assert not calls and stats["saturated"] == 1 and stats["abandoned_in_flight"] == 1
+    assert stats["breaker"]["state"] == "closed"
+    time.sleep(0.6)
+    guard.call("hung", calls.append, 1)
+    assert calls == [1] and guard.get_stats()["hung"]["abandoned_in_flight"] == 0
+    print("测试4通过\n")
+
 if __name__ == "__main__":
-    test_fetch_stock_data()
\ No newline at end of file
+    test_fetch_stock_data()
+    test_security_master_cache()
+    test_symbol_resolver()
+    test_bar_store_incremental()
+    test_rsi_matches_legacy()
+    test_indicator_panel()
+    test_compact_time_series()
+    test_single_flight()
+    test_trading_calendar()
+    test_upstream_guard()
\ No newline at end of file
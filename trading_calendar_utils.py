@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# 开盘时间（时, 分），开盘前当日还没有K线
+MARKET_OPEN_TIME = (9, 30)
+
+# 交易日历不可用时，按自然日估算窗口的放大倍数和余量（覆盖周末和节假日）
+FALLBACK_DAYS_RATIO = 1.5
+FALLBACK_DAYS_PADDING = 10
+
+
+class TradingCalendar():
+    """
+    沪深交易所交易日历索引
+
+    交易日保存为有序的datetime64[D]数组，通过二分查找把
+    "截至某日的N个交易日"换算为精确的起止日期。
+    """
+
+    def __init__(self, dates: Iterable):
+        """
+        根据交易日列表构建索引
+
+        Args:
+            dates: 交易日序列（字符串、date或Timestamp均可）
+        """
+        days = pd.to_datetime(pd.Series(list(dates), dtype=object)).values.astype('datetime64[D]')
+        self.dates = np.unique(days)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def covers(self, day) -> bool:
+        """判断日期是否在日历覆盖范围内"""
+        day = np.datetime64(pd.Timestamp(day).date(), 'D')
+        return len(self.dates) > 0 and self.dates[0] <= day <= self.dates[-1]
+
+    def is_trading_day(self, day) -> bool:
+        """判断是否为交易日"""
+        day = np.datetime64(pd.Timestamp(day).date(), 'D')
+        idx = np.searchsorted(self.dates, day)
+        return idx < len(self.dates) and self.dates[idx] == day
+
+    def last_trading_day(self, day) -> Optional[pd.Timestamp]:
+        """获取不晚于指定日期的最后一个交易日"""
+        day = np.datetime64(pd.Timestamp(day).date(), 'D')
+        idx = np.searchsorted(self.dates, day, side='right') - 1
+        return pd.Timestamp(self.dates[idx]) if idx >= 0 else None
+
+    def window(self, days: int, end) -> Optional[tuple]:
+        """
+        计算截至end（含）的最近days个交易日区间
+
+        Args:
+            days: 交易日数量
+            end: 截止日期
+
+        Returns:
+            (start, end) 交易日Timestamp二元组；日历未覆盖截止日期或历史不足时返回None
+        """
+        if days < 1 or not self.covers(end):
+            return None
+        last = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end).date(), 'D'), side='right') - 1
+        first = last - days + 1
+        if last < 0 or first < 0:
+            return None
+        return pd.Timestamp(self.dates[first]), pd.Timestamp(self.dates[last])
+
+
+def latest_bar_date(now: Optional[datetime] = None) -> datetime:
+    """
+    获取当前时刻可能已有K线的最后日期（开盘前为前一天）
+
+    Args:
+        now: 当前时间，默认为datetime.now()
+
+    Returns:
+        日期（datetime，时间部分为0点）
+    """
+    now = now or datetime.now()
+    today = datetime(now.year, now.month, now.day)
+    if (now.hour, now.minute) < MARKET_OPEN_TIME:
+        return today - timedelta(days=1)
+    return today
+
+
+def fallback_window(days: int, now: Optional[datetime] = None) -> tuple:
+    """
+    交易日历不可用时按自然日估算的请求区间，需配合tail(days)截取
+
+    Args:
+        days: 交易日数量
+        now: 当前时间，默认为datetime.now()
+
+    Returns:
+        (start, end) 日期二元组
+    """
+    end = latest_bar_date(now)
+    return end - timedelta(days=int(days * FALLBACK_DAYS_RATIO) + FALLBACK_DAYS_PADDING), end
@@ -0,0 +1,307 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional
+
+# 导入logger_utils中的全局日志函数
+from logger_utils import log_global_info, log_global_warning
+
+# 断路器状态
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+
+class UpstreamError(Exception):
+    """上游接口调用失败"""
+
+
+class UpstreamUnavailableError(UpstreamError):
+    """断路器打开，上游暂时不可用"""
+
+
+class UpstreamTimeoutError(UpstreamError):
+    """上游接口调用超过截止时间"""
+
+
+class TokenBucket():
+    """
+    令牌桶限流器（线程安全）
+
+    令牌以固定速率补充，桶容量即允许的突发请求数。
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        """
+        初始化令牌桶
+
+        Args:
+            rate_per_second: 每秒补充的令牌数
+            burst: 桶容量
+        """
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> float:
+        """
+        获取一个令牌，必要时等待
+
+        Args:
+            timeout: 最长等待秒数，为None时一直等待
+
+        Returns:
+            实际等待的秒数
+
+        Raises:
+            UpstreamTimeoutError: 在timeout内拿不到令牌
+        """
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return now - start
+                wait = (1 - self.tokens) / self.rate
+            if timeout is not None and time.monotonic() - start + wait > timeout:
+                raise UpstreamTimeoutError(f"等待限流令牌超过 {timeout} 秒")
+            time.sleep(wait)
+
+
+class CircuitBreaker():
+    """
+    断路器（线程安全）
+
+    连续失败达到阈值后打开，打开期间直接拒绝调用；冷却时间过后进入
+    半开状态，只放行一个试探请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30):
+        """
+        初始化断路器
+
+        Args:
+            failure_threshold: 打开断路器的连续失败次数
+            reset_seconds: 打开后多久允许试探请求
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = BREAKER_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """判断当前是否允许调用上游"""
+        with self.lock:
+            if self.state == BREAKER_CLOSED:
+                return True
+            if self.state == BREAKER_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = BREAKER_HALF_OPEN
+            if self.state == BREAKER_HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        """记录一次成功调用"""
+        with self.lock:
+            self.state = BREAKER_CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.probe_in_flight = False
+
+    def cancel(self):
+        """已放行的调用未实际发出时，归还试探机会"""
+        with self.lock:
+            self.probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """
+        记录一次失败调用
+
+        Returns:
+            本次失败是否导致断路器打开
+        """
+        with self.lock:
+            self.consecutive_failures += 1
+            was_open = self.state == BREAKER_OPEN
+            if self.state == BREAKER_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = BREAKER_OPEN
+                self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+            return self.state == BREAKER_OPEN and not was_open
+
+    def get_state(self) -> dict:
+        """获取断路器状态"""
+        with self.lock:
+            state = self.state
+            if state == BREAKER_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                state = BREAKER_HALF_OPEN
+            return {
+                "state": state,
+                "consecutive_failures": self.consecutive_failures,
+                "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0
+            }
+
+
+class UpstreamGuard():
+    """
+    上游接口保护（按接口限流 + 截止时间 + 断路器）
+
+    每个接口通过 register_endpoint 注册独立的令牌桶和断路器，
+    调用在独立线程池中执行，超过截止时间即返回超时错误，断路器打开期间
+    直接失败，由调用方决定是否使用缓存。
+
+    超时的调用无法中止，其线程会一直占用线程池直到上游返回；这类已放弃
+    但仍在运行的调用（所有接口合计）达到max_abandoned时，新的调用直接失败
+    （不再排队等待空闲线程后超时，也不计入断路器），直到它们结束。
+    get_stats中的abandoned_in_flight为各接口当前占用线程的已放弃调用数，
+    saturated为因此直接失败的次数。
+    """
+
+    def __init__(self, max_workers: int = 16, max_abandoned: Optional[int] = None):
+        """
+        初始化上游保护
+
+        Args:
+            max_workers: 执行上游调用的线程数上限
+            max_abandoned: 允许占用线程的已放弃调用数上限，默认为线程数的一半
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upstream")
+        self.max_abandoned = max(1, max_abandoned if max_abandoned is not None else max_workers // 2)
+        self.abandoned = 0
+        self.endpoints = {}
+        self.stats_lock = threading.Lock()
+
+    def register_endpoint(self, name: str, rate_per_second: float, burst: int, timeout_seconds: float,
+                          failure_threshold: int = 5, reset_seconds: float = 30):
+        """
+        注册一个上游接口
+
+        Args:
+            name: 接口名称
+            rate_per_second: 每秒允许的平均调用次数
+            burst: 允许的突发调用次数
+            timeout_seconds: 单次调用截止时间（含等待令牌）
+            failure_threshold: 打开断路器的连续失败次数
+            reset_seconds: 断路器打开后多久允许试探请求
+        """
+        self.endpoints[name] = {
+            "bucket": TokenBucket(rate_per_second, burst),
+            "breaker": CircuitBreaker(failure_threshold, reset_seconds),
+            "timeout": timeout_seconds,
+            "stats": {
+                "calls": 0,
+                "successes": 0,
+                "failures": 0,
+                "timeouts": 0,
+                "rejected": 0,
+                "throttled": 0,
+                "saturated": 0,
+                "abandoned_in_flight": 0,
+                "throttle_wait_seconds": 0.0
+            }
+        }
+
+    def call(self, name: str, fn: Callable, *args, **kwargs):
+        """
+        在限流、截止时间和断路器保护下调用上游接口
+
+        Args:
+            name: 已注册的接口名称
+            fn: 上游函数
+            *args, **kwargs: 传给上游函数的参数
+
+        Returns:
+            上游函数的返回值
+
+        Raises:
+            UpstreamUnavailableError: 断路器打开，或线程池被已放弃的调用占满
+            UpstreamTimeoutError: 超过截止时间
+        """
+        if name not in self.endpoints:
+            raise KeyError(f"未注册的上游接口: {name}")
+        endpoint = self.endpoints[name]
+        breaker = endpoint["breaker"]
+        self.__count__(name, "calls")
+
+        if not breaker.allow():
+            self.__count__(name, "rejected")
+            raise UpstreamUnavailableError(f"上游接口'{name}'暂时不可用（断路器已打开）")
+
+        with self.stats_lock:
+            saturated = self.abandoned >= self.max_abandoned
+        if saturated:
+            # 线程池被挂起的调用占满不代表本接口故障，不计入断路器
+            breaker.cancel()
+            self.__count__(name, "saturated")
+            raise UpstreamUnavailableError(f"上游接口'{name}'暂时不可用（{self.abandoned} 个超时调用仍占用线程）")
+
+        deadline = time.monotonic() + endpoint["timeout"]
+        try:
+            waited = endpoint["bucket"].acquire(timeout=endpoint["timeout"])
+        except UpstreamTimeoutError:
+            # 本地限流排队超时不代表上游故障，不计入断路器
+            breaker.cancel()
+            self.__count__(name, "throttled")
+            raise
+        self.__count__(name, "throttle_wait_seconds", waited)
+        try:
+            future = self.executor.submit(fn, *args, **kwargs)
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                self.__abandon__(name, future)
+                raise UpstreamTimeoutError(f"上游接口'{name}'调用超过 {endpoint['timeout']} 秒")
+        except Exception as e:
+            self.__count__(name, "timeouts" if isinstance(e, UpstreamTimeoutError) else "failures")
+            if breaker.record_failure():
+                log_global_warning(f"上游接口'{name}'连续失败，断路器打开: {str(e)}")
+            raise
+
+        if breaker.get_state()["state"] != BREAKER_CLOSED:
+            log_global_info(f"上游接口'{name}'恢复，断路器关闭")
+        breaker.record_success()
+        self.__count__(name, "successes")
+        return result
+
+    def get_stats(self) -> dict:
+        """
+        获取各接口的调用统计和断路器状态
+
+        Returns:
+            接口名称 -> 统计信息字典
+        """
+        stats = {}
+        for name, endpoint in self.endpoints.items():
+            with self.stats_lock:
+                endpoint_stats = dict(endpoint["stats"])
+            endpoint_stats["throttle_wait_seconds"] = round(endpoint_stats["throttle_wait_seconds"], 3)
+            endpoint_stats["breaker"] = endpoint["breaker"].get_state()
+            stats[name] = endpoint_stats
+        return stats
+
+    def __abandon__(self, name: str, future):
+        """记录一个超时后仍在运行的调用，其线程结束时释放"""
+        with self.stats_lock:
+            self.abandoned += 1
+            self.endpoints[name]["stats"]["abandoned_in_flight"] += 1
+
+        def release(_):
+            with self.stats_lock:
+                self.abandoned -= 1
+                self.endpoints[name]["stats"]["abandoned_in_flight"] -= 1
+
+        future.add_done_callback(release)
+
+    def __count__(self, name: str, key: str, n: float = 1):
+        """线程安全地累加统计计数"""
+        with self.stats_lock:
+            self.endpoints[name]["stats"][key] += n